@@ -1,30 +1,41 @@
+import sys
+
+
 try:
     from ._generated_version import version as __version__
 except ImportError:
-    # Package is not installed, parse git tag at runtime
-    try:
-        import setuptools_scm
+    # Package is not installed, parse git tag at runtime. This runs git so it
+    # is deferred until `__version__` is read, not done on import.
 
-        # Code duplicated from setup.py to avoid a dependency on each other
-        def parse_git(root, **kwargs):
-            """
-            Parse function for setuptools_scm
-            """
-            from setuptools_scm.git import parse
+    def _scm_version():
+        try:
+            import setuptools_scm
 
-            kwargs[
-                "describe_command"
-            ] = "git describe --dirty --tags --long --match '*[0-9]*'"
-            return parse(root, **kwargs)
+            # Code duplicated from setup.py to avoid a dependency on each other
+            def parse_git(root, **kwargs):
+                """
+                Parse function for setuptools_scm
+                """
+                from setuptools_scm.git import parse
 
-        __version__ = setuptools_scm.get_version("./", parse=parse_git)
-    except ImportError:
-        __version__ = None
+                kwargs[
+                    "describe_command"
+                ] = "git describe --dirty --tags --long --match '*[0-9]*'"
+                return parse(root, **kwargs)
 
+            return setuptools_scm.get_version("./", parse=parse_git)
+        except ImportError:
+            return None
 
-import logging
-import sys
+    if sys.version_info >= (3, 7):
 
+        def __getattr__(name):
+            global __version__
+            if name != "__version__":
+                raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+            __version__ = _scm_version()
+            return __version__
 
-format = "%(levelname)s: %(message)s"
-logging.basicConfig(stream=sys.stdout, level=logging.INFO, format=format)
+    else:
+        # Module __getattr__ (PEP 562) needs Python 3.7
+        __version__ = _scm_version()
@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import json
+
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia.deployment import Settings
+from mlflow_algorithmia.formats import (
+    concat_predictions,
+    decode_predictions,
+    encode_dataframe,
+    model_query,
+)
+from mlflow_algorithmia.upload import retry_delay
+
+
+def content_type(query):
+    """
+    Content type Algorithmia clients send for each kind of input
+    """
+    if isinstance(query, (bytes, bytearray)):
+        return "application/octet-stream"
+    if isinstance(query, str):
+        return "text/plain"
+    return "application/json"
+
+
+def parse_response(response):
+    """
+    Result of an algorithm call response, decoded like `Algorithmia` does
+    """
+    if "error" in response or "metadata" not in response:
+        error = response.get("error") or {}
+        raise MlflowException(f"Algorithm error: {error.get('message', response)}")
+
+    result_type = response["metadata"]["content_type"]
+    if result_type == "binary":
+        return base64.b64decode(response["result"])
+    if result_type == "void":
+        return None
+    return response["result"]
+
+
+class AsyncAlgorithmiaDeploymentClient(object):
+    """
+    asyncio client to query the algorithms of `AlgorithmiaDeploymentClient`
+    without a thread per request, requires: pip install mlflow-algorithmia[async]
+
+        async with AsyncAlgorithmiaDeploymentClient() as client:
+            predictions = await client.predict("mlflow_sklearn_demo", df)
+
+    The calls share a keep-alive connection pool, at most `concurrency`
+    requests are in flight at the same time across all the `predict` calls.
+    Uses the same settings as the deployment client (credentials,
+    MLFLOW_ALGO_PREDICT_* variables).
+    """
+
+    def __init__(self, concurrency=None, timeout=None, settings=None):
+        self.settings = settings if settings is not None else Settings()
+        self.concurrency = int(concurrency or self.settings["predict_concurrency"])
+        self.timeout = timeout
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def session(self):
+        """
+        aiohttp session created on first use, inside the running event loop
+        """
+        if self._session is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise MlflowException(
+                    "The async client requires: pip install mlflow-algorithmia[async]"
+                )
+
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            api_key = self.settings["api_key"]
+            self._session = aiohttp.ClientSession(
+                connector=connector, headers={"Authorization": f"Simple {api_key}"}
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def call(self, deployment_name, query):
+        """
+        Calls the algorithm with an encoded query and returns its result
+        """
+        session = self.session
+        username = self.settings["username"]
+        api = self.settings["api_endpoint"]
+        url = f"{api}/v1/algo/{username}/{deployment_name}"
+        headers = {"Content-Type": content_type(query)}
+        if not isinstance(query, (bytes, bytearray, str)):
+            query = json.dumps(query)
+
+        async with self._semaphore:
+            async with session.post(url, data=query, headers=headers) as response:
+                body = await response.read()
+        try:
+            return parse_response(json.loads(body))
+        except ValueError:
+            raise MlflowException(
+                f"Algorithm call failed ({response.status}): {body[:200]!r}"
+            )
+
+    async def call_with_retries(self, deployment_name, query, name):
+        """
+        Same retry policy as `AlgorithmiaDeploymentClient.predict`
+        """
+        retries = int(self.settings["predict_retries"])
+        for attempt in range(retries):
+            try:
+                return await self.call(deployment_name, query)
+            except Exception as ex:
+                delay = retry_delay(attempt, ex, name, retries, action="Prediction")
+                await asyncio.sleep(delay)
+
+    async def predict(
+        self,
+        deployment_name,
+        df,
+        format=None,
+        output_format=None,
+        timeout=None,
+        model_key=None,
+    ):
+        """
+        Same as `AlgorithmiaDeploymentClient.predict`. `timeout` (seconds)
+        bounds the whole call, cancelling it cancels its requests in flight.
+        """
+        timeout = timeout or self.timeout
+        coro = self.predict_chunks(
+            deployment_name, df, format, output_format, model_key
+        )
+        if timeout is None:
+            return await coro
+        try:
+            return await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            raise MlflowException(
+                f"Prediction of {deployment_name} timed out after {timeout}s"
+            )
+
+    async def predict_chunks(
+        self, deployment_name, df, format, output_format, model_key=None
+    ):
+        format = format or self.settings["predict_format"]
+        batch_rows = int(self.settings["predict_batch_rows"] or 0)
+        if batch_rows <= 0 or len(df) <= batch_rows:
+            query = encode_dataframe(df, format, output_format)
+            query = model_query(query, model_key)
+            result = await self.call(deployment_name, query)
+            return decode_predictions(result)
+
+        async def predict_chunk(start):
+            chunk = df.iloc[start : start + batch_rows]
+            query = encode_dataframe(chunk, format, output_format)
+            query = model_query(query, model_key)
+            name = f"rows {start}-{start + len(chunk) - 1}"
+            result = await self.call_with_retries(deployment_name, query, name)
+            return decode_predictions(result)
+
+        tasks = [
+            asyncio.ensure_future(predict_chunk(start))
+            for start in range(0, len(df), batch_rows)
+        ]
+        try:
+            chunks = await asyncio.gather(*tasks)
+        except BaseException:
+            # A failed chunk or a cancelled call stops the other chunks
+            for task in tasks:
+                task.cancel()
+            raise
+        return concat_predictions(list(chunks))
@@ -0,0 +1,239 @@
+import collections
+import hashlib
+import os
+import tarfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from mlflow.exceptions import MlflowException
+
+
+BLOCK_SIZE = 1024 * 1024
+
+# Size of the independently compressed blocks of the parallel codecs
+COMPRESS_BLOCK_SIZE = 4 * 1024 * 1024
+
+# codec: (bundle file extension, requirements needed to extract it when serving)
+CODECS = {
+    "gz": (".tar.gz", []),
+    "pgz": (".tar.gz", []),
+    "zst": (".tar.zst", ["zstandard"]),
+}
+
+# Members with these extensions are already compressed,
+# compressing them again costs CPU time and saves almost nothing
+COMPRESSED_EXTENSIONS = (
+    ".7z",
+    ".bz2",
+    ".gz",
+    ".jpeg",
+    ".jpg",
+    ".onnx",
+    ".png",
+    ".pt",
+    ".pth",
+    ".tgz",
+    ".xz",
+    ".zip",
+    ".zst",
+)
+
+
+def iter_model_files(model_dir):
+    """
+    Yields (relative path, absolute path) for every file in a model directory
+    in a stable order so the output does not depend on the filesystem
+    """
+    for root, dirs, files in os.walk(model_dir):
+        dirs.sort()
+        for fname in sorted(files):
+            fpath = os.path.join(root, fname)
+            relpath = os.path.relpath(fpath, model_dir).replace(os.sep, "/")
+            yield relpath, fpath
+
+
+def hash_file(fpath, algorithm="sha256"):
+    """
+    Returns the hex digest of a file contents
+    """
+    digest = hashlib.new(algorithm)
+    with open(fpath, "rb") as file:
+        for block in iter(lambda: file.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_model_dir(model_dir, extra=None):
+    """
+    Content hash of an MLflow model directory
+
+    The hash covers the relative path, executable bit and contents of every
+    file so it only changes when the model (including its conda.yaml) changes.
+    `extra` is an optional list of strings mixed into the hash, for example
+    the bundle codec.
+    """
+    digest = hashlib.sha256()
+    for relpath, fpath in iter_model_files(model_dir):
+        executable = os.access(fpath, os.X_OK)
+        digest.update(relpath.encode("utf-8"))
+        digest.update(b"\0x" if executable else b"\0-")
+        digest.update(hash_file(fpath).encode("ascii"))
+        digest.update(b"\n")
+
+    for item in extra or []:
+        digest.update(str(item).encode("utf-8"))
+        digest.update(b"\n")
+
+    return digest.hexdigest()
+
+
+def bundle_extension(codec):
+    """
+    Examples:
+        >>> bundle_extension("zst")
+        '.tar.zst'
+    """
+    if codec not in CODECS:
+        options = ", ".join(sorted(CODECS))
+        raise MlflowException(f"Unknown bundle codec '{codec}', use one of: {options}")
+    return CODECS[codec][0]
+
+
+def bundle_requirements(codec):
+    """
+    Extra requirements the algorithm needs to extract a bundle of this codec
+    """
+    bundle_extension(codec)
+    return list(CODECS[codec][1])
+
+
+def is_compressed(fname):
+    return fname.lower().endswith(COMPRESSED_EXTENSIONS)
+
+
+def create_bundle(model_dir, fileobj, arcname, codec="pgz", threads=None, level=6):
+    """
+    Writes a tar bundle of `model_dir` to `fileobj`
+
+    Parameters
+    ----------
+        codec: "gz" single threaded gzip, "pgz" gzip compatible multi-threaded
+            block compression or "zst" multi-threaded zstandard
+        threads (default=cpu count): compression threads of the parallel codecs
+        level: compression level, already compressed members are stored
+            with the fastest level
+    """
+    bundle_extension(codec)
+
+    if codec == "gz":
+        with tarfile.open(fileobj=fileobj, mode="w:gz", compresslevel=level) as tar:
+            tar.add(model_dir, arcname=arcname)
+        return
+
+    writer = BlockCompressor(fileobj, codec=codec, threads=threads, level=level)
+
+    def select_level(tarinfo):
+        writer.set_incompressible(tarinfo.isfile() and is_compressed(tarinfo.name))
+        return tarinfo
+
+    with writer:
+        with tarfile.open(fileobj=writer, mode="w") as tar:
+            tar.add(model_dir, arcname=arcname, filter=select_level)
+
+
+class BlockCompressor(object):
+    """
+    Write only file object that compresses fixed size blocks in a thread pool
+
+    Every block is written as an independent gzip member or zstd frame,
+    concatenated members/frames are valid gzip/zstd streams so the output
+    can be extracted with `tar -xzf` or any zstd decoder.
+    zlib and zstandard release the GIL so blocks compress in parallel.
+    """
+
+    def __init__(self, fileobj, codec="pgz", threads=None, level=6):
+        self.fileobj = fileobj
+        self.codec = codec
+        self.threads = threads or os.cpu_count() or 1
+        self.level = level
+        self.incompressible = False
+        self.buffer = bytearray()
+        self.offset = 0
+        self.pending = collections.deque()
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+
+        if codec == "zst":
+            try:
+                import zstandard
+            except ImportError:
+                raise MlflowException(
+                    "The zst bundle codec requires the zstandard package: "
+                    "pip install zstandard"
+                )
+            self.zstandard = zstandard
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            for future in self.pending:
+                future.cancel()
+            self.executor.shutdown(wait=True)
+
+    def tell(self):
+        return self.offset
+
+    def set_incompressible(self, incompressible):
+        """
+        Flush the current block when switching between regular and
+        already compressed data so each block uses a single level
+        """
+        if incompressible != self.incompressible:
+            self._submit()
+            self.incompressible = incompressible
+
+    def write(self, data):
+        self.buffer += data
+        self.offset += len(data)
+        while len(self.buffer) >= COMPRESS_BLOCK_SIZE:
+            block = bytes(self.buffer[:COMPRESS_BLOCK_SIZE])
+            del self.buffer[:COMPRESS_BLOCK_SIZE]
+            self._submit(block)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._submit()
+        self._drain(0)
+        self.executor.shutdown(wait=True)
+
+    def _submit(self, block=None):
+        if block is None:
+            block = bytes(self.buffer)
+            self.buffer = bytearray()
+        if not block:
+            return
+
+        future = self.executor.submit(self._compress, block, self.incompressible)
+        self.pending.append(future)
+        # Bound the memory used by blocks waiting to be written
+        self._drain(2 * self.threads)
+
+    def _drain(self, max_pending):
+        while len(self.pending) > max_pending:
+            self.fileobj.write(self.pending.popleft().result())
+
+    def _compress(self, block, incompressible):
+        if self.codec == "zst":
+            level = -5 if incompressible else self.level
+            return self.zstandard.ZstdCompressor(level=level).compress(block)
+
+        level = 0 if incompressible else self.level
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(block) + compressor.flush()
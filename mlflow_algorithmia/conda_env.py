@@ -2,12 +2,23 @@
 # because we only read conda.yaml files generated by mlflow we can be more relaxed
 # and we dont have to add a dependency on conda itself
 
+import functools
 import re
 from collections import OrderedDict
 
-import pkg_resources
 import ruamel.yaml as yaml
-from pip._vendor.packaging.utils import canonicalize_name, canonicalize_version
+from mlflow.exceptions import MlflowException
+from packaging.requirements import InvalidRequirement, Requirement
+
+
+# Fallback for specs `packaging` rejects but older setuptools parsed, like the
+# `>==2.0` we get converting a conda `>=2.0`, so the output does not change
+LEGACY_SPEC = r"(~=|===|==|!=|<=|>=|<|>)\s*([^,;\s)]+)"
+LEGACY_SPEC_RE = re.compile(LEGACY_SPEC)
+LEGACY_REQUIREMENT_RE = re.compile(
+    rf"\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*"
+    rf"({LEGACY_SPEC}(\s*,\s*{LEGACY_SPEC})*)?\s*(;.*)?"
+)
 
 
 def yaml_safe_load(string):
@@ -20,6 +31,28 @@ def yaml_safe_load(string):
     return yaml.safe_load(string, version="1.2")
 
 
+def merge_requirements(*requirement_lists):
+    """
+    Union of the requirements of several models, a package can only be
+    required with the same specs by all of them
+
+    Examples:
+        >>> merge_requirements(["mlflow", "scikit-learn==1.0"], ["pandas", "mlflow"])
+        ['mlflow', 'scikit-learn==1.0', 'pandas']
+    """
+    merged = OrderedDict()
+    for requirements in requirement_lists:
+        for requirement in requirements:
+            spec = MatchSpec.from_str(requirement)
+            key = re.sub(r"[-_.]+", "-", spec.name).lower()
+            if key in merged and merged[key].specs != spec.specs:
+                raise MlflowException(
+                    f"Conflicting requirements: {merged[key]} and {spec}"
+                )
+            merged[key] = spec
+    return [str(spec) for spec in merged.values()]
+
+
 class Environment(object):
     def __init__(
         self,
@@ -34,6 +67,14 @@ class Environment(object):
             channels = []
         self.channels = channels
 
+    @classmethod
+    def from_files(cls, fpaths):
+        """
+        Load many conda.yaml files, used to deploy a fleet of models.
+        The dependencies they share are only parsed once.
+        """
+        return [cls.from_file(fpath) for fpath in fpaths]
+
     @classmethod
     def from_file(cls, fpath):
         with open(fpath, "r") as file:
@@ -78,6 +119,21 @@ class Environment(object):
 
         return ret
 
+    def python_version(self):
+        """
+        Returns the major.minor Python version pinned in the environment
+
+        Examples:
+            >>> Environment(dependencies=["python=3.8.5"]).python_version()
+            '3.8'
+        """
+        for dep in self.dependencies.get("conda", []):
+            if dep.name == "python":
+                for op, ver in dep.specs:
+                    if op == "==":
+                        return ".".join(ver.split(".")[:2])
+        return None
+
     def __repr__(self):
         return str(self.to_dict())
 
@@ -109,16 +165,37 @@ class Dependencies(OrderedDict):
 
 
 class MatchSpec(object):
-    def __init__(self, requirement):
-        self.requirement = requirement
-        self.name = requirement.name
-        self.specs = sorted(requirement.specs)
+    def __init__(self, name, specs):
+        self.name = name
+        self.specs = tuple(sorted(specs))
 
     @classmethod
+    @functools.lru_cache(maxsize=4096)
     def from_str(cls, string):
-        requirement = pkg_resources.parse_requirements(string)
-        requirement = list(requirement)[0]
-        return cls(requirement=requirement)
+        """
+        Parse a requirement, results are memoized and shared so they must
+        not be modified
+
+        Examples:
+            >>> MatchSpec.from_str("pytorch>1.0,<2.0")
+            pytorch<2.0,>1.0
+            >>> MatchSpec.from_str("tensorflow>==2.0")
+            tensorflow>==2.0
+        """
+        try:
+            requirement = Requirement(string)
+        except InvalidRequirement:
+            return cls.from_legacy_str(string)
+        specs = [(spec.operator, spec.version) for spec in requirement.specifier]
+        return cls(requirement.name, specs)
+
+    @classmethod
+    def from_legacy_str(cls, string):
+        match = LEGACY_REQUIREMENT_RE.fullmatch(string)
+        if match is None:
+            raise InvalidRequirement(f"Invalid requirement: {string!r}")
+        specs = LEGACY_SPEC_RE.findall(match.group(3) or "")
+        return cls(match.group(1), specs)
 
     def __repr__(self):
         specs = []
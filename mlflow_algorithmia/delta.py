@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from mlflow_algorithmia.bundle import BLOCK_SIZE, iter_model_files
+from mlflow_algorithmia.upload import ensure_dir, with_retries
+
+
+logger = logging.getLogger(__name__)
+
+# Delta bundles store every file (or every chunk of a large file) once:
+#   data://<user>/<algo>/objects/<sha256>
+#   data://<user>/<algo>/<bundle>.manifest.json
+# so a new model version only uploads the objects that are not there yet.
+OBJECTS_DIR = "objects"
+MANIFEST_EXTENSION = ".manifest.json"
+
+
+def build_manifest(model_dir, arcname, chunk_size=64 * 1024 * 1024):
+    """
+    Describe a model directory as a list of files made of content addressed chunks
+
+    Returns (manifest, objects) where objects maps each chunk hash to
+    (local file path, offset, size) to read it from
+    """
+    files = []
+    objects = {}
+    for relpath, fpath in iter_model_files(model_dir):
+        chunks = []
+        with open(fpath, "rb") as file:
+            offset = 0
+            while True:
+                digest = hashlib.sha256()
+                size = 0
+                while size < chunk_size:
+                    block = file.read(min(BLOCK_SIZE, chunk_size - size))
+                    if not block:
+                        break
+                    digest.update(block)
+                    size += len(block)
+                if size == 0 and chunks:
+                    break
+
+                sha = digest.hexdigest()
+                chunks.append(sha)
+                objects.setdefault(sha, (fpath, offset, size))
+                offset += size
+                if size < chunk_size:
+                    break
+
+        files.append(
+            {
+                "path": relpath,
+                "size": os.path.getsize(fpath),
+                "executable": os.access(fpath, os.X_OK),
+                "chunks": chunks,
+            }
+        )
+
+    manifest = {"name": arcname, "chunk_size": chunk_size, "files": files}
+    return manifest, objects
+
+
+def read_object(fpath, offset, size):
+    with open(fpath, "rb") as file:
+        file.seek(offset)
+        return file.read(size)
+
+
+class DeltaUploader(object):
+    """
+    Uploads the chunks of a model that are missing from the algorithm
+    object store and the manifest of the new version
+
+    Parameters
+    ----------
+        client: Algorithmia client
+        algo_data_dir: data://<user>/<algo> collection of the algorithm
+        workers: number of objects uploaded concurrently
+        retries: attempts for each object
+    """
+
+    def __init__(self, client, algo_data_dir, workers=4, retries=5, backoff=1.0):
+        self.client = client
+        self.algo_data_dir = algo_data_dir
+        self.objects_dir = f"{algo_data_dir}/{OBJECTS_DIR}"
+        self.workers = int(workers)
+        self.retries = int(retries)
+        self.backoff = float(backoff)
+
+    def existing_objects(self):
+        directory = self.client.dir(self.objects_dir)
+        if not directory.exists():
+            directory.create()
+            return set()
+        return {obj.getName() for obj in directory.files()}
+
+    def upload(self, model_dir, manifest_fname, chunk_size=64 * 1024 * 1024):
+        """
+        Returns the data:// path of the uploaded manifest
+        """
+        arcname = manifest_fname[: -len(MANIFEST_EXTENSION)]
+        manifest, objects = build_manifest(model_dir, arcname, chunk_size=chunk_size)
+
+        ensure_dir(self.client, self.algo_data_dir)
+        existing = self.existing_objects()
+        missing = [sha for sha in objects if sha not in existing]
+        upload_size = sum(objects[sha][2] for sha in missing)
+        total_size = sum(obj[2] for obj in objects.values())
+        logger.info(
+            "Uploading %d of %d objects (%.1f of %.1f MB)",
+            len(missing),
+            len(objects),
+            upload_size / 1e6,
+            total_size / 1e6,
+        )
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(self.upload_object, sha, *objects[sha])
+                for sha in missing
+            ]
+            for future in futures:
+                future.result()
+
+        manifest_path = f"{self.algo_data_dir}/{manifest_fname}"
+        with_retries(
+            lambda: self.client.file(manifest_path).put(json.dumps(manifest)),
+            manifest_path,
+            retries=self.retries,
+            backoff=self.backoff,
+        )
+        return manifest_path
+
+    def upload_object(self, sha, fpath, offset, size):
+        remote = f"{self.objects_dir}/{sha}"
+        data = read_object(fpath, offset, size)
+        with_retries(
+            lambda: self.client.file(remote).put(data),
+            remote,
+            retries=self.retries,
+            backoff=self.backoff,
+        )
@@ -1,27 +1,61 @@
+import asyncio
+import collections
+import copy
+import functools
 import json
 import logging
 import os
-import shutil
-import sys
-import tarfile
+import time
 import urllib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from urllib.parse import urlparse
 
-import Algorithmia
-import requests
-import ruamel.yaml as yaml
-from Algorithmia.errors import raiseAlgoApiError
-from algorithmia_api_client.rest import ApiException
-from git import Git, Repo, remote
-from jinja2 import Environment, FileSystemLoader
 from mlflow.deployments import BaseDeploymentClient
 from mlflow.exceptions import MlflowException
 
-from mlflow_algorithmia.conda_env import Environment as CondaEnvironment
-
-
+from mlflow_algorithmia.bundle import (
+    bundle_extension,
+    bundle_requirements,
+    create_bundle,
+    hash_model_dir,
+)
+from mlflow_algorithmia.delta import MANIFEST_EXTENSION, DeltaUploader
+from mlflow_algorithmia.formats import (
+    OUTPUT_FORMATS,
+    concat_predictions,
+    decode_predictions,
+    encode_dataframe,
+    model_query,
+)
+from mlflow_algorithmia.lock import (
+    DEFAULT_PLATFORM,
+    DEFAULT_PYTHON,
+    RequirementsLock,
+    default_lock_dir,
+)
+from mlflow_algorithmia.signature import compile_signature
+from mlflow_algorithmia.upload import (
+    ChunkedUploader,
+    StreamPipe,
+    ensure_dir,
+    remote_exists,
+    with_retries,
+)
+from mlflow_algorithmia.workspace import WorkspaceCache, default_workspace_dir
+
+
+# Algorithmia, git, jinja2, requests and ruamel.yaml are imported where they are
+# used, MLflow imports this module to discover the plugin and show its help
 logger = logging.getLogger(__name__)
 CURDIR = os.path.dirname(os.path.realpath(__file__))
+# Algorithmia client used by the algorithm source to download the bundle
+ALGORITHMIA_REQUIREMENT = "algorithmia>=1.9.1,<2.0"
+# Smallest keep-alive pool of the Algorithmia client, the requests default
+CLIENT_POOL_SIZE = 10
+# Model keys to bundles of multi-model algorithms, next to the bundles
+MODELS_REGISTRY = "models.json"
 
 
 class AlgorithmiaDeploymentClient(BaseDeploymentClient):
@@ -31,8 +65,10 @@ class AlgorithmiaDeploymentClient(BaseDeploymentClient):
         self.algo = None
         self.run_id = None
         self.mlmodel = None
+        self.bundle_hash = None
         self.settings = Settings()
-        self.client = Algorithmia.client(self.settings["api_key"])
+        self._client = None
+        self._session = None
 
     def create_deployment(self, name, model_uri, flavor=None, config=None):
         """
@@ -40,16 +76,12 @@ class AlgorithmiaDeploymentClient(BaseDeploymentClient):
         1. Creates and uploads a model bundle
         2. Creates the source code
         """
-        self.settings.update(config)
-
         if config and config.get("raiseError") == "True":
             raise RuntimeError("Error requested")
 
-        self.create_algorithm(name)
-        self.update_deployment(
-            name=name, model_uri=model_uri, flavor=flavor, config=config
-        )
-        return {"name": name, "flavor": "Algorithmia"}
+        deployment = self.fork(config)
+        deployment.create_algorithm(name)
+        return deployment.deploy(name, model_uri)
 
     def update_deployment(self, name, model_uri=None, flavor=None, config=None):
         """
@@ -57,35 +89,230 @@ class AlgorithmiaDeploymentClient(BaseDeploymentClient):
         1. Creates and uploads a new model bundle
         2. Updates the source code
         """
-        self.read_model_metadata(model_uri)
-
-        os.makedirs(self.settings["tmp_dir"], exist_ok=True)
-        tar_file = self.create_bundle(model_uri)
-        algo_tar_file = self.upload_bundle(name, tar_file)
+        return self.fork(config).deploy(name, model_uri)
 
-        repo_path = self.repo_clone_or_pull(name)
-        config = {
-            "mlflow_bundle_file": algo_tar_file,
-            "dependencies": self.get_requirements(model_uri),
-        }
-        self.update_source(name, repo_path, **config)
+    def create_deployments(self, deployments, max_workers=4, wait_build=None):
+        """
+        Deploys many MLflow models concurrently sharing the Algorithmia clients
+
+        Parameters
+        ----------
+            deployments: list of dicts with `name`, `model_uri`, optional
+                `config` and `create` (create the algorithm before deploying)
+            max_workers: number of models deployed at the same time
+            wait_build (default=`wait_build` setting): wait for all the builds
+                from a single event loop once every model is pushed
+        Returns
+        -------
+            list with one result dict per deployment in the same order, with
+            a `status` of "deployed", "unchanged" or "failed" and the `error`
+        """
+        if wait_build is None:
+            wait_build = is_true(self.settings["wait_build"])
+
+        def deploy(item):
+            start = time.perf_counter()
+            result = {"name": item["name"], "model_uri": item["model_uri"]}
+            try:
+                # Builds are waited for all together below
+                config = dict(item.get("config") or {}, wait_build=False)
+                deployment = self.fork(config)
+                if item.get("create", False):
+                    deployment.create_algorithm(item["name"])
+                result.update(deployment.deploy(item["name"], item["model_uri"]))
+                result["status"] = "deployed" if result["pushed"] else "unchanged"
+            except Exception as ex:
+                logger.error("Deployment of %s failed: %s", item["name"], ex)
+                result.update(status="failed", error=str(ex))
+            result["duration"] = time.perf_counter() - start
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(deploy, deployments))
+
+        pushed = {r["name"]: r["version"] for r in results if r["status"] == "deployed"}
+        if wait_build and pushed:
+            timeout = self.settings["build_timeout"]
+            builds = self.wait_for_builds(pushed, timeout=timeout)
+            for result in results:
+                build = builds.get(result["name"])
+                if isinstance(build, Exception):
+                    result.update(status="failed", error=str(build))
+                elif build is not None:
+                    result["build_duration"] = build["duration"]
+
+        summary = collections.Counter(result["status"] for result in results)
+        logger.info(
+            "Deployed %d models: %s",
+            len(results),
+            ", ".join(f"{n} {status}" for status, n in sorted(summary.items())),
+        )
+        return results
 
-        self.repo_commit_and_push()
+    def fork(self, config=None):
+        """
+        Copy of the client for a single deployment with its own settings and
+        deployment state (repo, run_id, ...), the Algorithmia client and the
+        HTTP session are shared so forks can deploy concurrently
+        """
+        deployment = copy.copy(self)
+        deployment.settings = copy.copy(self.settings)
+        deployment.settings.update(config or {})
+        deployment._client = self.client
+        deployment._session = self.session
+        deployment.repo = None
+        deployment.algo = None
+        deployment.run_id = None
+        deployment.mlmodel = None
+        deployment.bundle_hash = None
+        return deployment
+
+    def deploy(self, name, model_uri):
+        """
+        Deploys a model to an existing algorithm, used by `create_deployment`
+        and `update_deployment` on a forked client
+
+        The bundle upload runs concurrently with cloning the algorithm repo
+        and rendering the source, the commit waits for both.
+
+        The bundle is named after the content hash of the model directory,
+        if that bundle is already uploaded and the rendered source matches
+        the algorithm repo nothing is uploaded, committed or built and the
+        current version is returned.
+
+        Multi-model algorithms (MLFLOW_ALGO_MULTI_MODEL) register the bundle
+        under MLFLOW_ALGO_MODEL_KEY in their models.json, the source only
+        changes when the model needs requirements the algorithm lacks. A
+        pushed source is always built before the model is registered, even
+        without MLFLOW_ALGO_WAIT_BUILD (e.g. in `create_deployments`).
+        """
+        force = is_true(self.settings["force_deploy"])
+        timer = StageTimer()
+
+        with timer.stage("metadata"):
+            # Fail on invalid settings before uploading anything
+            self.serving_config()
+            self.read_model_metadata(model_uri)
+            self.bundle_hash = hash_model_dir(model_uri)
+            os.makedirs(self.settings["tmp_dir"], exist_ok=True)
+            # The bundle path is known before the upload so the source can be
+            # rendered while it runs
+            algo_tar_file = self.bundle_remote_path(name, self.bundle_fname())
+            dependencies = self.get_requirements(model_uri)
+            if self.settings["bundle_mode"] != "delta":
+                dependencies += bundle_requirements(self.settings["bundle_codec"])
+
+        workspaces = self.workspaces()
+        # Concurrent deployments of the same algorithm on this host wait here
+        with workspaces.lock(self.workspace_key(name)):
+            registry = None
+            if is_true(self.settings["multi_model"]):
+                with timer.stage("registry"):
+                    registry = self.read_registry(name)
+                model_dependencies = dependencies
+                dependencies = self.registry_requirements(registry, dependencies)
+
+            result = self.deploy_source(
+                name, model_uri, algo_tar_file, dependencies, force, timer
+            )
+            if registry is not None:
+                if result["pushed"] and not is_true(self.settings["wait_build"]):
+                    with timer.stage("builds"):
+                        timeout = self.settings["build_timeout"]
+                        self.wait_for_build(name, result["version"], timeout=timeout)
+                with timer.stage("register"):
+                    self.register_model(name, algo_tar_file, model_dependencies)
+                result["model_key"] = self.settings["model_key"]
+        workspaces.evict()
+        timer.report(name)
+        return result
+
+    def deploy_source(self, name, model_uri, algo_tar_file, dependencies, force, timer):
+        """
+        Uploads the bundle while the algorithm source is cloned and rendered,
+        then commits and pushes the source if it changed
+        """
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            bundle = executor.submit(
+                timer.timed("bundle", self.deploy_bundle),
+                name,
+                model_uri,
+                algo_tar_file,
+                force,
+            )
+            clone = executor.submit(timer.timed("clone", self.repo_clone_or_pull), name)
+            lock = None
+            if is_true(self.settings["lock_deps"]):
+                lock = executor.submit(
+                    timer.timed("lock", self.lock_requirements),
+                    model_uri,
+                    dependencies,
+                )
+
+            repo_path = clone.result()
+            with timer.stage("render"):
+                config = {
+                    "mlflow_bundle_file": algo_tar_file,
+                    "algorithmia_requirement": ALGORITHMIA_REQUIREMENT,
+                    "dependencies": dependencies,
+                    "lockfile": lock.result() if lock else None,
+                    "registry_file": self.registry_path(name),
+                    "input_adapter": json.dumps(self.input_columns(), indent=2),
+                }
+                config.update(self.serving_config())
+                changed = self.update_source(name, repo_path, **config)
+
+            # Never push source that points to a bundle that failed to upload
+            bundle.result()
+
+        result = {"name": name, "flavor": "Algorithmia", "pushed": False}
+        if not force and not changed:
+            # The pushed source at HEAD, its build may still be running
+            version = self.repo.head.commit.hexsha
+            logger.info("Algorithm source unchanged, current version: %s", version)
+            return dict(result, version=version)
+
+        with timer.stage("commit"):
+            self.repo_commit_and_push()
+            version = self.repo.head.commit.hexsha
+
+        if is_true(self.settings["wait_build"]):
+            with timer.stage("builds"):
+                timeout = self.settings["build_timeout"]
+                self.wait_for_build(name, version, timeout=timeout)
+            logger.info("New model version ready: %s", version)
+        else:
+            logger.info("New model version pushed: %s", version)
+        return dict(result, version=version, pushed=True)
 
-        version = self.get_builds(name)[0]["commit_sha"]
-        logger.info("New model version ready: %s", version)
-        return {"name": name, "flavor": "Algorithmia"}
+    def deploy_bundle(self, name, model_uri, algo_tar_file, force=False):
+        """
+        Creates and uploads the bundle unless it is already uploaded
+        """
+        if not force and remote_exists(self.client, algo_tar_file):
+            logger.info("MLflow bundle already uploaded: %s", algo_tar_file)
+            return algo_tar_file
+        elif self.settings["bundle_mode"] == "delta":
+            return self.upload_delta(name, model_uri)
+        elif is_true(self.settings["stream_upload"]):
+            return self.stream_bundle(name, model_uri)
+        else:
+            tar_file = self.create_bundle(name, model_uri)
+            algo_tar_file = self.upload_bundle(name, tar_file)
+            # Bundles are content addressed, once uploaded the local copy
+            # is not needed to skip or resume the upload
+            os.remove(tar_file)
+            return algo_tar_file
 
     def list_deployments(self):
         return "To see Algorithmia deployments go to the Algorithmia homepage"
 
     def delete_deployment(self, name):
         """
-        Deletes a deployment in algorithmia and removes local
-        temp directory
+        Deletes a deployment in algorithmia and removes its local
+        workspace, other algorithms workspaces are kept
         """
-        if os.path.exists(self.settings["tmp_dir"]):
-            shutil.rmtree(self.settings["tmp_dir"])
+        self.workspaces().remove(self.workspace_key(name))
         self.delete_algorithm(name)
 
     def get_deployment(self, name):
@@ -99,13 +326,103 @@ class AlgorithmiaDeploymentClient(BaseDeploymentClient):
             "url": algo.url,
         }
 
-    def predict(self, deployment_name, df):
+    def predict(
+        self, deployment_name, df, format=None, output_format=None, model_key=None
+    ):
+        """
+        Run a prediction in the algorithm, `format` is the request encoding:
+        json (default), arrow, npy or npz (see `formats.encode_dataframe`).
+        `output_format` asks for a prediction encoding (json requests only),
+        npy and arrow predictions are returned as ndarray and DataFrame.
+        `model_key` queries that model of a multi-model algorithm (json
+        requests only).
+
+        DataFrames longer than MLFLOW_ALGO_PREDICT_BATCH_ROWS are sent in row
+        chunks, concurrently and retried one by one, the predictions are
+        joined in the original row order.
+        """
         username = self.settings["username"]
         algo_namespace = f"{username}/{deployment_name}"
         algo = self.client.algo(algo_namespace)
+        format = format or self.settings["predict_format"]
+
+        batch_rows = int(self.settings["predict_batch_rows"] or 0)
+        if batch_rows <= 0 or len(df) <= batch_rows:
+            query = encode_dataframe(df, format, output_format)
+            query = model_query(query, model_key)
+            return decode_predictions(algo.pipe(query).result)
+
+        def predict_chunk(start):
+            chunk = df.iloc[start : start + batch_rows]
+            query = encode_dataframe(chunk, format, output_format)
+            query = model_query(query, model_key)
+            return with_retries(
+                lambda: decode_predictions(algo.pipe(query).result),
+                f"rows {start}-{start + len(chunk) - 1}",
+                retries=int(self.settings["predict_retries"]),
+                action="Prediction",
+            )
 
-        query = df.to_json(orient="split")
-        return algo.pipe(query).result
+        # The client connection pool is sized for this when it is created
+        concurrency = int(self.settings["predict_concurrency"])
+        starts = range(0, len(df), batch_rows)
+        logger.info("Predicting %d rows in %d chunks", len(df), len(starts))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            chunks = list(executor.map(predict_chunk, starts))
+        return concat_predictions(chunks)
+
+    def batch_predict(
+        self,
+        deployment_name,
+        input_fpath,
+        output_fpath=None,
+        chunk_rows=None,
+        model_key=None,
+    ):
+        """
+        Score a CSV, Parquet or JSON lines file in the algorithm without
+        sending it in the request: a local `input_fpath` is uploaded to
+        data://<username>/<deployment_name>/batch/ and the algorithm streams
+        it through the model in chunks of `chunk_rows` rows.
+
+        The predictions are written to `output_fpath` (a data:// path,
+        by default next to the input with a .predictions suffix) in the
+        format of its extension. `model_key` scores the file with that model
+        of a multi-model algorithm. Returns the output data:// path.
+        """
+        username = self.settings["username"]
+        batch_dir = f"data://{username}/{deployment_name}/batch"
+        ensure_dir(self.client, f"data://{username}/{deployment_name}")
+        ensure_dir(self.client, batch_dir)
+
+        if input_fpath.startswith("data://"):
+            input_file = input_fpath
+        else:
+            input_file = f"{batch_dir}/{os.path.basename(input_fpath)}"
+            logger.info("Uploading batch input to: %s", input_file)
+            self.upload_file(input_fpath, input_file)
+
+        if output_fpath is None:
+            stem, extension = os.path.splitext(input_file)
+            output_fpath = f"{stem}.predictions{extension}"
+
+        job = {
+            "input_file": input_file,
+            "output_file": output_fpath,
+            "chunk_rows": int(chunk_rows or self.settings["batch_chunk_rows"]),
+        }
+        if model_key is not None:
+            job["model"] = model_key
+        algo = self.client.algo(f"{username}/{deployment_name}")
+        algo.set_options(timeout=int(self.settings["batch_timeout"]))
+        result = algo.pipe(job).result
+        logger.info(
+            "Scored %d rows in %.1fs (%.0f rows/s)",
+            result["rows"],
+            result["seconds"],
+            result["rows_per_second"] or 0,
+        )
+        return result["output_file"]
 
     # Util functions
 
@@ -149,18 +466,186 @@ class AlgorithmiaDeploymentClient(BaseDeploymentClient):
         algo_namespace = f"{username}/{name}"
         return self.client.algo(algo_namespace)
 
-    def get_builds(self, name):
+    @property
+    def client(self):
+        """
+        Algorithmia client, created on first use. Its keep-alive connection
+        pool is sized once, before it is shared, so MLFLOW_ALGO_PREDICT_CONCURRENCY
+        concurrent predict calls reuse their connections.
+        """
+        if self._client is None:
+            import Algorithmia
+            import requests
+
+            client = Algorithmia.client(self.settings["api_key"])
+            size = max(int(self.settings["predict_concurrency"]), CLIENT_POOL_SIZE)
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=size)
+            client.requestSession.mount("http://", adapter)
+            client.requestSession.mount("https://", adapter)
+            self._client = client
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def session(self):
+        """
+        Keep-alive HTTP session for the Algorithmia API,
+        its pool is large enough for concurrent build waits
+        """
+        if self._session is None:
+            import requests
+
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=32)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            api_key = self.settings["api_key"]
+            session.headers["Authorization"] = f"Simple {api_key}"
+            self._session = session
+        return self._session
+
+    def builds_url(self, name):
         api = self.settings["api_endpoint"]
         username = self.settings["username"]
-        url = f"{api}/v1/algorithms/{username}/{name}/builds"
+        return f"{api}/v1/algorithms/{username}/{name}/builds"
 
-        api_key = self.settings["api_key"]
-        headers = {"Authorization": f"Simple {api_key}"}
-        r = requests.get(url, headers=headers)
+    def get_builds(self, name):
+        r = self.session.get(self.builds_url(name))
+        r.raise_for_status()
         return r.json()["results"]
 
+    def build_status(self, name, commit_sha):
+        """
+        Returns the build of a commit or None if it has not started yet
+        """
+        return find_build(self.get_builds(name), commit_sha)
+
+    async def fetch_builds(self, name, session=None):
+        """
+        Same as `get_builds` from an event loop. Polls through an aiohttp
+        `session` or else blocks a thread of the loop default executor.
+        """
+        if session is None:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self.get_builds, name)
+        async with session.get(self.builds_url(name)) as r:
+            r.raise_for_status()
+            return (await r.json())["results"]
+
+    def builds_session(self):
+        """
+        aiohttp session to poll the builds API or None if aiohttp is not
+        installed, it must be created and closed inside the event loop
+        """
+        try:
+            import aiohttp
+        except ImportError:
+            return None
+        api_key = self.settings["api_key"]
+        return aiohttp.ClientSession(headers={"Authorization": f"Simple {api_key}"})
+
+    def wait_for_build(
+        self, name, commit_sha, timeout=None, interval=1, max_interval=15
+    ):
+        """
+        Block until the build of a commit finishes, polling with exponential
+        backoff. Returns the build with a `duration` in seconds and raises
+        MlflowException if the build fails or it takes longer than `timeout`.
+        """
+        results = self.wait_for_builds(
+            {name: commit_sha}, timeout, interval, max_interval
+        )
+        if isinstance(results[name], BaseException):
+            raise results[name]
+        return results[name]
+
+    def wait_for_builds(self, builds, timeout=None, interval=1, max_interval=15):
+        """
+        Wait for the builds of many algorithms from a single event loop.
+        The builds are polled through one aiohttp session, without aiohttp
+        each wait takes a thread of an executor sized to the builds.
+
+        Parameters
+        ----------
+            builds: dict of algorithm name to commit sha
+        Returns
+        -------
+            dict of algorithm name to the build or the exception it raised
+        """
+
+        async def wait_all():
+            names = list(builds)
+            session = self.builds_session()
+            try:
+                results = await asyncio.gather(
+                    *[
+                        self.await_build(
+                            name,
+                            builds[name],
+                            timeout,
+                            interval,
+                            max_interval,
+                            session=session,
+                        )
+                        for name in names
+                    ],
+                    return_exceptions=True,
+                )
+            finally:
+                if session is not None:
+                    await session.close()
+            return dict(zip(names, results))
+
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=max(len(builds), 1))
+        loop.set_default_executor(executor)
+        try:
+            return loop.run_until_complete(wait_all())
+        finally:
+            loop.close()
+            executor.shutdown(wait=False)
+
+    async def await_build(
+        self,
+        name,
+        commit_sha,
+        timeout=None,
+        interval=1,
+        max_interval=15,
+        session=None,
+    ):
+        start = time.monotonic()
+        while True:
+            builds = await self.fetch_builds(name, session)
+            build = find_build(builds, commit_sha)
+            status = build["status"] if build else "pending"
+            elapsed = time.monotonic() - start
+
+            if status == "succeeded":
+                build["duration"] = elapsed
+                logger.info("Build of %s finished in %.1fs", name, elapsed)
+                return build
+            if status == "failed":
+                raise MlflowException(
+                    f"Build {build.get('build_id')} of {name} ({commit_sha}) failed"
+                )
+            if timeout is not None and elapsed + interval > float(timeout):
+                raise MlflowException(
+                    f"Timed out after {elapsed:.0f}s waiting for build of {name} "
+                    f"({commit_sha}), last status: {status}"
+                )
+
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, max_interval)
+
     def delete_algorithm(self, name):
         """Deletes an algorithm in Algorithmia"""
+        from Algorithmia.errors import raiseAlgoApiError
+        from algorithmia_api_client.rest import ApiException
+
         logger.info("Deleting %s deployment in Algorithmia", name)
         try:
             api_response = self.client.manageApi.delete_algorithm(
@@ -176,6 +661,8 @@ class AlgorithmiaDeploymentClient(BaseDeploymentClient):
         """
         Read MLmodel file
         """
+        import ruamel.yaml as yaml
+
         mlmodel_path = os.path.join(model_uri, "MLmodel")
         with open(mlmodel_path, "r") as file:
             mlmodel = yaml.load(file, Loader=yaml.Loader)
@@ -183,61 +670,239 @@ class AlgorithmiaDeploymentClient(BaseDeploymentClient):
         self.mlmodel = mlmodel
         self.run_id = self.mlmodel["run_id"]
 
-    def create_bundle(self, model_uri):
+    def input_columns(self):
+        """
+        Input columns of the model signature, compiled once at deploy time
+        so the algorithm casts requests without inspecting the schema
+        """
+        return compile_signature(self.mlmodel)
+
+    def bundle_fname(self):
+        """
+        Name of the bundle file, unique for each run and model content
+        """
+        bundle_mode = self.settings["bundle_mode"]
+        if bundle_mode == "delta":
+            ext = MANIFEST_EXTENSION
+        elif bundle_mode == "tar":
+            ext = bundle_extension(self.settings["bundle_codec"])
+        else:
+            raise MlflowException(
+                f"Unknown bundle mode '{bundle_mode}', use 'tar' or 'delta'"
+            )
+        return f"model-{self.run_id}-{self.bundle_hash[:16]}{ext}"
+
+    def registry_path(self, name):
+        username = self.settings["username"]
+        return f"data://{username}/{name}/{MODELS_REGISTRY}"
+
+    def read_registry(self, name):
         """
-        Creates a .tar.gz bundle from the MLflow model
+        Models of a multi-model algorithm:
+            {"models": {<key>: {"bundle": "data://...", "run_id": ...,
+                                "dependencies": [...]}}}
         """
-        logger.info("Creating Mlflow bundle")
-        tar_fname = f"model-{self.run_id}.tar.gz"
-        tar_fpath = os.path.join(self.settings["tmp_dir"], tar_fname)
-        with tarfile.open(tar_fpath, "w:gz") as tar:
-            source_dir = model_uri
-            tar.add(source_dir, arcname=tar_fname[: -len(".tar.gz")])
+        fpath = self.registry_path(name)
+        if not self.client.file(fpath).exists():
+            return {"models": {}}
+        return self.client.file(fpath).getJson()
 
+    def registry_requirements(self, registry, dependencies):
+        """
+        Requirements of the algorithm, shared by the registered models and
+        the one being deployed
+        """
+        from mlflow_algorithmia.conda_env import merge_requirements
+
+        key = self.settings["model_key"]
+        others = [
+            model["dependencies"]
+            for other, model in sorted(registry["models"].items())
+            if other != key
+        ]
+        return merge_requirements(*others, dependencies)
+
+    def register_model(self, name, algo_tar_file, dependencies):
+        """
+        Adds or replaces the model in models.json. Deploys to the algorithm
+        from this host hold the workspace lock, the registry is read again
+        right before it is written so only this model key changes.
+        """
+        key = self.settings["model_key"]
+        registry = self.read_registry(name)
+        registry["models"][key] = {
+            "bundle": algo_tar_file,
+            "run_id": self.run_id,
+            "dependencies": dependencies,
+            "input_columns": self.input_columns(),
+        }
+        self.client.file(self.registry_path(name)).putJson(registry)
+        logger.info("Model %s registered: %s", key, algo_tar_file)
+
+    def bundle_remote_path(self, name, tar_fname):
+        username = self.settings["username"]
+        return f"data://{username}/{name}/{tar_fname}"
+
+    def create_bundle(self, name, model_uri):
+        """
+        Creates a .tar.gz or .tar.zst bundle from the MLflow model
+
+        The bundle is written to a per algorithm directory so the same model
+        can be deployed to several algorithms at once
+        """
+        codec = self.settings["bundle_codec"]
+        tmp_dir = os.path.join(self.settings["tmp_dir"], name)
+        os.makedirs(tmp_dir, exist_ok=True)
+        tar_fpath = os.path.join(tmp_dir, self.bundle_fname())
+        # Left by a failed upload, reusing it keeps the bytes of the parts
+        # already uploaded so the upload resumes
+        if os.path.exists(tar_fpath):
+            logger.info("Using existing Mlflow bundle: %s", tar_fpath)
+            return tar_fpath
+
+        logger.info("Creating Mlflow bundle (codec: %s)", codec)
+        # Written under a temporary name so a partial bundle is never reused
+        with open(tar_fpath + ".tmp", "wb") as file:
+            self.write_bundle(model_uri, file)
+        os.replace(tar_fpath + ".tmp", tar_fpath)
         return tar_fpath
 
+    def write_bundle(self, model_uri, fileobj):
+        codec = self.settings["bundle_codec"]
+        arcname = self.bundle_fname()[: -len(bundle_extension(codec))]
+        threads = self.settings["bundle_threads"]
+        create_bundle(
+            model_uri,
+            fileobj,
+            arcname=arcname,
+            codec=codec,
+            threads=int(threads) if threads else None,
+            level=int(self.settings["bundle_level"]),
+        )
+
+    def stream_bundle(self, name, model_uri):
+        """
+        Creates the bundle and uploads it at the same time without a temp file,
+        the compressor writes into a bounded buffer that the upload drains
+        """
+        logger.info("Creating and uploading Mlflow bundle")
+        username = self.settings["username"]
+        ensure_dir(self.client, f"data://{username}/{name}")
+        algo_file = self.bundle_remote_path(name, self.bundle_fname())
+        buffer_size = int(self.settings["stream_buffer_size"]) * 1024 * 1024
+        pipe = StreamPipe(max_bytes=buffer_size)
+
+        def produce():
+            try:
+                self.write_bundle(model_uri, pipe)
+            except BaseException as ex:
+                pipe.close(error=ex)
+                raise
+            pipe.close()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            producer = executor.submit(produce)
+            try:
+                self.upload_stream(pipe, algo_file)
+            except BaseException:
+                pipe.abort()
+                raise
+            producer.result()
+
+        logger.info("MLflow bundle uploaded to: %s", algo_file)
+        return algo_file
+
+    def upload_stream(self, stream, algo_file):
+        if self.settings["upload_mode"] == "chunked":
+            self.chunked_uploader().upload_stream(stream, algo_file)
+        else:
+            # A generator makes requests send the body with chunked encoding
+            url = self.client.file(algo_file).url
+            self.client.putHelper(url, iter(stream))
+
+    def chunked_uploader(self):
+        return ChunkedUploader(
+            self.client,
+            part_size=int(self.settings["upload_part_size"]) * 1024 * 1024,
+            workers=self.settings["upload_workers"],
+            retries=self.settings["upload_retries"],
+        )
+
     def upload_bundle(self, name, tar_fpath):
         """
         Upload the MLflow bundle to algorithmia
         """
-        logger.info("Uploading Mlflow bundle")
+        upload_mode = self.settings["upload_mode"]
+        logger.info("Uploading Mlflow bundle (mode: %s)", upload_mode)
         username = self.settings["username"]
         algo_data_dir = f"data://{username}/{name}"
-
-        if not self.client.dir(algo_data_dir).exists():
-            self.client.dir(algo_data_dir).create()
+        ensure_dir(self.client, algo_data_dir)
 
         tar_fname = os.path.basename(tar_fpath)
-        algo_file = os.path.join(algo_data_dir, tar_fname)
-        self.client.file(algo_file).putFile(tar_fpath)
+        algo_file = self.bundle_remote_path(name, tar_fname)
+        self.upload_file(tar_fpath, algo_file)
         logger.info("MLflow bundle uploaded to: %s", algo_file)
         return algo_file
 
-    def repo_clone_or_pull(self, name):
+    def upload_file(self, local_fpath, algo_file):
+        """
+        Upload a local file to a data:// path using the configured upload mode
         """
-        Clones a repository from Algorithmia to the temp directory
-        If repo it's already cloned then pulls any changes
-        """
-        target_dir = self.settings["tmp_dir"]
-        logger.info("Cloning algorithm source to: %s", target_dir)
-        os.makedirs(target_dir, exist_ok=True)
-        repo_path = os.path.join(target_dir, name)
-
-        if not os.path.exists(repo_path):
-            username = self.settings["username"]
-            encoded_api_key = self.settings["encoded_api_key"]
-            git_endpoint = self.settings["git_endpoint"]
-            username = self.settings["username"]
-            algo_name = name
-            algo_repo = f"https://{username}:{encoded_api_key}@{git_endpoint}/git/{username}/{algo_name}.git"
-            self.repo = Repo.clone_from(algo_repo, repo_path)
-            # self.repo = Repo.clone_from(algo_repo, repo_path, progress=Progress())
+        upload_mode = self.settings["upload_mode"]
+        if upload_mode == "chunked":
+            self.chunked_uploader().upload(local_fpath, algo_file)
+        elif upload_mode == "single":
+            self.client.file(algo_file).putFile(local_fpath)
         else:
-            self.repo = Repo(repo_path)
-            origin = self.repo.remote(name="origin")
-            origin.pull()
+            raise MlflowException(
+                f"Unknown upload mode '{upload_mode}', use 'single' or 'chunked'"
+            )
 
-        return repo_path
+    def upload_delta(self, name, model_uri):
+        """
+        Upload only the model files (or large file chunks) that are not in the
+        algorithm object store yet plus a manifest of this model version
+        """
+        logger.info("Uploading Mlflow delta bundle")
+        username = self.settings["username"]
+        uploader = DeltaUploader(
+            self.client,
+            f"data://{username}/{name}",
+            workers=self.settings["upload_workers"],
+            retries=self.settings["upload_retries"],
+        )
+        chunk_size = int(self.settings["delta_chunk_size"]) * 1024 * 1024
+        algo_file = uploader.upload(model_uri, self.bundle_fname(), chunk_size)
+        logger.info("MLflow bundle manifest uploaded to: %s", algo_file)
+        return algo_file
+
+    def algo_repo_url(self, name):
+        username = self.settings["username"]
+        encoded_api_key = self.settings["encoded_api_key"]
+        git_endpoint = self.settings["git_endpoint"]
+        return f"https://{username}:{encoded_api_key}@{git_endpoint}/git/{username}/{name}.git"
+
+    def workspaces(self):
+        return WorkspaceCache(
+            self.settings["workspace_dir"],
+            max_bytes=int(self.settings["workspace_max_size"]) * 1024 * 1024,
+            max_age=float(self.settings["workspace_max_age"]) * 24 * 3600,
+        )
+
+    def workspace_key(self, name):
+        git_endpoint = self.settings["git_endpoint"]
+        return WorkspaceCache.key(git_endpoint, self.settings["username"], name)
+
+    def repo_clone_or_pull(self, name):
+        """
+        Returns the path of an up to date shallow clone of the algorithm repo
+        from the workspace cache, cloning it if it is not cached
+        """
+        workspaces = self.workspaces()
+        key = self.workspace_key(name)
+        logger.info("Updating algorithm source in: %s", workspaces.path(key))
+        self.repo = workspaces.checkout(key, self.algo_repo_url(name))
+        return workspaces.path(key)
 
     def repo_commit_and_push(self):
         logger.info("Updating algorithm source and building model")
@@ -248,45 +913,148 @@ class AlgorithmiaDeploymentClient(BaseDeploymentClient):
         origin.push()
         logger.info("Algorithm repo updated: %s", commit_msg)
 
-    def update_source(self, name, repo_path, **kwargs):
-        _ = os.path.join(repo_path, ".gitignore")
-        self.render_file("gitignore_repo", _, **kwargs)
-
-        _ = os.path.join(repo_path, "requirements.txt")
-        self.render_file("requirements.txt", _, **kwargs)
-
-        _ = os.path.join(repo_path, "src", f"{name}.py")
-        self.render_file("entrypoint.py", _, **kwargs)
-
-        _ = os.path.join(repo_path, "src", "algorithmia_utils.py")
-        self.render_file("algorithmia_utils.py", _, **kwargs)
-
-        _ = os.path.join(repo_path, "src", "mlflow_wrapper.py")
-        self.render_file("mlflow_wrapper.py", _, **kwargs)
-
-        _ = os.path.join(repo_path, "models")
-        os.makedirs(_, exist_ok=True)
+    def serving_config(self):
+        """
+        Template variables that control how the algorithm loads the model
+        """
+        serving_mode = self.settings["serving_mode"]
+        if serving_mode not in ("lazy", "eager"):
+            raise MlflowException(
+                f"Unknown serving mode: {serving_mode}, use 'lazy' or 'eager'"
+            )
+        output_format = self.settings["output_format"]
+        if output_format not in OUTPUT_FORMATS:
+            raise MlflowException(
+                f"Unknown output format: {output_format}, "
+                f"use one of: {', '.join(OUTPUT_FORMATS)}"
+            )
+        predict_workers = str(self.settings["predict_workers"])
+        if predict_workers != "auto" and not predict_workers.isdigit():
+            raise MlflowException(
+                f"Invalid predict workers: {predict_workers}, use a number or 'auto'"
+            )
+        predict_pool = self.settings["predict_pool"]
+        if predict_pool not in ("thread", "process"):
+            raise MlflowException(
+                f"Unknown predict pool: {predict_pool}, use 'thread' or 'process'"
+            )
+        return {
+            "serving_mode": serving_mode,
+            "warmup": is_true(self.settings["warmup"]),
+            "output_format": output_format,
+            "output_threshold": int(self.settings["output_threshold"]),
+            "predict_workers": predict_workers,
+            "predict_chunk_rows": int(self.settings["predict_chunk_rows"]),
+            "predict_pool": predict_pool,
+            "cache_entries": int(self.settings["cache_entries"]),
+            "cache_size": int(self.settings["cache_size"]),
+            "cache_ttl": int(self.settings["cache_ttl"]),
+            "multi_model": is_true(self.settings["multi_model"]),
+            "pool_size": int(self.settings["pool_size"]),
+            "registry_ttl": int(self.settings["registry_ttl"]),
+        }
 
-        _ = os.path.join(repo_path, "models", ".gitignore")
-        self.render_file("gitignore_all", _, **kwargs)
+    def update_source(self, name, repo_path, **kwargs):
+        """
+        Renders the algorithm source in the repo, only the files whose content
+        changed are written. Returns True if any file changed.
+        """
+        os.makedirs(os.path.join(repo_path, "models"), exist_ok=True)
+        entrypoint = "entrypoint.py"
+        if kwargs.get("multi_model"):
+            entrypoint = "multi_entrypoint.py"
+        files = [
+            ("gitignore_repo", ".gitignore"),
+            ("requirements.txt", "requirements.txt"),
+            (entrypoint, os.path.join("src", f"{name}.py")),
+            ("algorithmia_utils.py", os.path.join("src", "algorithmia_utils.py")),
+            ("mlflow_wrapper.py", os.path.join("src", "mlflow_wrapper.py")),
+            ("batch_job.py", os.path.join("src", "batch_job.py")),
+            ("gitignore_all", os.path.join("models", ".gitignore")),
+        ]
+        if not kwargs.get("multi_model"):
+            # Multi-model algorithms keep the columns of each model in models.json
+            adapter = os.path.join("src", "input_adapter.json")
+            files.append(("input_adapter.json", adapter))
+        changed = False
+        for template, fpath in files:
+            out = os.path.join(repo_path, fpath)
+            changed = self.render_file(template, out, **kwargs) or changed
+        return changed
 
     def render_file(self, inp, out, **kwargs):
-        file_loader = FileSystemLoader(os.path.join(CURDIR, "templates"))
-        env = Environment(loader=file_loader)
-        template = env.get_template(inp)
-        output = template.render(**kwargs)
+        """
+        Renders a template to `out` unless it already has the same content,
+        returns True if the file was written
+        """
+        output = template_env().get_template(inp).render(**kwargs)
+        if os.path.exists(out):
+            with open(out, "r") as file:
+                if file.read() == output:
+                    return False
 
         with open(out, "w") as file:
             file.write(output)
+        return True
 
     def get_requirements(self, model_uri):
         """
         Return a list of requirements based on the MLflow conda.yaml
         """
+        from mlflow_algorithmia.conda_env import Environment as CondaEnvironment
+
         conda_yaml_path = os.path.join(model_uri, "conda.yaml")
         environemnt = CondaEnvironment.from_file(conda_yaml_path)
         return environemnt.list_deps()
 
+    def lock_requirements(self, model_uri, dependencies):
+        """
+        Returns a pinned, hash annotated requirements.txt for the algorithm,
+        cached by the MLflow conda.yaml content
+        """
+        from mlflow_algorithmia.conda_env import Environment as CondaEnvironment
+
+        conda_yaml_path = os.path.join(model_uri, "conda.yaml")
+        with open(conda_yaml_path, "rb") as file:
+            source = file.read()
+
+        python_version = self.settings["lock_python"]
+        if not python_version:
+            environment = CondaEnvironment.from_file(conda_yaml_path)
+            python_version = environment.python_version() or DEFAULT_PYTHON
+
+        lock = RequirementsLock(
+            self.settings["lock_dir"],
+            python_version=python_version,
+            platform=self.settings["lock_platform"],
+            index_url=self.settings["lock_index_url"],
+            find_links=self.settings["lock_find_links"],
+        )
+        return lock.lock(source, [ALGORITHMIA_REQUIREMENT] + dependencies)
+
+
+def find_build(builds, commit_sha):
+    """
+    Build of a commit in a list of builds or None if it has not started yet
+    """
+    for build in builds:
+        if build["commit_sha"] == commit_sha:
+            return build
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def template_env():
+    """
+    Jinja environment of the algorithm source templates, shared by all the
+    deployments so each template is compiled once per process
+    """
+    from jinja2 import Environment, FileSystemLoader
+
+    loader = FileSystemLoader(os.path.join(CURDIR, "templates"))
+    # Templates ship with the package, no need to check them for changes
+    return Environment(loader=loader, auto_reload=False)
+
 
 class Settings(dict):
     def __init__(self):
@@ -323,6 +1091,15 @@ class Settings(dict):
         default_tmp_dir = "./algorithmia_tmp/"
         self["tmp_dir"] = os.environ.get("MLFLOW_ALGO_TMP_DIR", default_tmp_dir)
 
+        # Cache of algorithm repo clones shared by all deployments on the host
+        self["workspace_dir"] = os.environ.get(
+            "MLFLOW_ALGO_WORKSPACE_DIR", default_workspace_dir()
+        )
+        self["workspace_max_size"] = os.environ.get(
+            "MLFLOW_ALGO_WORKSPACE_MAX_SIZE", 2048
+        )
+        self["workspace_max_age"] = os.environ.get("MLFLOW_ALGO_WORKSPACE_MAX_AGE", 7)
+
         self["package_set"] = os.environ.get("ALGO_PACKAGE_SET", "python37")
         self["language"] = os.environ.get("ALGO_LANGUAGE", "python3")
         self["environment_id"] = os.environ.get("ALGO_ENV_ID", None)
@@ -331,12 +1108,123 @@ class Settings(dict):
         self["network_access"] = os.environ.get("ALGO_NETWORK_ACCESS", "full")
         self["pipeline_enabled"] = os.environ.get("ALGO_PIPELINE", True)
 
-class Progress(remote.RemoteProgress):
-    def line_dropped(self, line):
-        print(line)
+        # Bundle format: tar archive or delta (content addressed objects + manifest)
+        self["bundle_mode"] = os.environ.get("MLFLOW_ALGO_BUNDLE_MODE", "tar")
+        self["delta_chunk_size"] = os.environ.get("MLFLOW_ALGO_DELTA_CHUNK_SIZE", 64)
+
+        # Bundle compression: gz, pgz (parallel gzip) or zst (parallel zstandard)
+        self["bundle_codec"] = os.environ.get("MLFLOW_ALGO_BUNDLE_CODEC", "pgz")
+        self["bundle_threads"] = os.environ.get("MLFLOW_ALGO_BUNDLE_THREADS", None)
+        self["bundle_level"] = os.environ.get("MLFLOW_ALGO_BUNDLE_LEVEL", 6)
+
+        # Bundle upload: single request or concurrent resumable parts
+        self["upload_mode"] = os.environ.get("MLFLOW_ALGO_UPLOAD_MODE", "single")
+        self["upload_part_size"] = os.environ.get("MLFLOW_ALGO_UPLOAD_PART_SIZE", 64)
+        self["upload_workers"] = os.environ.get("MLFLOW_ALGO_UPLOAD_WORKERS", 4)
+        self["upload_retries"] = os.environ.get("MLFLOW_ALGO_UPLOAD_RETRIES", 5)
+
+        # Compress and upload the bundle concurrently without a temp file
+        self["stream_upload"] = os.environ.get("MLFLOW_ALGO_STREAM_UPLOAD", False)
+        self["stream_buffer_size"] = os.environ.get("MLFLOW_ALGO_STREAM_BUFFER", 64)
+
+        # Wait for the algorithm build of the pushed commit
+        self["wait_build"] = os.environ.get("MLFLOW_ALGO_WAIT_BUILD", True)
+        self["build_timeout"] = os.environ.get("MLFLOW_ALGO_BUILD_TIMEOUT", 1800)
+
+        # Pin and hash the algorithm requirements, resolved once per conda.yaml
+        self["lock_deps"] = os.environ.get("MLFLOW_ALGO_LOCK_DEPS", False)
+        self["lock_dir"] = os.environ.get("MLFLOW_ALGO_LOCK_DIR", default_lock_dir())
+        self["lock_python"] = os.environ.get("MLFLOW_ALGO_LOCK_PYTHON", None)
+        self["lock_platform"] = os.environ.get(
+            "MLFLOW_ALGO_LOCK_PLATFORM", DEFAULT_PLATFORM
+        )
+        self["lock_index_url"] = os.environ.get("MLFLOW_ALGO_LOCK_INDEX_URL", None)
+        self["lock_find_links"] = os.environ.get("MLFLOW_ALGO_LOCK_FIND_LINKS", None)
+
+        # Load the model when the algorithm starts instead of on the first
+        # request and warm it up with the MLmodel input_example
+        self["serving_mode"] = os.environ.get("MLFLOW_ALGO_SERVING_MODE", "lazy")
+        self["warmup"] = os.environ.get("MLFLOW_ALGO_WARMUP", False)
+
+        # Request and prediction encodings
+        self["predict_format"] = os.environ.get("MLFLOW_ALGO_PREDICT_FORMAT", "json")
+        self["output_format"] = os.environ.get("MLFLOW_ALGO_OUTPUT_FORMAT", "auto")
+        self["output_threshold"] = os.environ.get("MLFLOW_ALGO_OUTPUT_THRESHOLD", 10000)
+
+        # Send large predict DataFrames in concurrent row chunks
+        self["predict_batch_rows"] = os.environ.get("MLFLOW_ALGO_PREDICT_BATCH_ROWS", 0)
+        self["predict_concurrency"] = os.environ.get(
+            "MLFLOW_ALGO_PREDICT_CONCURRENCY", 4
+        )
+        self["predict_retries"] = os.environ.get("MLFLOW_ALGO_PREDICT_RETRIES", 3)
+
+        # Split large inputs in row chunks predicted in parallel by the algorithm
+        self["predict_workers"] = os.environ.get("MLFLOW_ALGO_PREDICT_WORKERS", 1)
+        self["predict_chunk_rows"] = os.environ.get(
+            "MLFLOW_ALGO_PREDICT_CHUNK_ROWS", 10000
+        )
+        self["predict_pool"] = os.environ.get("MLFLOW_ALGO_PREDICT_POOL", "thread")
+
+        # Per row prediction cache of the algorithm, 0 entries disables it
+        self["cache_entries"] = os.environ.get("MLFLOW_ALGO_CACHE_ENTRIES", 0)
+        self["cache_size"] = os.environ.get("MLFLOW_ALGO_CACHE_SIZE", 64)
+        self["cache_ttl"] = os.environ.get("MLFLOW_ALGO_CACHE_TTL", 0)
+
+        # Serve many models from one algorithm, routed by model key
+        self["multi_model"] = os.environ.get("MLFLOW_ALGO_MULTI_MODEL", False)
+        self["model_key"] = os.environ.get("MLFLOW_ALGO_MODEL_KEY", "default")
+        self["pool_size"] = os.environ.get("MLFLOW_ALGO_POOL_SIZE", 4096)
+        self["registry_ttl"] = os.environ.get("MLFLOW_ALGO_REGISTRY_TTL", 60)
+
+        # Batch jobs, Algorithmia stops algorithm calls after 3000s at most
+        self["batch_chunk_rows"] = os.environ.get("MLFLOW_ALGO_BATCH_CHUNK_ROWS", 10000)
+        self["batch_timeout"] = os.environ.get("MLFLOW_ALGO_BATCH_TIMEOUT", 3000)
+
+        # Deploy even if the model bundle and algorithm source are unchanged
+        self["force_deploy"] = os.environ.get("MLFLOW_ALGO_FORCE_DEPLOY", False)
+
+
+def is_true(value):
+    """
+    Parse a boolean setting, values from env variables and
+    `mlflow deployments -C` are strings
+
+    Examples:
+        >>> is_true("True"), is_true("0"), is_true(None)
+        (True, False, False)
+    """
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+class StageTimer(object):
+    """
+    Records the wall clock time of the deployment stages,
+    stages can run concurrently in different threads
+    """
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def timed(self, name, func):
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
 
-    def update(self, op_code, cur_count, max_count=None, message=""):
-        print(self._cur_line)
+    def report(self, name):
+        total = time.perf_counter() - self.start
+        stages = ", ".join(f"{k}: {v:.1f}s" for k, v in self.timings.items())
+        logger.info("Deployment of %s took %.1fs (%s)", name, total, stages)
 
 
 def run_local(name, model_uri, flavor=None, config=None):
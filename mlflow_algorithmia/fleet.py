@@ -0,0 +1,89 @@
+import argparse
+import json
+import logging
+import sys
+
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia.conda_env import yaml_safe_load
+from mlflow_algorithmia.deployment import AlgorithmiaDeploymentClient
+
+
+logger = logging.getLogger(__name__)
+
+
+def read_manifest(fpath):
+    """
+    Read a YAML (or JSON) fleet manifest:
+
+        config:               # optional, applied to every deployment
+          bundle_codec: zst
+        deployments:
+        - name: churn_model
+          model_uri: mlruns/0/<run-id>/artifacts/model
+          create: true        # optional, create the algorithm first
+          config:             # optional, overrides the shared config
+            upload_mode: chunked
+
+    Returns the list of deployments with the shared config merged in
+    """
+    with open(fpath, "r") as file:
+        manifest = yaml_safe_load(file.read())
+
+    if isinstance(manifest, list):
+        manifest = {"deployments": manifest}
+
+    shared = manifest.get("config") or {}
+    deployments = []
+    for item in manifest.get("deployments") or []:
+        if "name" not in item or "model_uri" not in item:
+            raise MlflowException(
+                f"Every deployment needs a name and a model_uri, got: {item}"
+            )
+        config = dict(shared, **(item.get("config") or {}))
+        deployments.append(dict(item, config=config))
+    return deployments
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Deploy many MLflow models to Algorithmia concurrently"
+    )
+    parser.add_argument("manifest", help="YAML or JSON file with the deployments")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=4, help="models deployed at once"
+    )
+    parser.add_argument(
+        "--no-wait", action="store_true", help="do not wait for the algorithm builds"
+    )
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+    # The library leaves logging to the application, the CLI prints progress
+    logging.basicConfig(
+        stream=sys.stdout, level=logging.INFO, format="%(levelname)s: %(message)s"
+    )
+
+    deployments = read_manifest(args.manifest)
+    client = AlgorithmiaDeploymentClient("algorithmia")
+    results = client.create_deployments(
+        deployments,
+        max_workers=args.workers,
+        wait_build=False if args.no_wait else None,
+    )
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report)
+    else:
+        print(report)
+
+    failed = [result["name"] for result in results if result["status"] == "failed"]
+    if failed:
+        logger.error("Failed deployments: %s", ", ".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
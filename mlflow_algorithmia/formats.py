@@ -0,0 +1,131 @@
+import base64
+import io
+
+from mlflow.exceptions import MlflowException
+
+
+# Request formats understood by the algorithm, json is the pandas split orient
+FORMATS = ("json", "arrow", "npy", "npz")
+# Prediction encodings of the algorithm, see mlflow_wrapper.encode_output
+OUTPUT_FORMATS = ("auto", "list", "npy", "arrow", "bytes")
+
+
+def encode_dataframe(df, format="json", output_format=None):
+    """
+    Encode a DataFrame as the input of the deployed algorithm
+
+    - json: str in the pandas split orient
+    - arrow: bytes of an Arrow IPC stream, keeps column names and dtypes
+    - npy: bytes of a single 2D NumPy array, numeric columns only
+    - npz: bytes of a NumPy .npz with one array per column, numeric columns only
+
+    `output_format` is sent along json requests to choose the encoding of
+    the predictions, binary requests use the algorithm default
+    """
+    if output_format is not None:
+        if output_format not in OUTPUT_FORMATS:
+            raise MlflowException(
+                f"Unknown output format: {output_format}, "
+                f"use one of: {', '.join(OUTPUT_FORMATS)}"
+            )
+        if format != "json":
+            raise MlflowException("output_format can only be sent in json requests")
+        split = df.to_json(orient="split")
+        return f'{{"dataframe_split": {split}, "output_format": "{output_format}"}}'
+
+    if format == "json":
+        return df.to_json(orient="split")
+    elif format == "arrow":
+        return encode_arrow(df)
+    elif format in ("npy", "npz"):
+        return encode_numpy(df, format)
+
+    raise MlflowException(
+        f"Unknown predict format: {format}, use one of: {', '.join(FORMATS)}"
+    )
+
+
+def model_query(query, model_key=None):
+    """
+    Wraps an encoded query for the model `model_key` of a multi-model
+    algorithm: {"model": <key>, "input": <query>}, json queries only
+    """
+    if model_key is None:
+        return query
+    if not isinstance(query, str):
+        raise MlflowException("model_key can only be sent in json requests")
+    return {"model": model_key, "input": query}
+
+
+def encode_arrow(df):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise MlflowException("The arrow format requires: pip install pyarrow")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_numpy(df, format):
+    import numpy as np
+
+    if format == "npy":
+        arrays = {"values": df.to_numpy()}
+    else:
+        arrays = {str(column): df[column].to_numpy() for column in df.columns}
+
+    # Object arrays would need pickle, which the algorithm does not load
+    if any(values.dtype.hasobject for values in arrays.values()):
+        raise MlflowException(
+            f"The {format} format only supports numeric columns, use arrow"
+        )
+
+    buffer = io.BytesIO()
+    if format == "npy":
+        np.save(buffer, arrays["values"], allow_pickle=False)
+    else:
+        np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def concat_predictions(chunks):
+    """
+    Joins the decoded predictions of consecutive row chunks in order
+    """
+    import numpy as np
+    import pandas as pd
+
+    first = chunks[0]
+    if isinstance(first, list):
+        return [row for chunk in chunks for row in chunk]
+    if isinstance(first, (pd.DataFrame, pd.Series)):
+        return pd.concat(chunks, ignore_index=True)
+    return np.concatenate(chunks)
+
+
+def decode_predictions(result):
+    """
+    Decode the predictions returned by the algorithm: npy envelopes and
+    bytes become an ndarray, arrow ones a DataFrame and lists are unchanged
+    """
+    if isinstance(result, dict) and set(result) == {"format", "data"}:
+        data = base64.b64decode(result["data"])
+    elif isinstance(result, (bytes, bytearray)):
+        data = bytes(result)
+    else:
+        return result
+
+    if data.startswith(b"\x93NUMPY"):
+        import numpy as np
+
+        return np.load(io.BytesIO(data), allow_pickle=False)
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise MlflowException("Decoding arrow predictions requires pyarrow")
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from mlflow.exceptions import MlflowException
+
+
+logger = logging.getLogger(__name__)
+
+# Algorithmia builders run Linux x86_64
+DEFAULT_PLATFORM = "manylinux2014_x86_64"
+DEFAULT_PYTHON = "3.8"
+# pip install --dry-run --report
+MIN_PIP_VERSION = "22.2"
+
+
+def default_lock_dir():
+    cache_dir = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(cache_dir, "mlflow-algorithmia", "locks")
+
+
+def pip_version():
+    """
+    Version of the pip that resolves the requirements, the one of this interpreter
+    """
+    try:
+        import pip
+    except ImportError:
+        return None
+    return pip.__version__
+
+
+def check_pip():
+    from packaging.version import Version
+
+    version = pip_version()
+    if version is None or Version(version) < Version(MIN_PIP_VERSION):
+        raise MlflowException(
+            f"Locking requirements needs pip>={MIN_PIP_VERSION} (found: {version}), "
+            "upgrade it with: python -m pip install -U pip"
+        )
+
+
+def archive_hash(item):
+    """
+    sha256 of a distribution in a pip install report, None if it is not an
+    archive (VCS or local directory)
+    """
+    download_info = item["download_info"]
+    archive_info = download_info.get("archive_info")
+    if archive_info is None:
+        return None
+
+    sha256 = archive_info.get("hashes", {}).get("sha256")
+    if sha256 is None and archive_info.get("hash", "").startswith("sha256="):
+        sha256 = archive_info["hash"][len("sha256=") :]
+
+    url = urlparse(download_info["url"])
+    if sha256 is None and url.scheme == "file":
+        sha256 = hashlib.sha256()
+        with open(url2pathname(url.path), "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                sha256.update(block)
+        sha256 = sha256.hexdigest()
+    return sha256
+
+
+def format_lockfile(report):
+    """
+    Pinned requirements.txt lines from a pip install report, with hashes
+    when every distribution has one (pip checks all of them or none)
+    """
+    pins = []
+    for item in report["install"]:
+        name = item["metadata"]["name"]
+        version = item["metadata"]["version"]
+        sha256 = archive_hash(item)
+        if sha256 is None:
+            url = item["download_info"]["url"]
+            pins.append((name.lower(), f"{name} @ {url}", None))
+        else:
+            pins.append((name.lower(), f"{name}=={version}", sha256))
+
+    pins.sort()
+    with_hashes = all(sha256 is not None for _, _, sha256 in pins)
+    if not with_hashes:
+        logger.warning("Some requirements are not archives, locking without hashes")
+
+    lines = []
+    for _, pin, sha256 in pins:
+        lines.append(f"{pin} --hash=sha256:{sha256}" if with_hashes else pin)
+    return lines
+
+
+class RequirementsLock(object):
+    """
+    Resolves requirements once into a fully pinned, hash annotated
+    requirements.txt so the Algorithmia builds do not resolve them again
+
+    Lockfiles are cached on disk by the content of the conda.yaml they come
+    from and the resolver options, repeated deploys of a model reuse them.
+
+    Parameters
+    ----------
+        cache_dir: directory with the cached lockfiles
+        python_version: Python version of the algorithm environment
+        platform: pip platform tag of the builders, only wheels are used when
+            it is set. Empty to resolve for the local interpreter instead.
+        index_url: package index to resolve from
+        find_links: local directory (wheel cache) or URL with distributions
+    """
+
+    def __init__(
+        self,
+        cache_dir,
+        python_version=DEFAULT_PYTHON,
+        platform=DEFAULT_PLATFORM,
+        index_url=None,
+        find_links=None,
+    ):
+        self.cache_dir = cache_dir
+        self.python_version = python_version
+        self.platform = platform
+        self.index_url = index_url
+        self.find_links = find_links
+
+    def key(self, source, requirements):
+        """
+        Cache key of the lockfile of `requirements` read from `source`
+        (the conda.yaml content)
+        """
+        key = hashlib.sha256(source)
+        options = [
+            requirements,
+            self.python_version,
+            self.platform,
+            self.index_url,
+            self.find_links,
+        ]
+        key.update(json.dumps(options).encode())
+        return key.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def lock(self, source, requirements):
+        """
+        Returns the lockfile content for `requirements`, resolving them only
+        if there is no cached lockfile for the same source and options
+        """
+        fpath = self.path(self.key(source, requirements))
+        if os.path.exists(fpath):
+            logger.info("Using cached requirements lockfile: %s", fpath)
+            with open(fpath, "r") as file:
+                return file.read()
+
+        logger.info("Locking %d requirements", len(requirements))
+        content = "\n".join(self.resolve(requirements)) + "\n"
+
+        # Write and rename so concurrent deploys never read a partial file
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_fpath = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            file.write(content)
+        os.replace(tmp_fpath, fpath)
+        return content
+
+    def resolve(self, requirements):
+        """
+        Resolves `requirements` with `pip install --dry-run --report`,
+        nothing is installed
+        """
+        check_pip()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            requirements_in = os.path.join(tmp_dir, "requirements.in")
+            with open(requirements_in, "w") as file:
+                file.write("\n".join(requirements) + "\n")
+
+            report_fpath = os.path.join(tmp_dir, "report.json")
+            cmd = [
+                sys.executable,
+                "-m",
+                "pip",
+                "install",
+                "--dry-run",
+                "--ignore-installed",
+                "--quiet",
+                "--disable-pip-version-check",
+                "--report",
+                report_fpath,
+                "-r",
+                requirements_in,
+            ]
+            if self.platform:
+                # Cross platform resolution needs a target even if unused
+                cmd += [
+                    "--target",
+                    os.path.join(tmp_dir, "target"),
+                    "--only-binary=:all:",
+                    "--platform",
+                    self.platform,
+                    "--python-version",
+                    self.python_version,
+                ]
+            if self.index_url:
+                cmd += ["--index-url", self.index_url]
+            if self.find_links:
+                cmd += ["--find-links", self.find_links]
+                if not self.index_url:
+                    cmd += ["--no-index"]
+
+            proc = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+            )
+            if proc.returncode != 0:
+                raise MlflowException(
+                    f"Failed to lock requirements: {proc.stderr.strip()}"
+                )
+
+            with open(report_fpath, "r") as file:
+                report = json.load(file)
+        return format_lockfile(report)
@@ -0,0 +1,50 @@
+import json
+
+from mlflow.exceptions import MlflowException
+
+
+# Smallest numpy dtype that holds each MLflow column type
+DTYPES = {
+    "boolean": "bool",
+    "integer": "int32",
+    "long": "int64",
+    "float": "float32",
+    "double": "float64",
+    "string": "object",
+    "binary": "object",
+    "datetime": "datetime64[ns]",
+}
+
+
+def compile_signature(mlmodel):
+    """
+    Compiles the input signature of an MLmodel into the input columns the
+    algorithm validates, orders and casts requests to:
+
+        [{"name": "x", "dtype": "float32", "required": true}, ...]
+
+    Returns None if the model has no signature or a tensor / unnamed one,
+    the algorithm then infers the dtypes of every request. Array, object
+    and map columns have no dtype and are left to MLflow.
+    """
+    signature = (mlmodel or {}).get("signature") or {}
+    inputs = signature.get("inputs")
+    if not inputs:
+        return None
+    try:
+        specs = json.loads(inputs) if isinstance(inputs, str) else inputs
+    except ValueError as ex:
+        raise MlflowException(f"Invalid MLmodel input signature: {ex}")
+
+    columns = []
+    for spec in specs:
+        if spec.get("type") == "tensor" or spec.get("name") is None:
+            return None
+        columns.append(
+            {
+                "name": spec["name"],
+                "dtype": DTYPES.get(spec["type"]),
+                "required": spec.get("required", True),
+            }
+        )
+    return columns
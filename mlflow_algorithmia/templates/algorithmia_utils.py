@@ -1,5 +1,11 @@
+import hashlib
+import json
 import os
-import subprocess
+import shutil
+import tarfile
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import Algorithmia
 
@@ -15,10 +21,144 @@ else:
 
 in_algorithmia = True if os.environ.get("ALGORITHMIA_API", False) else False
 
+# Bundle formats created by mlflow_algorithmia
+BUNDLE_EXTENSIONS = (".tar.gz", ".tar.zst")
+MANIFEST_EXTENSION = ".manifest.json"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+BLOCK_SIZE = 1024 * 1024
+
+# Extracted bundles persist across worker restarts
+MODEL_CACHE_DIR = os.environ.get("MLFLOW_MODEL_CACHE_DIR", "./models/cache")
+COMPLETE_MARKER = ".complete.json"
+
+
+def bundle_extension(fname):
+    for ext in BUNDLE_EXTENSIONS:
+        if fname.endswith(ext):
+            return ext
+    return None
+
+
+class DecompressReader(object):
+    """
+    File-like object that decompresses a stream of blocks for `tarfile`,
+    the codec is detected from the first bytes: gzip (including the
+    multi-member files of the pgz codec), zstd or an uncompressed tar
+    """
+
+    def __init__(self, blocks):
+        self.blocks = iter(blocks)
+        self.buffer = bytearray()
+        self.eof = False
+
+        head = b""
+        for block in self.blocks:
+            head += block
+            if len(head) >= len(ZSTD_MAGIC):
+                break
+        self.codec = None
+        if head.startswith(GZIP_MAGIC):
+            self.codec = "gz"
+        elif head.startswith(ZSTD_MAGIC):
+            self.codec = "zst"
+        self.decompressor = self.new_decompressor()
+        self.pending = head
+
+    def new_decompressor(self):
+        if self.codec == "gz":
+            return zlib.decompressobj(wbits=31)
+        elif self.codec == "zst":
+            import zstandard
+
+            return zstandard.ZstdDecompressor().decompressobj()
+        return None
+
+    def decompress(self, data):
+        if self.decompressor is None:
+            return data
+
+        out = self.decompressor.decompress(data)
+        # A new gzip member or zstd frame starts after the end of the last one
+        while self.decompressor.eof:
+            data = self.decompressor.unused_data
+            self.decompressor = self.new_decompressor()
+            if not data:
+                break
+            out += self.decompressor.decompress(data)
+        return out
+
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            data = self.pending or next(self.blocks, None)
+            self.pending = b""
+            if data is None:
+                self.eof = True
+            elif data:
+                self.buffer += self.decompress(data)
+
+        if size < 0:
+            size = len(self.buffer)
+        out = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return out
+
+
+def read_blocks(fileobj, block_size=BLOCK_SIZE):
+    return iter(lambda: fileobj.read(block_size), b"")
+
+
+def is_within(path, root):
+    path = os.path.realpath(path)
+    return path == root or path.startswith(root + os.sep)
+
+
+def check_member(member, output_dir):
+    """
+    Rejects bundle members that would be written outside `output_dir`:
+    absolute or .. paths, paths through links and links pointing outside
+    of it. Only files, directories and links are allowed.
+    """
+    root = os.path.realpath(output_dir)
+    if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+        raise Exception("Unsupported member in bundle: %s" % member.name)
+    if member.name.startswith("/") or ".." in member.name.split("/"):
+        raise Exception("Unsafe path in bundle: %s" % member.name)
+    if not is_within(os.path.join(root, member.name), root):
+        raise Exception("Unsafe path in bundle: %s" % member.name)
+
+    if member.issym():
+        # Relative to the directory of the link
+        parent = os.path.dirname(os.path.join(root, member.name))
+        target = os.path.join(parent, member.linkname)
+    elif member.islnk():
+        # Relative to the bundle root
+        target = os.path.join(root, member.linkname)
+    else:
+        return
+    if os.path.isabs(member.linkname) or not is_within(target, root):
+        raise Exception("Unsafe link in bundle: %s" % member.name)
+
+
+def extract_stream(blocks, output_dir):
+    """
+    Extract a .tar.gz or .tar.zst bundle while it is read from `blocks`
+    without writing the compressed file to disk, see `check_member`.
+    Returns the list of extracted files as (relative path, size)
+    """
+    files = []
+    with tarfile.open(fileobj=DecompressReader(blocks), mode="r|") as tar:
+        for member in tar:
+            check_member(member, output_dir)
+            tar.extract(member, output_dir)
+            if member.isfile():
+                files.append((member.name, member.size))
+    return files
+
 
 def extract_tar_gz(file, output_dir="./models"):
     """
-    Extract a .tar.gz
+    Extract a .tar.gz, including multi-member gzip files, or a .tar.zst
     Parameters
     ----------
         output_dir (default="./models"): Where to extract the .tar.gz
@@ -27,24 +167,195 @@ def extract_tar_gz(file, output_dir="./models"):
         output_dir: full path to the output directory where files where extracted
     """
     os.makedirs(output_dir, exist_ok=True)
+    with open(file, "rb") as f:
+        extract_stream(read_blocks(f), output_dir)
+    return os.path.realpath(os.path.join(output_dir))
+
+
+def download_stream(remote_fpath):
+    """
+    Yields the content of a data:// file in blocks as it is downloaded
+    """
+    url = client.file(remote_fpath).url
+    headers = {}
+    if client.apiKey is not None:
+        headers["Authorization"] = client.apiKey
+    response = client.requestSession.get(
+        client.apiAddress + url, headers=headers, stream=True
+    )
+    if response.status_code != 200:
+        raise Exception("Could not download %s: %s" % (remote_fpath, response.text))
+    with response:
+        for block in response.iter_content(BLOCK_SIZE):
+            yield block
+
+
+def parts_manifest(remote_fpath):
+    return client.file(remote_fpath + ".parts/manifest.json").getJson()
+
+
+def download_parts_stream(remote_fpath, manifest):
+    """
+    Yields the parts of a file uploaded in parts by mlflow_algorithmia,
+    the parts and manifest live in `<remote_fpath>.parts/`
+    """
+    parts_dir = remote_fpath + ".parts"
+    for part in manifest["parts"]:
+        remote_part = "{}/{:05d}".format(parts_dir, part["index"])
+        data = client.file(remote_part).getBytes()
+        if hashlib.sha256(data).hexdigest() != part["sha256"]:
+            raise Exception("Corrupted part: %s" % remote_part)
+        yield data
+
+
+def download_parts(remote_fpath):
+    """
+    Download a file that was uploaded in parts by mlflow_algorithmia
+    Returns the local file path of the reassembled file
+    """
+    manifest = parts_manifest(remote_fpath)
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        for data in download_parts_stream(remote_fpath, manifest):
+            f.write(data)
+    return f.name
 
+
+def cache_entry_valid(entry_dir):
+    """
+    An extracted bundle is valid if it was completely extracted and its files
+    were not removed or truncated since
+    """
     try:
-        output = subprocess.check_output(
-            "tar -C {output} -xzf {targz}".format(output=output_dir, targz=file),
-            stderr=subprocess.STDOUT,
-            shell=True,
-        ).decode()
-    except subprocess.CalledProcessError as ex:
-        output = ex.output.decode()
-        raise Exception("Could not extract file: %s" % output)
+        with open(os.path.join(entry_dir, COMPLETE_MARKER), "r") as f:
+            files = json.load(f)["files"]
+    except (OSError, ValueError, KeyError):
+        return False
 
-    return os.path.realpath(os.path.join(output_dir))
+    for name, size in files:
+        fpath = os.path.join(entry_dir, *name.split("/"))
+        if not os.path.isfile(fpath) or os.path.getsize(fpath) != size:
+            return False
+    return True
+
+
+def get_bundle(remote_fpath, cache_dir=MODEL_CACHE_DIR):
+    """
+    Download and extract a .tar.gz or .tar.zst bundle into the model cache,
+    the bundle is extracted while it is downloaded.
+
+    Cache entries are keyed by the bundle name, which includes the model
+    content hash, and for bundles uploaded in parts by the hashes of the
+    parts. A valid entry is reused without downloading anything.
+    Returns the local path of the extracted bundle
+    """
+    basename = os.path.basename(remote_fpath)
+    no_ext = basename[: -len(bundle_extension(basename))]
+
+    if client.file(remote_fpath).exists():
+        manifest = None
+        key = no_ext
+    else:
+        manifest = parts_manifest(remote_fpath)
+        digest = hashlib.sha256()
+        for part in manifest["parts"]:
+            digest.update(part["sha256"].encode())
+        key = "{}-{}".format(no_ext, digest.hexdigest()[:16])
+
+    entry_dir = os.path.join(cache_dir, key)
+    if cache_entry_valid(entry_dir):
+        print("Using cached model: %s" % entry_dir)
+        return os.path.realpath(os.path.join(entry_dir, no_ext))
+
+    if manifest is None:
+        blocks = download_stream(remote_fpath)
+    else:
+        blocks = download_parts_stream(remote_fpath, manifest)
+
+    # Extract next to the entry and rename it so a worker that dies while
+    # extracting never leaves a partial entry behind
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".extract-")
+    try:
+        files = extract_stream(blocks, tmp_dir)
+        with open(os.path.join(tmp_dir, COMPLETE_MARKER), "w") as f:
+            json.dump({"remote": remote_fpath, "files": files}, f)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return os.path.realpath(os.path.join(entry_dir, no_ext))
+
+
+def download_object(remote_fpath, sha, objects_dir):
+    local_fpath = os.path.join(objects_dir, sha)
+    if os.path.exists(local_fpath):
+        return local_fpath
+
+    data = client.file(remote_fpath).getBytes()
+    if hashlib.sha256(data).hexdigest() != sha:
+        raise Exception("Corrupted object: %s" % remote_fpath)
+
+    with tempfile.NamedTemporaryFile(dir=objects_dir, delete=False) as f:
+        f.write(data)
+    os.replace(f.name, local_fpath)
+    return local_fpath
+
+
+def get_delta_bundle(remote_fpath, output_dir="./models", workers=8):
+    """
+    Reassemble a model uploaded as a delta bundle: a manifest that lists the
+    content addressed objects under `data://<user>/<algo>/objects/` that make
+    up each file. Objects already in the local object cache are not downloaded.
+    Returns the local path of the model directory
+    """
+    manifest = client.file(remote_fpath).getJson()
+    remote_objects_dir = remote_fpath.rsplit("/", 1)[0] + "/objects"
+    objects_dir = os.path.join(output_dir, ".objects")
+    os.makedirs(objects_dir, exist_ok=True)
+
+    shas = {sha for f in manifest["files"] for sha in f["chunks"]}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                download_object, remote_objects_dir + "/" + sha, sha, objects_dir
+            )
+            for sha in shas
+        ]
+        for future in futures:
+            future.result()
+
+    model_dir = os.path.join(output_dir, manifest["name"])
+    for f in manifest["files"]:
+        local_fpath = os.path.join(model_dir, *f["path"].split("/"))
+        os.makedirs(os.path.dirname(local_fpath), exist_ok=True)
+        if os.path.exists(local_fpath):
+            os.remove(local_fpath)
+
+        chunks = [os.path.join(objects_dir, sha) for sha in f["chunks"]]
+        if len(chunks) == 1:
+            try:
+                os.link(chunks[0], local_fpath)
+            except OSError:
+                shutil.copyfile(chunks[0], local_fpath)
+        else:
+            with open(local_fpath, "wb") as out:
+                for chunk in chunks:
+                    with open(chunk, "rb") as inp:
+                        shutil.copyfileobj(inp, out)
+
+        if f["executable"]:
+            os.chmod(local_fpath, 0o755)
+
+    return os.path.realpath(model_dir)
 
 
 def get_file(remote_fpath):
     """
     Download a file hosted on Algorithmia Hosted Data
-    If the file ends with .tar.gz it will untar the file.
+    If the file ends with .tar.gz or .tar.zst it will untar the file into
+    the model cache while downloading it
+    and if it ends with .manifest.json it will reassemble the delta bundle.
     It's recommended that the tar file contain a single files compressed like:
         tar -czvf model.format.tar.gz model.format
     Returns the local file path of the downloaded file
@@ -52,15 +363,16 @@ def get_file(remote_fpath):
     basename = os.path.basename(remote_fpath)
 
     if remote_fpath.startswith("data://"):
-        # Download from Algoritmia hosted data
-        local_fpath = client.file(remote_fpath).getFile().name
+        if basename.endswith(MANIFEST_EXTENSION):
+            return get_delta_bundle(remote_fpath)
 
-        if basename.endswith(".tar.gz"):
-            output_dir = extract_tar_gz(local_fpath)
-            no_ext = basename[: -len(".tar.gz")]
-            local_fpath = os.path.join(output_dir, no_ext)
+        if bundle_extension(basename) is not None:
+            return get_bundle(remote_fpath)
 
-        return local_fpath
+        # Download from Algoritmia hosted data
+        if client.file(remote_fpath).exists():
+            return client.file(remote_fpath).getFile().name
+        return download_parts(remote_fpath)
 
     return remote_fpath
 
@@ -0,0 +1,202 @@
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from Algorithmia.errors import AlgorithmException
+
+
+try:
+    from . import algorithmia_utils
+except ImportError:
+    import algorithmia_utils
+
+
+DEFAULT_CHUNK_ROWS = 10000
+FILE_FORMATS = ("csv", "jsonl", "parquet")
+FORMAT_ALIASES = {"json": "jsonl", "ndjson": "jsonl", "pq": "parquet"}
+
+
+def is_job(input):
+    """
+    A batch job is a dict with the input and output files:
+
+        {"input_file": "data://user/algo/batch/input.csv",
+         "output_file": "data://user/algo/batch/input.predictions.csv",
+         "chunk_rows": 10000}
+    """
+    return isinstance(input, dict) and "input_file" in input
+
+
+def file_format(fpath, format=None):
+    if format is None:
+        extension = os.path.splitext(fpath)[1].lstrip(".").lower()
+        format = FORMAT_ALIASES.get(extension, extension)
+    if format not in FILE_FORMATS:
+        raise AlgorithmException(
+            f"Unknown batch file format: {format}, use one of: {', '.join(FILE_FORMATS)}"
+        )
+    return format
+
+
+class BlockReader(io.RawIOBase):
+    """
+    Read only file object over an iterator of bytes blocks
+    """
+
+    def __init__(self, blocks):
+        self.blocks = iter(blocks)
+        self.block = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.block:
+            try:
+                self.block = memoryview(next(self.blocks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self.block))
+        buffer[:size] = self.block[:size]
+        self.block = self.block[size:]
+        return size
+
+
+def input_blocks(fpath):
+    """
+    Yields the content of a local file or a data:// file, single or
+    uploaded in parts, as it is downloaded
+    """
+    if "://" not in fpath:
+        with open(fpath, "rb") as file:
+            yield from algorithmia_utils.read_blocks(file)
+    elif algorithmia_utils.client.file(fpath).exists():
+        yield from algorithmia_utils.download_stream(fpath)
+    else:
+        manifest = algorithmia_utils.parts_manifest(fpath)
+        yield from algorithmia_utils.download_parts_stream(fpath, manifest)
+
+
+def read_chunks(fpath, format, chunk_rows):
+    """
+    Yields DataFrames of at most `chunk_rows` rows of the input file
+    """
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        # Parquet needs random access, the file is downloaded first
+        parquet = pq.ParquetFile(algorithmia_utils.get_file(fpath))
+        for batch in parquet.iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+
+    raw = io.BufferedReader(BlockReader(input_blocks(fpath)))
+    text = io.TextIOWrapper(raw, encoding="utf-8")
+    if format == "csv":
+        reader = pd.read_csv(text, chunksize=chunk_rows)
+    else:
+        reader = pd.read_json(text, lines=True, chunksize=chunk_rows)
+    # The readers are context managers from pandas 1.2 only
+    try:
+        yield from reader
+    finally:
+        reader.close()
+
+
+def output_frame(predictions):
+    if isinstance(predictions, pd.DataFrame):
+        return predictions.reset_index(drop=True)
+    if isinstance(predictions, pd.Series):
+        return predictions.to_frame(predictions.name or "prediction")
+
+    array = np.asarray(predictions)
+    if array.ndim == 1:
+        return pd.DataFrame({"prediction": array})
+    return pd.DataFrame(array.reshape(len(array), -1)).add_prefix("prediction_")
+
+
+def encode_frames(frames, format):
+    """
+    Yields the csv or jsonl bytes of every DataFrame, the csv header is
+    written once
+    """
+    for i, df in enumerate(frames):
+        if format == "csv":
+            text = df.to_csv(index=False, header=i == 0)
+        else:
+            text = df.to_json(orient="records", lines=True)
+            if text and not text.endswith("\n"):
+                text += "\n"
+        yield text.encode("utf-8")
+
+
+def write_output(frames, fpath, format):
+    """
+    Writes the DataFrames to a local or data:// file as they are produced,
+    csv and jsonl are uploaded while the next chunks are predicted
+    """
+    if format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            local_fpath = fpath if "://" not in fpath else os.path.join(tmp_dir, "out")
+            writer = None
+            for df in frames:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(local_fpath, table.schema)
+                writer.write_table(table)
+            if writer is not None:
+                writer.close()
+            if local_fpath != fpath:
+                algorithmia_utils.client.file(fpath).putFile(local_fpath)
+    elif "://" not in fpath:
+        with open(fpath, "wb") as file:
+            for data in encode_frames(frames, format):
+                file.write(data)
+    else:
+        # A generator makes requests send the body with chunked encoding
+        url = algorithmia_utils.client.file(fpath).url
+        algorithmia_utils.client.putHelper(url, encode_frames(frames, format))
+
+
+def run(wrapper, job):
+    """
+    Streams the job input file in chunks through the model and writes the
+    predictions to the output file, only one chunk is in memory at a time.
+    Returns the output file and the throughput.
+    """
+    input_file = job["input_file"]
+    output_file = job["output_file"]
+    chunk_rows = int(job.get("chunk_rows") or DEFAULT_CHUNK_ROWS)
+    input_format = file_format(input_file, job.get("input_format"))
+    output_format = file_format(output_file, job.get("output_format"))
+
+    stats = {"rows": 0, "chunks": 0}
+    start = time.perf_counter()
+
+    def predictions():
+        for df in read_chunks(input_file, input_format, chunk_rows):
+            frame = output_frame(wrapper.predict(df))
+            stats["rows"] += len(df)
+            stats["chunks"] += 1
+            elapsed = time.perf_counter() - start
+            print(
+                f"Chunk {stats['chunks']}: {stats['rows']} rows, "
+                f"{stats['rows'] / elapsed:.0f} rows/s"
+            )
+            yield frame
+
+    write_output(predictions(), output_file, output_format)
+    seconds = time.perf_counter() - start
+    return {
+        "output_file": output_file,
+        "rows": stats["rows"],
+        "chunks": stats["chunks"],
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(stats["rows"] / seconds, 1) if seconds else None,
+    }
@@ -1,24 +1,72 @@
+import threading
+import time
+
+
+try:
+    from . import mlflow_wrapper
+except ImportError:
+    import mlflow_wrapper
+
+
 model = None
 mlflow_bundle = "{{ mlflow_bundle_file }}"
+lock = threading.Lock()
 
 
-def get_model():
+def load_model():
+    """
+    Loads the model once, concurrent callers wait for the load in progress
+    """
     global model
-    if model is None:
-        try:
-            from .mlflow_wrapper import MLflowWrapper
-        except ImportError:
-            from mlflow_wrapper import MLflowWrapper
+    with lock:
+        if model is None:
+            start = time.perf_counter()
+            input_columns = mlflow_wrapper.read_input_adapter()
+            wrapper = mlflow_wrapper.new_model(mlflow_bundle, input_columns)
+            print(f"Model loaded in {time.perf_counter() - start:.1f}s")
+            model = wrapper
+    return model
+
+
+def background_load():
+    try:
+        load_model()
+    except Exception as ex:
+        # apply loads the model again and raises the error to the caller
+        print(f"Background model load failed: {ex}")
+
 
-        model = MLflowWrapper()
-        model.load_model(mlflow_bundle)
+def get_model():
+    if model is None:
+        return load_model()
     return model
 
 
+def batch_job():
+    try:
+        from . import batch_job
+    except ImportError:
+        import batch_job
+
+    return batch_job
+
+
 def apply(input):
     try:
+        # Batch jobs score a data:// file, see batch_job.is_job
+        jobs = batch_job()
+        if jobs.is_job(input):
+            return jobs.run(get_model(), input)
         model = get_model()
-        predictions = model.predict(input)
-        return predictions.tolist()
+        # {"cache_stats": true} returns the prediction cache counters
+        if isinstance(input, dict) and input.get("cache_stats") is True:
+            return model.cache.stats() if model.cache is not None else None
+        return model.serve(
+            input, mlflow_wrapper.output_format, mlflow_wrapper.output_threshold
+        )
     except Exception as ex:
         raise ex
+
+
+if mlflow_wrapper.eager_load:
+    threading.Thread(target=background_load, name="model-loader", daemon=True).start()
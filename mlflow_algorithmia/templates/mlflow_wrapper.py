@@ -1,9 +1,19 @@
+import base64
+import io
 import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import mlflow
+import numpy as np
+import pandas as pd
 from Algorithmia.errors import AlgorithmException
 from mlflow import pyfunc
-from mlflow.pyfunc import scoring_server
 
 
 try:
@@ -12,9 +22,584 @@ except ImportError:
     import algorithmia_utils
 
 
+# Magic bytes of the binary input formats
+NPY_MAGIC = b"\x93NUMPY"
+NPZ_MAGIC = b"PK\x03\x04"
+ARROW_FILE_MAGIC = b"ARROW1"
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+
+def read_npy(data):
+    """
+    Returns the array of a .npy payload, a view of `data` without copying
+    when it is writeable (bytearray) or else a copy
+    """
+    buffer = io.BytesIO(data)
+    version = np.lib.format.read_magic(buffer)
+    if version == (1, 0):
+        header = np.lib.format.read_array_header_1_0(buffer)
+    elif version == (2, 0):
+        header = np.lib.format.read_array_header_2_0(buffer)
+    else:
+        return np.load(io.BytesIO(data), allow_pickle=False)
+
+    shape, fortran_order, dtype = header
+    if dtype.hasobject:
+        raise AlgorithmException("Object arrays are not supported, use arrow")
+    count = int(np.prod(shape))
+    array = np.frombuffer(data, dtype=dtype, count=count, offset=buffer.tell())
+    array = array.reshape(shape, order="F" if fortran_order else "C")
+    return writeable(array)
+
+
+def writeable(array):
+    """
+    Arrays read from an immutable payload are read-only, models may modify
+    their input in place
+    """
+    return array if array.flags.writeable else array.copy()
+
+
+# Input columns compiled from the model signature at deploy time
+INPUT_ADAPTER_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "input_adapter.json"
+)
+
+
+def read_input_adapter(fpath=INPUT_ADAPTER_FILE):
+    """
+    Input columns shipped with the algorithm source, None if the model has
+    no column signature
+    """
+    if not os.path.exists(fpath):
+        return None
+    with open(fpath, "r") as file:
+        return json.load(file)
+
+
+def schema_columns(schema):
+    """
+    Input columns of an MLflow schema in the input_adapter.json format, for
+    algorithms deployed without it
+    """
+    if schema is None or getattr(schema, "is_tensor_spec", lambda: False)():
+        return None
+
+    columns = []
+    for col in schema.inputs:
+        if col.name is None:
+            return None
+        try:
+            dtype = np.dtype(col.type.to_numpy()).name
+        except Exception:
+            dtype = None
+        required = getattr(col, "required", True)
+        columns.append({"name": col.name, "dtype": dtype, "required": required})
+    return columns
+
+
+def cast_values(values, dtype):
+    """
+    Casts a numeric array to the signature dtype: ints and floats to a
+    float column (float64 JSON numbers to float32 too) and ints to an int
+    column, as long as the values are in the range of the dtype. Returns
+    None when the values cannot be cast.
+    """
+    current = values.dtype
+    if current == dtype:
+        return values
+    if current.kind not in "iuf" or dtype.kind not in "iuf":
+        return None
+    if np.can_cast(current, dtype, "safe"):
+        return values.astype(dtype, copy=False)
+
+    if dtype.kind == "f":
+        # Out of range values would become inf, nan and inf are kept
+        info = np.finfo(dtype)
+        finite = values[np.isfinite(values)] if current.kind == "f" else values
+        if len(finite) and (finite.min() < info.min or finite.max() > info.max):
+            return None
+        return values.astype(dtype)
+    if current.kind in "iu":
+        info = np.iinfo(dtype)
+        if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(dtype)
+    return None
+
+
+class InputParser(object):
+    """
+    Builds the input DataFrame straight from the JSON Algorithmia already
+    decoded, without serializing it again for `pandas.read_json`.
+    Supports the pandas split, records and columns orients and the
+    `dataframe_split` / `dataframe_records` MLflow serving payloads.
+
+    The input columns come from the model signature, compiled at deploy
+    time (`columns`) or from the model `schema` when it is loaded. Inputs
+    with named columns must have the required ones, the declared columns
+    are selected in signature order (others are dropped, as MLflow does)
+    and numeric values are cast to the declared dtype, see `cast_values`.
+    Anything else is left to pandas inference and MLflow schema
+    enforcement as before.
+    """
+
+    def __init__(self, schema=None, columns=None):
+        self.columns = None
+        self.required = []
+        self.dtypes = {}
+        if columns is None:
+            columns = schema_columns(schema)
+        if not columns:
+            return
+
+        self.columns = [col["name"] for col in columns]
+        self.required = [col["name"] for col in columns if col.get("required", True)]
+        for col in columns:
+            dtype = np.dtype(col["dtype"]) if col.get("dtype") else None
+            if dtype is not None and dtype.kind in "iufb":
+                self.dtypes[col["name"]] = dtype
+
+    @staticmethod
+    def orient(input):
+        if isinstance(input, list):
+            return "records"
+        if "data" in input and set(input) <= {"columns", "data", "index"}:
+            return "split"
+        return "columns"
+
+    def parse(self, input):
+        if isinstance(input, dict) and "dataframe_split" in input:
+            input = input["dataframe_split"]
+        elif isinstance(input, dict) and "dataframe_records" in input:
+            input = input["dataframe_records"]
+
+        orient = self.orient(input)
+        index = None
+        if orient == "split":
+            rows = input["data"]
+            columns = input.get("columns") or list(range(len(rows[0]) if rows else 0))
+            values = list(zip(*rows)) if rows else [()] * len(columns)
+            data = dict(zip(columns, values))
+            index = input.get("index")
+        elif orient == "records":
+            columns = []
+            for record in input:
+                for name in record:
+                    if name not in columns:
+                        columns.append(name)
+            data = {c: [record.get(c, np.nan) for record in input] for c in columns}
+        else:
+            columns = list(input)
+            keys = list(input[columns[0]]) if columns else []
+            data = {c: [input[c].get(k) for k in keys] for c in columns}
+            index = [int(k) if k.lstrip("-").isdigit() else k for k in keys]
+
+        df = pd.DataFrame({c: self.column(c, data[c]) for c in columns}, index=index)
+        return self.select(df)
+
+    def parse_bytes(self, data):
+        """
+        Builds the DataFrame from a binary payload: an Arrow IPC stream or
+        file, a .npy array or a .npz with one array per column
+        """
+        if data.startswith(NPY_MAGIC):
+            df = self.from_array(read_npy(data))
+        elif data.startswith(NPZ_MAGIC):
+            with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+                df = pd.DataFrame({name: writeable(npz[name]) for name in npz.files})
+        elif data.startswith((ARROW_STREAM_MAGIC, ARROW_FILE_MAGIC)):
+            df = self.from_arrow(data)
+        else:
+            raise AlgorithmException("Unknown binary input, use Arrow, npy or npz")
+        return self.parse_frame(df)
+
+    def parse_frame(self, df):
+        """
+        Applies the signature column order and lossless numeric casts to a
+        DataFrame read from a file or binary payload
+        """
+        df = self.select(df)
+        for name, dtype in self.dtypes.items():
+            if name not in df.columns:
+                continue
+            current = df[name].dtype
+            if current == dtype or not isinstance(current, np.dtype):
+                continue
+            values = cast_values(df[name].to_numpy(), dtype)
+            if values is not None:
+                df[name] = values
+        return df
+
+    def select(self, df):
+        """
+        The signature columns of `df` in signature order, inputs without
+        any of the signature names (e.g. positional arrays) are unchanged
+        """
+        if self.columns is None or list(df.columns) == self.columns:
+            return df
+        names = set(df.columns)
+        if names.isdisjoint(self.columns):
+            return df
+
+        missing = [name for name in self.required if name not in names]
+        if missing:
+            raise AlgorithmException(f"Missing input columns: {', '.join(missing)}")
+        return df[[name for name in self.columns if name in names]]
+
+    def from_array(self, array):
+        if array.ndim == 1:
+            array = array.reshape(-1, 1)
+        elif array.ndim != 2:
+            raise AlgorithmException("npy input should be a 1D or 2D array")
+
+        columns = None
+        if self.columns is not None and len(self.columns) == array.shape[1]:
+            columns = self.columns
+        return pd.DataFrame(array, columns=columns, copy=False)
+
+    def from_arrow(self, data):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise AlgorithmException("Arrow input requires pyarrow in the model env")
+
+        buffer = pa.py_buffer(data)
+        if data.startswith(ARROW_FILE_MAGIC):
+            table = pa.ipc.open_file(buffer).read_all()
+        else:
+            table = pa.ipc.open_stream(buffer).read_all()
+        # Numeric columns without nulls keep pointing to the request buffer
+        return table.to_pandas(split_blocks=True)
+
+    def column(self, name, values):
+        dtype = self.dtypes.get(name)
+        if dtype is not None:
+            array = cast_values(np.asarray(values), dtype)
+            if array is not None:
+                return array
+        return list(values)
+
+
+# Output formats, auto returns a list for small predictions and switches
+# to a base64 npy (arrays) or arrow (DataFrames) envelope above the threshold
+OUTPUT_FORMATS = ("auto", "list", "npy", "arrow", "bytes")
+DEFAULT_OUTPUT_THRESHOLD = 10000
+
+
+def output_size(predictions):
+    size = getattr(predictions, "size", None)
+    return size if size is not None else len(predictions)
+
+
+def to_list(predictions):
+    """
+    JSON serializable predictions, DataFrames become a list of records
+    built column by column so numeric columns never go through object dtype
+    """
+    if isinstance(predictions, pd.DataFrame):
+        names = list(predictions.columns)
+        columns = [predictions[name].to_numpy().tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+    if isinstance(predictions, (pd.Series, np.ndarray)):
+        return predictions.tolist()
+    return predictions
+
+
+def to_array(predictions):
+    """
+    Numeric ndarray of the predictions, None if they are not numeric
+    """
+    if isinstance(predictions, pd.DataFrame):
+        dtypes = list(predictions.dtypes)
+    elif isinstance(predictions, pd.Series):
+        dtypes = [predictions.dtype]
+    else:
+        array = np.asarray(predictions)
+        return array if array.dtype.kind in "biufc" else None
+
+    if all(isinstance(d, np.dtype) and d.kind in "biufc" for d in dtypes):
+        return predictions.to_numpy()
+    return None
+
+
+def binary_format(predictions):
+    """
+    arrow keeps the column names and types of DataFrames, npy is used for
+    everything else and when pyarrow is not installed
+    """
+    if isinstance(predictions, (pd.DataFrame, pd.Series)):
+        try:
+            import pyarrow  # noqa: F401
+
+            return "arrow"
+        except ImportError:
+            pass
+    return "npy"
+
+
+def encode_npy(predictions):
+    array = to_array(predictions)
+    if array is None:
+        raise AlgorithmException("npy output needs numeric predictions, use arrow")
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def encode_arrow(predictions):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise AlgorithmException("Arrow output requires pyarrow in the model env")
+
+    if isinstance(predictions, pd.Series):
+        predictions = predictions.to_frame(predictions.name or "predictions")
+    if isinstance(predictions, pd.DataFrame):
+        table = pa.Table.from_pandas(predictions, preserve_index=False)
+    else:
+        array = np.asarray(predictions)
+        if array.ndim == 1:
+            table = pa.table({"predictions": array})
+        elif array.ndim == 2:
+            table = pa.table({str(i): array[:, i] for i in range(array.shape[1])})
+        else:
+            raise AlgorithmException("Arrow output needs 1D or 2D predictions")
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_output(predictions, format="auto", threshold=DEFAULT_OUTPUT_THRESHOLD):
+    """
+    Serializes the predictions in `format`:
+
+    - list: JSON list (records for DataFrames)
+    - npy, arrow: {"format": ..., "data": <base64>} envelope
+    - bytes: raw npy or arrow bytes, returned as a binary response
+    - auto: list up to `threshold` values, npy or arrow envelope above it
+    """
+    if format == "auto":
+        if output_size(predictions) <= threshold:
+            format = "list"
+        else:
+            format = binary_format(predictions)
+            if format == "npy" and to_array(predictions) is None:
+                # Non numeric predictions without pyarrow stay a list
+                format = "list"
+
+    if format == "list":
+        return to_list(predictions)
+    elif format == "bytes":
+        format = binary_format(predictions)
+        return encode_npy(predictions) if format == "npy" else encode_arrow(predictions)
+    elif format == "npy":
+        data = encode_npy(predictions)
+    elif format == "arrow":
+        data = encode_arrow(predictions)
+    else:
+        raise AlgorithmException(
+            f"Unknown output format: {format}, use one of: {', '.join(OUTPUT_FORMATS)}"
+        )
+    return {"format": format, "data": base64.b64encode(data).decode("ascii")}
+
+
+DEFAULT_CHUNK_ROWS = 10000
+worker_model = None
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count(workers):
+    """
+    Number of predict workers from the setting: an int or "auto" (CPUs)
+    """
+    if workers == "auto":
+        return available_cpus()
+    return max(int(workers or 1), 1)
+
+
+def init_worker(model_fpath):
+    global worker_model
+    worker_model = pyfunc.load_model(model_fpath)
+
+
+def predict_chunk(df):
+    return worker_model.predict(df)
+
+
+def concat_predictions(chunks):
+    """
+    Joins the predictions of consecutive row chunks in order
+    """
+    first = chunks[0]
+    if isinstance(first, (pd.DataFrame, pd.Series)):
+        return pd.concat(chunks)
+    if isinstance(first, np.ndarray):
+        return np.concatenate(chunks)
+    return [row for chunk in chunks for row in chunk]
+
+
+def prediction_rows(predictions):
+    """
+    Predictions of a DataFrame split per input row
+    """
+    if isinstance(predictions, pd.DataFrame):
+        names = list(predictions.columns)
+        columns = [predictions[name].to_numpy() for name in names]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+    if isinstance(predictions, pd.Series):
+        return list(predictions.to_numpy())
+    if isinstance(predictions, np.ndarray) and predictions.ndim > 1:
+        # A row view would keep the whole batch alive in the cache
+        return [row.copy() for row in predictions]
+    return list(predictions)
+
+
+def join_rows(rows):
+    """
+    Inverse of `prediction_rows`, Series predictions come back as an ndarray
+    """
+    first = rows[0]
+    if isinstance(first, dict):
+        return pd.DataFrame(rows)
+    if isinstance(first, (np.ndarray, np.generic)):
+        return np.asarray(rows)
+    return rows
+
+
+def row_size(row):
+    if isinstance(row, dict):
+        return sum(row_size(value) for value in row.values())
+    nbytes = getattr(row, "nbytes", None)
+    return nbytes if nbytes is not None else sys.getsizeof(row)
+
+
+class PredictionCache(object):
+    """
+    LRU cache of the predictions of single input rows, keyed by a hash of
+    the row values after parsing (signature column order and dtypes).
+    Bounded by `max_entries` and `max_bytes` (estimated size of the cached
+    predictions), entries expire after `ttl` seconds when it is set.
+    """
+
+    # Estimated memory of a key and its bookkeeping
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_entries, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl) if ttl else None
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def keys(self, df):
+        """
+        One key per row, None if the rows can not be hashed
+        """
+        try:
+            hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        except TypeError:
+            return None
+        schema = hash(tuple((str(c), str(df[c].dtype)) for c in df.columns))
+        return [(schema, h) for h in hashes.tolist()]
+
+    def get(self, keys):
+        """
+        Cached prediction of every key, None for the misses
+        """
+        now = time.monotonic()
+        rows = []
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None and entry[2] is not None and entry[2] < now:
+                    self.pop(key)
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    rows.append(None)
+                else:
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                    rows.append(entry[0])
+        return rows
+
+    def put(self, keys, rows):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            for key, row in zip(keys, rows):
+                if key in self.entries:
+                    self.pop(key)
+                size = row_size(row) + self.ENTRY_OVERHEAD
+                self.entries[key] = (row, size, expires)
+                self.bytes += size
+            while self.entries and (
+                len(self.entries) > self.max_entries or self.bytes > self.max_bytes
+            ):
+                self.pop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def pop(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "evictions": self.evictions,
+            }
+
+
 class MLflowWrapper(object):
-    def __init__(self, model_fpath=None):
+    """
+    Loads an MLflow pyfunc model and predicts Algorithmia inputs
+
+    Inputs with more than `chunk_rows` rows are split in row chunks that
+    are predicted on `workers` threads or processes (`pool`), for models
+    that use a single core. Processes load their own copy of the model.
+
+    With a `cache` (PredictionCache) only the input rows that are not
+    cached are predicted.
+
+    `input_columns` are the signature columns compiled at deploy time,
+    without them they are read from the model schema when it is loaded.
+    """
+
+    def __init__(
+        self,
+        model_fpath=None,
+        workers=1,
+        chunk_rows=DEFAULT_CHUNK_ROWS,
+        pool="thread",
+        cache=None,
+        input_columns=None,
+    ):
         self.model = None
+        self.model_fpath = None
+        self.input_columns = input_columns
+        self.parser = InputParser(columns=input_columns)
+        self.workers = worker_count(workers)
+        self.chunk_rows = int(chunk_rows or DEFAULT_CHUNK_ROWS)
+        self.pool = pool
+        self.executor = None
+        self.cache = cache
 
         if model_fpath:
             self.load_model(model_fpath)
@@ -24,14 +609,170 @@ class MLflowWrapper(object):
             model_fpath = algorithmia_utils.get_file(model_fpath)
 
         self.model = pyfunc.load_model(model_fpath)
+        self.model_fpath = model_fpath
+        if self.input_columns is None:
+            self.parser = InputParser(self.model.metadata.get_input_schema())
+
+    def warmup(self):
+        """
+        Runs a prediction with the MLmodel input_example so lazy
+        initialization (JIT, BLAS, caches) happens before the first request.
+        Returns the predictions or None if the model has no input example.
+        """
+        try:
+            example = self.model.metadata.load_input_example(self.model_fpath)
+        except Exception as ex:
+            print(f"Could not load the model input example: {ex}")
+            return None
+        if example is None:
+            return None
+
+        start = time.perf_counter()
+        try:
+            predictions = self.model.predict(example)
+        except Exception as ex:
+            print(f"Warm-up prediction failed: {ex}")
+            return None
+        print(f"Warm-up prediction took {time.perf_counter() - start:.2f}s")
+        return predictions
+
+    def serve(self, input, output_format="auto", threshold=DEFAULT_OUTPUT_THRESHOLD):
+        """
+        Predicts and encodes the predictions, JSON inputs can choose the
+        encoding with an "output_format" key next to dataframe_split or
+        dataframe_records
+        """
+        if isinstance(input, str):
+            input = json.loads(input)
+        if isinstance(input, dict) and "output_format" in input:
+            input = dict(input)
+            output_format = input.pop("output_format")
+
+        predictions = self.predict(input)
+        return encode_output(predictions, output_format, threshold)
 
     def predict(self, input):
-        if isinstance(input, dict):
-            input = json.dumps(input)
+        if isinstance(input, pd.DataFrame):
+            return self.predict_df(self.parser.parse_frame(input))
+
+        if isinstance(input, (bytes, bytearray)):
+            df = self.parser.parse_bytes(bytes(input))
+            return self.predict_df(df)
 
         if isinstance(input, str):
-            df = scoring_server.parse_json_input(input)
+            input = json.loads(input)
+
+        if isinstance(input, (dict, list)):
+            df = self.parser.parse(input)
         else:
-            raise AlgorithmException("Input should be str or json")
+            raise AlgorithmException("Input should be str, json or bytes")
+
+        return self.predict_df(df)
+
+    def predict_df(self, df):
+        if self.cache is None or len(df) == 0:
+            return self.predict_rows(df)
+
+        keys = self.cache.keys(df)
+        if keys is None:
+            return self.predict_rows(df)
+        rows = self.cache.get(keys)
+        misses = [i for i, row in enumerate(rows) if row is None]
+        if not misses:
+            return join_rows(rows)
+
+        predictions = self.predict_rows(df.iloc[misses])
+        if len(predictions) != len(misses):
+            # Not one prediction per row, nothing can be cached
+            return predictions if len(misses) == len(df) else self.predict_rows(df)
+        if len(misses) == len(df):
+            self.cache.put(keys, prediction_rows(predictions))
+            return predictions
+
+        new_rows = prediction_rows(predictions)
+        self.cache.put([keys[i] for i in misses], new_rows)
+        for i, row in zip(misses, new_rows):
+            rows[i] = row
+        return join_rows(rows)
+
+    def predict_rows(self, df):
+        if self.workers < 2 or len(df) <= self.chunk_rows:
+            return self.model.predict(df)
+
+        chunks = [
+            df.iloc[start : start + self.chunk_rows]
+            for start in range(0, len(df), self.chunk_rows)
+        ]
+        executor = self.get_executor()
+        if self.pool == "process":
+            return concat_predictions(list(executor.map(predict_chunk, chunks)))
+        return concat_predictions(list(executor.map(self.model.predict, chunks)))
+
+    def close(self):
+        """
+        Stops the predict pool, the model is freed with the wrapper
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def get_executor(self):
+        """
+        The pool is created on the first large input and reused
+        """
+        if self.executor is None:
+            if self.pool == "process":
+                # spawn: forking a process with running threads can deadlock
+                self.executor = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker,
+                    initargs=(self.model_fpath,),
+                )
+            else:
+                self.executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="predict"
+                )
+        return self.executor
+
+
+def int_setting(value, default):
+    # Template variables that were not rendered fall back to the default
+    return int(value) if value.isdigit() else default
+
+
+# Serving settings of the single and multi-model entrypoints
+# eager: load the models in the background when the algorithm starts
+eager_load = "{{ serving_mode }}" == "eager"
+warmup = "{{ warmup }}" == "True"
+# Prediction encoding, see encode_output
+output_format = "{{ output_format }}" or "auto"
+output_threshold = int_setting("{{ output_threshold }}", DEFAULT_OUTPUT_THRESHOLD)
+# Parallel predict of large inputs, see MLflowWrapper
+predict_workers = "{{ predict_workers }}" or 1
+predict_chunk_rows = "{{ predict_chunk_rows }}" or DEFAULT_CHUNK_ROWS
+predict_pool = "{{ predict_pool }}" or "thread"
+# Per row prediction cache of every model, disabled with 0 entries
+cache_entries = int_setting("{{ cache_entries }}", 0)
+cache_size = int_setting("{{ cache_size }}", 64)
+cache_ttl = int_setting("{{ cache_ttl }}", 0)
+
 
-        return self.model.predict(df)
+def new_model(bundle, input_columns=None):
+    """
+    Loads a model with the serving settings
+    """
+    cache = None
+    if cache_entries:
+        cache = PredictionCache(cache_entries, cache_size * 1024 * 1024, cache_ttl)
+    wrapper = MLflowWrapper(
+        workers=predict_workers,
+        chunk_rows=predict_chunk_rows,
+        pool=predict_pool,
+        cache=cache,
+        input_columns=input_columns,
+    )
+    wrapper.load_model(bundle)
+    if warmup:
+        wrapper.warmup()
+    return wrapper
@@ -0,0 +1,257 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from Algorithmia.errors import AlgorithmException
+
+
+try:
+    from . import algorithmia_utils, mlflow_wrapper
+except ImportError:
+    import algorithmia_utils
+    import mlflow_wrapper
+
+
+# Registry with the bundle of every model key, updated by every deploy
+registry_file = "{{ registry_file }}"
+registry_ttl = mlflow_wrapper.int_setting("{{ registry_ttl }}", 60)
+# Memory budget of the loaded models in MB, estimated from their size on disk
+pool_size = mlflow_wrapper.int_setting("{{ pool_size }}", 4096)
+
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    size = 0
+    for root, _, files in os.walk(path):
+        for fname in files:
+            size += os.path.getsize(os.path.join(root, fname))
+    return size
+
+
+class Registry(object):
+    """
+    Model keys to bundles, read from `registry_file` again after `ttl`
+    seconds or when a request asks for an unknown key
+    """
+
+    def __init__(self, remote_fpath, ttl=60):
+        self.remote_fpath = remote_fpath
+        self.ttl = ttl
+        self.models = {}
+        self.read_at = None
+        self.lock = threading.Lock()
+
+    def read(self):
+        if "://" in self.remote_fpath:
+            registry = algorithmia_utils.client.file(self.remote_fpath).getJson()
+        else:
+            with open(self.remote_fpath, "r") as file:
+                registry = json.load(file)
+        return registry.get("models", {})
+
+    def refresh(self):
+        with self.lock:
+            self.models = self.read()
+            self.read_at = time.monotonic()
+            return self.models
+
+    def model(self, key):
+        read_at = self.read_at
+        age = None if read_at is None else time.monotonic() - read_at
+        # Unknown keys read the registry again, at most once a second
+        if age is None or age > self.ttl or (key not in self.models and age > 1):
+            self.refresh()
+        model = self.models.get(key)
+        if model is None:
+            raise AlgorithmException(f"Unknown model: {key}")
+        return model
+
+
+class PoolEntry(object):
+    """
+    A model loading or loaded from `bundle` and the requests using it.
+    Requests are counted from before the load finishes, an evicted model is
+    closed when its last request finishes.
+    """
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+        self.future = None
+        self.wrapper = None
+        self.size = 0
+        self.users = 0
+        self.evicted = False
+
+
+class ModelPool(object):
+    """
+    Loaded models by key, the least recently used ones are unloaded when
+    the loaded models are estimated to use more than `max_bytes`.
+    Models are loaded on a background pool: requests for loaded models are
+    served while others load and concurrent requests for a model that is
+    loading wait for the same load.
+    """
+
+    def __init__(self, max_bytes, load=mlflow_wrapper.new_model, workers=4):
+        self.max_bytes = max_bytes
+        self.load_model = load
+        self.models = OrderedDict()
+        self.loading = {}
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="model-loader")
+
+    def get(self, key, bundle, input_columns=None):
+        return self.get_async(key, bundle, input_columns).result()
+
+    def get_async(self, key, bundle, input_columns=None):
+        """
+        Future of the model of `key` loaded from `bundle`, a model loaded
+        from another bundle (an older version) is replaced.
+        `input_columns` are the signature columns compiled at deploy time.
+        """
+        return self.entry(key, bundle, input_columns).future
+
+    def entry(self, key, bundle, input_columns=None, use=False):
+        """
+        Entry of the model of `key` loaded or loading from `bundle`. With
+        `use` the request is counted under the lock that publishes the entry,
+        so the model can not be closed before the request releases it.
+        """
+        with self.lock:
+            entry = self.models.get(key)
+            if entry is not None and entry.bundle == bundle:
+                self.models.move_to_end(key)
+            else:
+                entry = self.loading.get((key, bundle))
+                if entry is None:
+                    entry = PoolEntry(bundle)
+                    entry.future = self.executor.submit(
+                        self.load, key, entry, input_columns
+                    )
+                    self.loading[(key, bundle)] = entry
+            if use:
+                entry.users += 1
+            return entry
+
+    @contextmanager
+    def use(self, key, bundle, input_columns=None):
+        """
+        Model of `key` for the duration of a request, it is not closed
+        while the request uses it even if it is evicted
+        """
+        entry = self.entry(key, bundle, input_columns, use=True)
+        try:
+            yield entry.future.result()
+        finally:
+            with self.lock:
+                entry.users -= 1
+                close = entry.evicted and entry.users == 0
+            if close:
+                entry.wrapper.close()
+
+    def load(self, key, entry, input_columns=None):
+        try:
+            start = time.perf_counter()
+            wrapper = self.load_model(entry.bundle, input_columns)
+            size = dir_size(wrapper.model_fpath)
+        except BaseException:
+            with self.lock:
+                self.loading.pop((key, entry.bundle), None)
+            raise
+        print(f"Model {key} loaded in {time.perf_counter() - start:.1f}s")
+
+        with self.lock:
+            self.loading.pop((key, entry.bundle), None)
+            entry.wrapper = wrapper
+            entry.size = size
+            old = self.models.pop(key, None)
+            if old is not None:
+                self.unload(key, old)
+            self.models[key] = entry
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self.models) > 1:
+                old_key = next(iter(self.models))
+                self.unload(old_key, self.models.pop(old_key))
+        return wrapper
+
+    def unload(self, key, entry):
+        # Models in use are closed by their last request, see `use`
+        self.bytes -= entry.size
+        entry.evicted = True
+        if entry.users == 0:
+            entry.wrapper.close()
+        print(f"Model {key} unloaded")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "models": list(self.models),
+                "loading": [key for key, _ in self.loading],
+                "bytes": self.bytes,
+            }
+
+
+registry = Registry(registry_file, registry_ttl)
+pool = ModelPool(pool_size * 1024 * 1024)
+
+
+def use_model(key):
+    model = registry.model(key)
+    return pool.use(key, model["bundle"], model.get("input_columns"))
+
+
+def background_load():
+    try:
+        for key, model in registry.refresh().items():
+            pool.get_async(key, model["bundle"], model.get("input_columns"))
+    except Exception as ex:
+        # apply loads the models again and raises the error to the caller
+        print(f"Background model load failed: {ex}")
+
+
+def batch_job():
+    try:
+        from . import batch_job
+    except ImportError:
+        import batch_job
+
+    return batch_job
+
+
+def apply(input):
+    """
+    Routes the request to a model by its key:
+
+        {"model": "churn", "input": <any input of the single model algorithm>}
+
+    Batch jobs add the "model" key to the job, {"pool_stats": true} returns
+    the loaded models
+    """
+    if isinstance(input, dict) and input.get("pool_stats") is True:
+        return pool.stats()
+    if not isinstance(input, dict) or "model" not in input:
+        raise AlgorithmException('Input should be {"model": <key>, "input": <input>}')
+
+    with use_model(input["model"]) as model:
+        jobs = batch_job()
+        if jobs.is_job(input):
+            return jobs.run(model, input)
+        if input.get("cache_stats") is True:
+            return model.cache.stats() if model.cache is not None else None
+        return model.serve(
+            input["input"],
+            mlflow_wrapper.output_format,
+            mlflow_wrapper.output_threshold,
+        )
+
+
+if mlflow_wrapper.eager_load:
+    threading.Thread(
+        target=background_load, name="model-preloader", daemon=True
+    ).start()
@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import Algorithmia
+import pytest
+from git import Repo
+
+from mlflow_algorithmia.deployment import AlgorithmiaDeploymentClient
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    model = tmp_path / "model"
+    (model / "data").mkdir(parents=True)
+    (model / "MLmodel").write_text("run_id: 123\n")
+    (model / "conda.yaml").write_text("name: mlflow-env\n")
+    (model / "data" / "model.pkl").write_bytes(os.urandom(1024))
+    return str(model)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer is Python 3.7+
+    daemon_threads = True
+
+
+class DataApiHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for the Algorithmia data API (/v1/data/<path>)
+    Files and directories are kept in memory in the server object
+    """
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def path_(self):
+        path = self.path.split("?")[0]
+        return path[len("/v1/data/") :].strip("/")
+
+    def send(self, status, body=b"", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return bytes(body)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_HEAD(self):
+        self.send(200 if self.path_ in self.server.files else 404)
+
+    def do_GET(self):
+        if self.path.startswith("/v1/algorithms/"):
+            self.get_builds()
+            return
+
+        path = self.path_
+        if path in self.server.files:
+            with self.server.lock:
+                self.server.gets += 1
+            self.send(200, self.server.files[path], "application/octet-stream")
+        elif path in self.server.dirs:
+            prefix = path + "/"
+            files = [
+                {
+                    "filename": f[len(prefix) :],
+                    "size": len(data),
+                    "last_modified": "2021-01-01T00:00:00.000Z",
+                }
+                for f, data in self.server.files.items()
+                if f.startswith(prefix) and "/" not in f[len(prefix) :]
+            ]
+            self.send(200, json.dumps({"files": files, "folders": []}).encode())
+        else:
+            self.send(404, b'{"error": {"message": "not found"}}')
+
+    def get_builds(self):
+        # /v1/algorithms/<user>/<algo>/builds, every request returns the next
+        # list of builds set in server.builds[algo], the last one is repeated
+        name = self.path.split("/")[4]
+        with self.server.lock:
+            responses = self.server.builds.get(name, [[]])
+            results = responses.pop(0) if len(responses) > 1 else responses[0]
+        self.send(200, json.dumps({"results": results}).encode())
+
+    def do_PUT(self):
+        body = self.read_body()
+        with self.server.lock:
+            self.server.puts += 1
+            fail = self.server.fail_puts > 0
+            if fail:
+                self.server.fail_puts -= 1
+        if fail:
+            self.send(500, b'{"error": {"message": "injected failure"}}')
+            return
+        self.server.files[self.path_] = body
+        self.send(200, json.dumps({"result": "data://" + self.path_}).encode())
+
+    def do_POST(self):
+        if self.path.startswith("/v1/algo/"):
+            self.call_algorithm()
+            return
+
+        name = json.loads(self.read_body())["name"]
+        parent = self.path_
+        self.server.dirs.add(f"{parent}/{name}" if parent else name)
+        self.send(200, b"{}")
+
+    def call_algorithm(self):
+        # Records the request and returns the result of `server.algorithm`
+        # or the request content type if it is not set
+        body = self.read_body()
+        content_type = self.headers.get("Content-Type")
+        with self.server.lock:
+            self.server.calls.append((content_type, body))
+            fail = self.server.fail_calls > 0
+            if fail:
+                self.server.fail_calls -= 1
+        if fail:
+            self.send(500, b'{"error": {"message": "injected failure"}}')
+            return
+
+        if self.server.algorithm is None:
+            result = content_type
+        elif content_type == "application/json":
+            result = self.server.algorithm(json.loads(body))
+        elif content_type == "text/plain":
+            result = self.server.algorithm(body.decode())
+        else:
+            result = self.server.algorithm(body)
+        metadata = {"content_type": "json", "duration": 0.001}
+        response = {"result": result, "metadata": metadata}
+        self.send(200, json.dumps(response).encode())
+
+
+@pytest.fixture
+def data_api():
+    """
+    Local data API server, the `client` attribute is an Algorithmia client
+    that talks to it. Set `fail_puts` or `fail_calls` to make the next N
+    uploads or algorithm calls fail, `puts` and `gets` count the file uploads
+    and downloads, `calls` has the content type and body of the algorithm
+    calls, which are answered by the `algorithm` function if it is set.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DataApiHandler)
+    server.files = {}
+    server.dirs = set()
+    server.builds = {}
+    server.puts = 0
+    server.gets = 0
+    server.fail_puts = 0
+    server.calls = []
+    server.algorithm = None
+    server.fail_calls = 0
+    server.lock = threading.Lock()
+    address = "http://{}:{}".format(*server.server_address)
+    server.address = address
+    server.client = Algorithmia.client("simTestKey", api_address=address)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mlflow_model(model_dir):
+    with open(os.path.join(model_dir, "MLmodel"), "w") as file:
+        file.write("run_id: abc123\nflavors: {}\n")
+    with open(os.path.join(model_dir, "conda.yaml"), "w") as file:
+        file.write("dependencies:\n- python=3.8\n- pip:\n  - mlflow\nname: env\n")
+    return model_dir
+
+
+@pytest.fixture
+def algo_remotes(tmp_path):
+    """
+    Factory of bare git repos standing in for the Algorithmia algorithm repos,
+    one per algorithm name
+    """
+    remotes = {}
+
+    def get(name):
+        if name not in remotes:
+            remote = str(tmp_path / "remotes" / f"{name}.git")
+            Repo.init(remote, bare=True, mkdir=True)
+            seed = Repo.clone_from(remote, str(tmp_path / "seeds" / name))
+            os.makedirs(os.path.join(seed.working_dir, "src"))
+            with open(os.path.join(seed.working_dir, "src", "__init__.py"), "w") as f:
+                f.write("")
+            with open(os.path.join(seed.working_dir, "algorithmia.conf"), "w") as f:
+                f.write("{}\n")
+            seed.git.add(".")
+            seed.index.commit("Initial commit")
+            seed.remote("origin").push(seed.active_branch.name)
+            remotes[name] = remote
+        return remotes[name]
+
+    return get
+
+
+@pytest.fixture
+def deployer(request, data_api, algo_remotes, tmp_path, monkeypatch):
+    """
+    Deployment client on the stand-in data API and git remotes. The builds
+    API returns the remote head as built unless the test parametrizes it
+    indirectly with {"stub_builds": False} to use `data_api.builds`.
+    """
+    options = getattr(request, "param", {})
+    monkeypatch.setenv("ALGORITHMIA_API_KEY", "algo-key")
+    monkeypatch.setenv("ALGORITHMIA_USERNAME", "test_user")
+    monkeypatch.setenv("ALGORITHMIA_API", data_api.address)
+    monkeypatch.setenv("MLFLOW_ALGO_TMP_DIR", str(tmp_path / "algorithmia_tmp"))
+    monkeypatch.setenv("MLFLOW_ALGO_WORKSPACE_DIR", str(tmp_path / "workspaces"))
+    deployer = AlgorithmiaDeploymentClient("algorithmia")
+    deployer.client = data_api.client
+    deployer.algo_repo_url = lambda name: "file://" + algo_remotes(name)
+
+    def get_builds(name):
+        sha = Repo(algo_remotes(name)).head.commit.hexsha
+        return [{"commit_sha": sha, "status": "succeeded"}]
+
+    if options.get("stub_builds", True):
+        # Polled from the executor, bypassing the aiohttp session
+        deployer.get_builds = get_builds
+        deployer.builds_session = lambda: None
+    return deployer
@@ -0,0 +1,120 @@
+import asyncio
+import io
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia.aio import AsyncAlgorithmiaDeploymentClient
+
+
+pytest.importorskip("aiohttp")
+
+
+@pytest.fixture
+def async_client(deployer, data_api):
+    deployer.settings["api_endpoint"] = data_api.address
+    return AsyncAlgorithmiaDeploymentClient(concurrency=2, settings=deployer.settings)
+
+
+def run(coro):
+    """
+    Runs a coroutine in a new event loop, asyncio.run needs Python 3.7
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def double(input):
+    if isinstance(input, bytes):
+        return "binary"
+    df = pd.read_json(io.StringIO(input), orient="split")
+    return (df.to_numpy() * 2).tolist()
+
+
+def test_predict(async_client, data_api):
+    data_api.algorithm = double
+    df = pd.DataFrame({"a": np.arange(10.0)})
+
+    async def main():
+        async with async_client:
+            return await async_client.predict("algo", df)
+
+    assert run(main()) == (df.to_numpy() * 2).tolist()
+    assert data_api.calls[-1][0] == "text/plain"
+
+
+def test_predict_chunks(async_client, data_api):
+    data_api.algorithm = double
+    data_api.fail_calls = 1
+    async_client.settings["predict_batch_rows"] = 3
+    df = pd.DataFrame({"a": np.arange(10.0)})
+
+    async def main():
+        async with async_client:
+            return await asyncio.gather(
+                async_client.predict("algo", df),
+                async_client.predict("algo", df.iloc[::-1]),
+            )
+
+    predictions, backwards = run(main())
+    assert predictions == (df.to_numpy() * 2).tolist()
+    assert backwards == predictions[::-1]
+    assert len(data_api.calls) == 4 + 4 + 1
+
+
+def test_predict_model_key(async_client, data_api):
+    # Multi-model algorithm, the factor of every model key
+    factors = {"double": 2, "triple": 3}
+    data_api.algorithm = lambda input: [
+        [x * factors[input["model"]] for x in row]
+        for row in json.loads(input["input"])["data"]
+    ]
+    async_client.settings["predict_batch_rows"] = 3
+    df = pd.DataFrame({"a": np.arange(10.0)})
+
+    async def main():
+        async with async_client:
+            return await async_client.predict("algo", df, model_key="triple")
+
+    assert run(main()) == (df.to_numpy() * 3).tolist()
+    assert all(content == "application/json" for content, _ in data_api.calls)
+    assert len(data_api.calls) == 4
+
+
+def test_predict_timeout_and_cancel(async_client, data_api):
+    data_api.algorithm = lambda input: time.sleep(0.5)
+    df = pd.DataFrame({"a": [1.0]})
+
+    async def main():
+        async with async_client:
+            with pytest.raises(MlflowException, match="timed out"):
+                await async_client.predict("algo", df, timeout=0.1)
+
+            task = asyncio.ensure_future(async_client.predict("algo", df))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            # The pool is still usable after cancelled requests
+            data_api.algorithm = double
+            return await async_client.predict("algo", df)
+
+    assert run(main()) == [[2.0]]
+
+
+def test_algorithm_error(async_client, data_api):
+    async def main():
+        async with async_client:
+            await async_client.predict("algo", pd.DataFrame({"a": [1.0]}))
+
+    data_api.fail_calls = 1
+    with pytest.raises(MlflowException, match="Algorithm error: injected failure"):
+        run(main())
@@ -0,0 +1,59 @@
+import pytest
+from mlflow.exceptions import MlflowException
+
+
+# The builds are read from the stand-in builds API
+pytestmark = pytest.mark.parametrize(
+    "deployer", [{"stub_builds": False}], indirect=True
+)
+
+
+def build(sha, status):
+    return {"build_id": f"build-{sha}", "commit_sha": sha, "status": status}
+
+
+def test_get_builds(deployer, data_api):
+    data_api.builds["algo"] = [[build("abc", "succeeded")]]
+    assert deployer.get_builds("algo") == [build("abc", "succeeded")]
+
+
+def test_wait_for_build(deployer, data_api):
+    data_api.builds["algo"] = [
+        [build("old", "succeeded")],
+        [build("new", "in-progress"), build("old", "succeeded")],
+        [build("new", "succeeded"), build("old", "succeeded")],
+    ]
+    result = deployer.wait_for_build("algo", "new", timeout=10, interval=0.01)
+    assert result["status"] == "succeeded"
+    assert result["commit_sha"] == "new"
+    assert result["duration"] > 0
+
+
+def test_wait_for_build_failed(deployer, data_api):
+    data_api.builds["algo"] = [[build("new", "failed")]]
+    with pytest.raises(MlflowException, match="failed"):
+        deployer.wait_for_build("algo", "new", interval=0.01)
+
+
+def test_wait_for_build_timeout(deployer, data_api):
+    data_api.builds["algo"] = [[build("new", "in-progress")]]
+    with pytest.raises(MlflowException, match="Timed out"):
+        deployer.wait_for_build("algo", "new", timeout=0.1, interval=0.01)
+
+
+def test_wait_for_builds(deployer, data_api):
+    data_api.builds["one"] = [[build("a", "in-progress")], [build("a", "succeeded")]]
+    data_api.builds["two"] = [[build("b", "failed")]]
+    results = deployer.wait_for_builds({"one": "a", "two": "b"}, interval=0.01)
+    assert results["one"]["status"] == "succeeded"
+    assert isinstance(results["two"], MlflowException)
+
+
+def test_wait_for_builds_without_aiohttp(deployer, data_api):
+    # Each wait blocks a thread of the executor sized to the builds
+    deployer.builds_session = lambda: None
+    data_api.builds["one"] = [[build("a", "in-progress")], [build("a", "succeeded")]]
+    data_api.builds["two"] = [[build("b", "in-progress")], [build("b", "succeeded")]]
+    results = deployer.wait_for_builds({"one": "a", "two": "b"}, interval=0.01)
+    assert results["one"]["status"] == "succeeded"
+    assert results["two"]["status"] == "succeeded"
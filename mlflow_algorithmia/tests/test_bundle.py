@@ -0,0 +1,56 @@
+import os
+
+import pytest
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia import bundle
+from mlflow_algorithmia.bundle import bundle_extension, create_bundle, hash_model_dir
+
+
+def test_hash_is_stable(model_dir):
+    assert hash_model_dir(model_dir) == hash_model_dir(model_dir)
+
+
+def test_hash_changes_with_content(model_dir):
+    before = hash_model_dir(model_dir)
+    with open(os.path.join(model_dir, "conda.yaml"), "a") as file:
+        file.write("channels: []\n")
+    assert hash_model_dir(model_dir) != before
+
+
+def test_hash_changes_with_path(model_dir):
+    before = hash_model_dir(model_dir)
+    os.rename(
+        os.path.join(model_dir, "data", "model.pkl"),
+        os.path.join(model_dir, "data", "model2.pkl"),
+    )
+    assert hash_model_dir(model_dir) != before
+
+
+def test_hash_extra(model_dir):
+    assert hash_model_dir(model_dir) != hash_model_dir(model_dir, extra=["zst"])
+
+
+@pytest.mark.parametrize("codec", ["gz", "pgz", "zst"])
+def test_create_bundle_roundtrip(model_dir, tmp_path, codec, monkeypatch):
+    if codec == "zst":
+        pytest.importorskip("zstandard")
+    from mlflow_algorithmia.templates import algorithmia_utils
+
+    # Small blocks to exercise multiple gzip members / zstd frames
+    monkeypatch.setattr(bundle, "COMPRESS_BLOCK_SIZE", 256)
+    with open(os.path.join(model_dir, "data", "weights.pt"), "wb") as file:
+        file.write(os.urandom(4096))
+
+    fpath = str(tmp_path / f"model{bundle_extension(codec)}")
+    with open(fpath, "wb") as file:
+        create_bundle(model_dir, file, arcname="model-1", codec=codec, threads=4)
+
+    output_dir = algorithmia_utils.extract_tar_gz(fpath, str(tmp_path / "out"))
+    extracted = os.path.join(output_dir, "model-1")
+    assert hash_model_dir(extracted) == hash_model_dir(model_dir)
+
+
+def test_unknown_codec():
+    with pytest.raises(MlflowException):
+        bundle_extension("rar")
@@ -1,6 +1,19 @@
 # Test for reading and parsing conda.yaml
 
-from mlflow_algorithmia.conda_env import Environment
+import time
+
+import pytest
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia.conda_env import (
+    Dependencies,
+    Environment,
+    MatchSpec,
+    merge_requirements,
+)
+
+
+BENCHMARK_DEPS = 500
 
 
 def test_conda_yaml_1():
@@ -52,3 +65,63 @@ name: mlflow-complex-env
         "dask>1.0",
         "cloudpickle==1.6.0",
     ]
+
+
+def test_conda_yaml_legacy_specs():
+    env = Environment.from_yamlstr(
+        """
+dependencies:
+- numpy=1.19.2=py38h54aff64_0
+- pip:
+  - requests[security]>=2.0; python_version<'3.8'
+  - torch==1.8.0+cpu
+"""
+    )
+    assert env.list_deps() == [
+        "numpy==1.19.2==py38h54aff64_0",
+        "requests>=2.0",
+        "torch==1.8.0+cpu",
+    ]
+
+
+def test_from_files(tmp_path):
+    fpaths = []
+    for i in range(3):
+        fpath = tmp_path / f"conda{i}.yaml"
+        fpath.write_text(f"dependencies:\n- pip:\n  - mlflow\n  - model{i}==1.0\n")
+        fpaths.append(str(fpath))
+
+    envs = Environment.from_files(fpaths)
+    assert [env.list_deps() for env in envs] == [
+        ["mlflow", "model0==1.0"],
+        ["mlflow", "model1==1.0"],
+        ["mlflow", "model2==1.0"],
+    ]
+    # Shared dependencies are parsed once
+    assert envs[0].dependencies["pip"][0] is envs[1].dependencies["pip"][0]
+
+
+def test_merge_requirements():
+    merged = merge_requirements(["mlflow", "scikit_learn==1.0"], ["scikit-learn==1.0"])
+    assert merged == ["mlflow", "scikit-learn==1.0"]
+
+    with pytest.raises(MlflowException, match="Conflicting requirements"):
+        merge_requirements(["scikit-learn==1.0"], ["scikit-learn==1.1"])
+
+
+def test_parse_benchmark():
+    """
+    Micro-benchmark of parsing the dependencies of a large conda.yaml,
+    the timing is reported only (the pkg_resources parser took around 0.25s)
+    """
+    pip = [f"package{i}>={i}.0,<{i + 1}.0" for i in range(BENCHMARK_DEPS)]
+    raw = ["python=3.8", {"pip": pip}]
+
+    MatchSpec.from_str.cache_clear()
+    start = time.perf_counter()
+    deps = Dependencies(raw)
+    elapsed = time.perf_counter() - start
+
+    print(f"Parsed {BENCHMARK_DEPS} dependencies in {elapsed:.3f}s")
+    assert len(deps["pip"]) == BENCHMARK_DEPS
+    assert str(deps["pip"][1]) == "package1<2.0,>=1.0"
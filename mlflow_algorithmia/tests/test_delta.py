@@ -0,0 +1,48 @@
+import os
+
+from mlflow_algorithmia.bundle import hash_model_dir
+from mlflow_algorithmia.delta import DeltaUploader, build_manifest
+
+
+ALGO_DIR = "data://test_user/algo"
+
+
+def test_build_manifest_chunks(model_dir):
+    with open(os.path.join(model_dir, "data", "large.bin"), "wb") as file:
+        file.write(os.urandom(2500))
+
+    manifest, objects = build_manifest(model_dir, "model-1", chunk_size=1000)
+    files = {f["path"]: f for f in manifest["files"]}
+    assert sorted(files) == [
+        "MLmodel",
+        "conda.yaml",
+        "data/large.bin",
+        "data/model.pkl",
+    ]
+    assert len(files["data/large.bin"]["chunks"]) == 3
+    assert len(files["data/model.pkl"]["chunks"]) == 2
+    assert sum(size for _, _, size in objects.values()) == sum(
+        f["size"] for f in manifest["files"]
+    )
+
+
+def test_delta_upload_only_changes(data_api, model_dir, tmp_path, monkeypatch):
+    from mlflow_algorithmia.templates import algorithmia_utils
+
+    uploader = DeltaUploader(data_api.client, ALGO_DIR)
+    path = uploader.upload(model_dir, "model-1.manifest.json", chunk_size=1000)
+    assert path == f"{ALGO_DIR}/model-1.manifest.json"
+    puts = data_api.puts
+
+    with open(os.path.join(model_dir, "MLmodel"), "a") as file:
+        file.write("run_id: 456\n")
+    uploader.upload(model_dir, "model-2.manifest.json", chunk_size=1000)
+    # Only the new MLmodel object and the manifest
+    assert data_api.puts - puts == 2
+
+    monkeypatch.setattr(algorithmia_utils, "client", data_api.client)
+    monkeypatch.chdir(tmp_path)
+    output_dir = str(tmp_path / "models")
+    local_path = algorithmia_utils.get_file(f"{ALGO_DIR}/model-2.manifest.json")
+    assert local_path == os.path.realpath(os.path.join(output_dir, "model-2"))
+    assert hash_model_dir(local_path) == hash_model_dir(model_dir)
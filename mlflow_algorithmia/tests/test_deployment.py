@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import shutil
+import time
+
+import pytest
+from git import Repo
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia.deployment import StageTimer
+from mlflow_algorithmia.signature import compile_signature
+from mlflow_algorithmia.upload import ChunkedUploader
+
+
+@pytest.fixture
+def algo_remote(algo_remotes):
+    return algo_remotes("algo")
+
+
+def test_update_deployment(deployer, data_api, algo_remote, mlflow_model):
+    result = deployer.update_deployment("algo", mlflow_model)
+    head = Repo(algo_remote).head.commit
+    assert result["version"] == head.hexsha
+    assert head.message == "Update - MLflow run_id: abc123"
+
+    bundles = [f for f in data_api.files if f.endswith(".tar.gz")]
+    assert len(bundles) == 1
+    entrypoint = head.tree["src/algo.py"].data_stream.read().decode()
+    assert f'mlflow_bundle = "data://{bundles[0]}"' in entrypoint
+    # The model has no signature
+    assert head.tree["src/input_adapter.json"].data_stream.read() == b"null"
+
+
+def test_compile_signature():
+    inputs = [
+        {"type": "float", "name": "x", "required": True},
+        {"type": "long", "name": "n", "required": False},
+        {"type": "array", "items": {"type": "double"}, "name": "v"},
+    ]
+    columns = compile_signature({"signature": {"inputs": json.dumps(inputs)}})
+    assert columns == [
+        {"name": "x", "dtype": "float32", "required": True},
+        {"name": "n", "dtype": "int64", "required": False},
+        {"name": "v", "dtype": None, "required": True},
+    ]
+
+    tensor = [{"type": "tensor", "tensor-spec": {"dtype": "float32", "shape": [-1]}}]
+    assert compile_signature({"signature": {"inputs": json.dumps(tensor)}}) is None
+    assert compile_signature({"run_id": "abc123"}) is None
+
+
+def test_update_deployment_unchanged(deployer, data_api, algo_remote, mlflow_model):
+    deployer.update_deployment("algo", mlflow_model)
+    head = Repo(algo_remote).head.commit.hexsha
+    puts = data_api.puts
+    # Builds of HEAD are not listed yet, the version still comes from HEAD
+    get_builds, deployer.get_builds = deployer.get_builds, lambda name: []
+
+    result = deployer.update_deployment("algo", mlflow_model)
+    assert result["version"] == head
+    deployer.get_builds = get_builds
+    assert Repo(algo_remote).head.commit.hexsha == head
+    assert data_api.puts == puts
+
+    deployer.update_deployment("algo", mlflow_model, config={"force_deploy": "true"})
+    assert Repo(algo_remote).head.commit.hexsha != head
+    assert data_api.puts > puts
+
+
+def test_multi_model_deployment(
+    deployer, data_api, algo_remote, mlflow_model, tmp_path
+):
+    built = []
+    wait_for_build = deployer.wait_for_build
+
+    def record_build(name, sha, **kwargs):
+        built.append(sha)
+        return wait_for_build(name, sha, **kwargs)
+
+    deployer.wait_for_build = record_build
+    config = {"multi_model": "true", "model_key": "a", "wait_build": "false"}
+    result = deployer.update_deployment("algo", mlflow_model, config=config)
+    assert result["model_key"] == "a"
+    # The new source is built before the model is registered
+    assert built == [result["version"]]
+    head = Repo(algo_remote).head.commit
+    entrypoint = head.tree["src/algo.py"].data_stream.read().decode()
+    assert 'registry_file = "data://test_user/algo/models.json"' in entrypoint
+
+    other = shutil.copytree(mlflow_model, str(tmp_path / "other"))
+    with open(os.path.join(other, "data", "model.pkl"), "wb") as file:
+        file.write(os.urandom(1024))
+    config["model_key"] = "b"
+    result = deployer.update_deployment("algo", other, config=config)
+    # Same requirements, the model is served without a new version
+    assert result["pushed"] is False
+    assert Repo(algo_remote).head.commit.hexsha == head.hexsha
+
+    assert len(built) == 1
+    registry = json.loads(data_api.files["test_user/algo/models.json"])
+    assert sorted(registry["models"]) == ["a", "b"]
+    assert registry["models"]["a"]["bundle"] != registry["models"]["b"]["bundle"]
+
+
+def test_update_deployment_resumes_upload(
+    deployer, data_api, algo_remote, mlflow_model, monkeypatch, caplog
+):
+    with open(os.path.join(mlflow_model, "data", "weights.bin"), "wb") as file:
+        file.write(os.urandom(3 * 1024 * 1024 + 1000))
+    caplog.set_level(logging.INFO, logger="mlflow_algorithmia")
+    config = {
+        "upload_mode": "chunked",
+        "upload_part_size": "1",
+        "upload_workers": "1",
+        "upload_retries": "1",
+    }
+    uploaded = []
+    upload_data = ChunkedUploader.upload_data
+
+    def fail_after_two(self, data, remote_fpath, index):
+        if index >= 2:
+            raise MlflowException("injected failure")
+        uploaded.append(index)
+        return upload_data(self, data, remote_fpath, index)
+
+    monkeypatch.setattr(ChunkedUploader, "upload_data", fail_after_two)
+    with pytest.raises(MlflowException, match="injected failure"):
+        deployer.update_deployment("algo", mlflow_model, config=config)
+    assert uploaded == [0, 1]
+
+    def record(self, data, remote_fpath, index):
+        uploaded.append(index)
+        return upload_data(self, data, remote_fpath, index)
+
+    monkeypatch.setattr(ChunkedUploader, "upload_data", record)
+    del uploaded[:]
+    deployer.update_deployment("algo", mlflow_model, config=config)
+    # Only the parts missing from the first attempt are uploaded
+    assert uploaded == [2, 3]
+    assert "Resuming upload, 2 of 4 parts done" in caplog.text
+
+
+def test_stage_timer():
+    timer = StageTimer()
+    with timer.stage("one"):
+        pass
+    timer.timed("two", lambda x: x)(1)
+    assert list(timer.timings) == ["one", "two"]
+
+
+def test_update_source_only_writes_changes(deployer, tmp_path):
+    repo_path = tmp_path / "source"
+    (repo_path / "src").mkdir(parents=True)
+    config = {"mlflow_bundle_file": "data://test_user/algo/m.tar.gz"}
+
+    assert deployer.update_source("algo", str(repo_path), dependencies=[], **config)
+    entrypoint = repo_path / "src" / "algo.py"
+    requirements = repo_path / "requirements.txt"
+    past = time.time() - 100
+    for fpath in (entrypoint, requirements):
+        os.utime(fpath, (past, past))
+
+    assert not deployer.update_source("algo", str(repo_path), dependencies=[], **config)
+    assert entrypoint.stat().st_mtime == past
+
+    assert deployer.update_source(
+        "algo", str(repo_path), dependencies=["scikit-learn"], **config
+    )
+    assert entrypoint.stat().st_mtime == past
+    assert requirements.stat().st_mtime > past
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia import fleet
+
+
+def test_read_manifest(tmp_path):
+    fpath = tmp_path / "fleet.yaml"
+    fpath.write_text(
+        "config:\n"
+        "  bundle_codec: zst\n"
+        "  upload_mode: single\n"
+        "deployments:\n"
+        "- name: one\n"
+        "  model_uri: models/one\n"
+        "- name: two\n"
+        "  model_uri: models/two\n"
+        "  config:\n"
+        "    upload_mode: chunked\n"
+    )
+    deployments = fleet.read_manifest(str(fpath))
+    assert [d["name"] for d in deployments] == ["one", "two"]
+    assert deployments[0]["config"] == {"bundle_codec": "zst", "upload_mode": "single"}
+    assert deployments[1]["config"] == {"bundle_codec": "zst", "upload_mode": "chunked"}
+
+    fpath.write_text(json.dumps([{"name": "one"}]))
+    with pytest.raises(MlflowException):
+        fleet.read_manifest(str(fpath))
+
+
+def test_create_deployments(deployer, data_api, mlflow_model, tmp_path):
+    deployments = [
+        {"name": "one", "model_uri": mlflow_model},
+        {"name": "two", "model_uri": mlflow_model},
+        {"name": "broken", "model_uri": str(tmp_path / "missing")},
+    ]
+    results = deployer.create_deployments(deployments, max_workers=3)
+    assert [r["status"] for r in results] == ["deployed", "deployed", "failed"]
+    assert "build_duration" in results[0]
+    assert results[2]["error"]
+
+    results = deployer.create_deployments(deployments[:2], max_workers=3)
+    assert [r["status"] for r in results] == ["unchanged", "unchanged"]
+
+
+def test_main(deployer, mlflow_model, tmp_path, monkeypatch):
+    monkeypatch.setattr(fleet, "AlgorithmiaDeploymentClient", lambda target: deployer)
+    manifest = tmp_path / "fleet.json"
+    manifest.write_text(json.dumps([{"name": "one", "model_uri": mlflow_model}]))
+    output = tmp_path / "report.json"
+
+    assert fleet.main([str(manifest), "--no-wait", "-o", str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert report[0]["status"] == "deployed"
+    assert "build_duration" not in report[0]
@@ -1,6 +1,36 @@
+import subprocess
+import sys
+
+
 def test_import():
     import mlflow_algorithmia
 
     assert mlflow_algorithmia.__version__ is not None
     assert mlflow_algorithmia.__version__ != "0.0.0"
     assert len(mlflow_algorithmia.__version__) > 0
+
+
+def test_import_is_lazy():
+    """
+    MLflow imports the plugin to list and describe deployment targets, the
+    import must not pull the Algorithmia, git and templating dependencies
+    """
+    code = (
+        "import sys\n"
+        "import mlflow.deployments\n"
+        "before = set(sys.modules)\n"
+        "import mlflow_algorithmia.deployment as plugin\n"
+        "plugin.target_help()\n"
+        "print(' '.join(sorted(set(sys.modules) - before)))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout.splitlines()
+    imported = out[-1].split()
+
+    heavy = ("Algorithmia", "algorithmia_api_client", "git", "jinja2", "ruamel")
+    assert [m for m in imported if m.split(".")[0] in heavy] == []
+    assert "pkg_resources" not in imported
@@ -0,0 +1,94 @@
+import base64
+import hashlib
+import os
+import zipfile
+
+import pytest
+from git import Repo
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia.lock import RequirementsLock
+
+
+def build_wheel(wheel_dir, name, version, requires=()):
+    """
+    Minimal pure Python wheel, enough for pip to resolve it
+    """
+    dist_info = f"{name}-{version}.dist-info"
+    metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+    metadata += "".join(f"Requires-Dist: {req}\n" for req in requires)
+    files = {
+        f"{name}/__init__.py": "",
+        f"{dist_info}/METADATA": metadata,
+        f"{dist_info}/WHEEL": "Wheel-Version: 1.0\nRoot-Is-Purelib: true\n"
+        "Tag: py3-none-any\n",
+    }
+
+    fpath = os.path.join(wheel_dir, f"{name}-{version}-py3-none-any.whl")
+    record = []
+    with zipfile.ZipFile(fpath, "w") as wheel:
+        for arcname, content in files.items():
+            wheel.writestr(arcname, content)
+            digest = hashlib.sha256(content.encode()).digest()
+            digest = base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+            record.append(f"{arcname},sha256={digest},{len(content)}")
+        record.append(f"{dist_info}/RECORD,,")
+        wheel.writestr(f"{dist_info}/RECORD", "\n".join(record) + "\n")
+    return fpath
+
+
+def sha256(fpath):
+    with open(fpath, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+@pytest.fixture
+def wheel_dir(tmp_path):
+    wheel_dir = tmp_path / "wheels"
+    wheel_dir.mkdir()
+    build_wheel(str(wheel_dir), "alpha", "1.0", requires=["beta>=1"])
+    build_wheel(str(wheel_dir), "beta", "1.0")
+    build_wheel(str(wheel_dir), "beta", "2.0")
+    build_wheel(str(wheel_dir), "algorithmia", "1.9.1")
+    build_wheel(str(wheel_dir), "mlflow", "1.13.0")
+    return str(wheel_dir)
+
+
+def test_lock(tmp_path, wheel_dir):
+    lock = RequirementsLock(str(tmp_path / "locks"), find_links=wheel_dir)
+    content = lock.lock(b"conda.yaml", ["alpha"])
+    alpha = sha256(os.path.join(wheel_dir, "alpha-1.0-py3-none-any.whl"))
+    beta = sha256(os.path.join(wheel_dir, "beta-2.0-py3-none-any.whl"))
+    assert content.splitlines() == [
+        f"alpha==1.0 --hash=sha256:{alpha}",
+        f"beta==2.0 --hash=sha256:{beta}",
+    ]
+
+    # Cached by the source and requirements, pip is not needed any more
+    for fname in os.listdir(wheel_dir):
+        os.remove(os.path.join(wheel_dir, fname))
+    assert lock.lock(b"conda.yaml", ["alpha"]) == content
+    with pytest.raises(MlflowException, match="Failed to lock"):
+        lock.lock(b"conda.yaml", ["alpha", "beta<2"])
+
+
+def test_lock_needs_recent_pip(tmp_path, monkeypatch):
+    monkeypatch.setattr("mlflow_algorithmia.lock.pip_version", lambda: "21.3.1")
+    with pytest.raises(MlflowException, match="pip>=22.2"):
+        RequirementsLock(str(tmp_path)).resolve(["demo-pkg"])
+
+
+def test_deploy_locked(deployer, algo_remotes, mlflow_model, wheel_dir, tmp_path):
+    config = {
+        "lock_deps": "true",
+        "lock_dir": str(tmp_path / "locks"),
+        "lock_find_links": wheel_dir,
+    }
+    deployer.update_deployment("algo", mlflow_model, config=config)
+    head = Repo(algo_remotes("algo")).head.commit
+    requirements = head.tree["requirements.txt"].data_stream.read().decode()
+    assert [line.split(" ")[0] for line in requirements.splitlines()] == [
+        "algorithmia==1.9.1",
+        "mlflow==1.13.0",
+    ]
+    assert all("--hash=sha256:" in line for line in requirements.splitlines())
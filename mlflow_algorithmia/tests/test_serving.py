@@ -0,0 +1,744 @@
+import importlib
+import io
+import json
+import os
+import sys
+import tarfile
+import threading
+import time
+
+import mlflow.pyfunc
+import numpy as np
+import pandas as pd
+import pytest
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia.bundle import bundle_extension, create_bundle, hash_model_dir
+from mlflow_algorithmia.deployment import template_env
+from mlflow_algorithmia.upload import ChunkedUploader
+
+
+class Double(mlflow.pyfunc.PythonModel):
+    def predict(self, context, model_input, params=None):
+        return model_input.to_numpy() * 2
+
+
+class Triple(mlflow.pyfunc.PythonModel):
+    def predict(self, context, model_input, params=None):
+        return model_input.to_numpy() * 3
+
+
+@pytest.fixture
+def pyfunc_model(tmp_path):
+    model_path = str(tmp_path / "pyfunc_model")
+    example = pd.DataFrame({"a": [1.0, 2.0]})
+    mlflow.pyfunc.save_model(model_path, python_model=Double(), input_example=example)
+    return model_path
+
+
+@pytest.fixture
+def render_algorithm(tmp_path, monkeypatch):
+    """
+    Renders the algorithm source and imports its entrypoint
+    """
+    src = tmp_path / "src"
+    src.mkdir()
+    monkeypatch.syspath_prepend(str(src))
+    modules = ["algo", "mlflow_wrapper", "algorithmia_utils", "batch_job"]
+
+    def render(entrypoint="entrypoint.py", **kwargs):
+        files = [(entrypoint, "algo.py")]
+        files += [("mlflow_wrapper.py",) * 2, ("algorithmia_utils.py",) * 2]
+        files += [("batch_job.py",) * 2]
+        if "input_adapter" in kwargs:
+            files += [("input_adapter.json",) * 2]
+        for template, fname in files:
+            output = template_env().get_template(template).render(**kwargs)
+            (src / fname).write_text(output)
+        for module in modules:
+            sys.modules.pop(module, None)
+        return importlib.import_module("algo")
+
+    yield render
+    for module in modules:
+        sys.modules.pop(module, None)
+
+
+def test_warmup(pyfunc_model, render_algorithm):
+    algo = render_algorithm(mlflow_bundle_file=pyfunc_model, serving_mode="lazy")
+    wrapper = algo.load_model()
+    predictions = wrapper.warmup()
+    assert predictions.tolist() == [[2.0], [4.0]]
+
+
+def test_eager_load(pyfunc_model, render_algorithm, capsys):
+    algo = render_algorithm(
+        mlflow_bundle_file=pyfunc_model, serving_mode="eager", warmup=True
+    )
+    loader = [t for t in threading.enumerate() if t.name == "model-loader"]
+    for thread in loader:
+        thread.join()
+    # Loaded without waiting for a request
+    assert algo.model is not None
+    assert algo.get_model() is algo.model
+    assert "Warm-up prediction took" in capsys.readouterr().out
+
+
+def test_lazy_load(pyfunc_model, render_algorithm):
+    algo = render_algorithm(mlflow_bundle_file=pyfunc_model, serving_mode="lazy")
+    assert algo.model is None
+    assert algo.get_model() is algo.model
+
+
+def test_serving_mode_setting(deployer, mlflow_model):
+    with pytest.raises(MlflowException, match="Unknown serving mode"):
+        deployer.update_deployment(
+            "algo", mlflow_model, config={"serving_mode": "fast"}
+        )
+    with pytest.raises(MlflowException, match="Unknown predict pool"):
+        deployer.update_deployment("algo", mlflow_model, config={"predict_pool": "gpu"})
+
+
+@pytest.mark.parametrize("upload_mode", ["single", "chunked"])
+def test_get_bundle_cache(data_api, model_dir, tmp_path, monkeypatch, upload_mode):
+    from mlflow_algorithmia.templates import algorithmia_utils
+
+    monkeypatch.setattr(algorithmia_utils, "client", data_api.client)
+    remote = f"data://test_user/algo/model-1{bundle_extension('pgz')}"
+    fpath = str(tmp_path / "bundle.tar.gz")
+    with open(fpath, "wb") as file:
+        create_bundle(model_dir, file, arcname="model-1", codec="pgz")
+    if upload_mode == "single":
+        data_api.client.file(remote).putFile(fpath)
+    else:
+        ChunkedUploader(data_api.client, part_size=512).upload(fpath, remote)
+
+    cache_dir = str(tmp_path / "cache")
+    local_path = algorithmia_utils.get_bundle(remote, cache_dir=cache_dir)
+    assert hash_model_dir(local_path) == hash_model_dir(model_dir)
+    assert not [f for f in os.listdir(cache_dir) if f.startswith(".extract")]
+
+    # A cold start with an intact cache does not download the bundle
+    gets = data_api.gets
+    assert algorithmia_utils.get_bundle(remote, cache_dir=cache_dir) == local_path
+    assert data_api.gets - gets == (0 if upload_mode == "single" else 1)
+
+    # A damaged entry is extracted again
+    with open(os.path.join(local_path, "data", "model.pkl"), "wb") as file:
+        file.write(b"truncated")
+    algorithmia_utils.get_bundle(remote, cache_dir=cache_dir)
+    assert hash_model_dir(local_path) == hash_model_dir(model_dir)
+
+
+def tar_member(name, type=tarfile.REGTYPE, linkname=""):
+    member = tarfile.TarInfo(name)
+    member.type = type
+    member.linkname = linkname
+    return member
+
+
+@pytest.mark.parametrize(
+    "member",
+    [
+        tar_member("../outside"),
+        tar_member("link", tarfile.SYMTYPE, "../outside"),
+        tar_member("data/link", tarfile.SYMTYPE, "../../outside"),
+        tar_member("link", tarfile.SYMTYPE, "/etc/passwd"),
+        tar_member("hard", tarfile.LNKTYPE, "../outside"),
+        tar_member("fifo", tarfile.FIFOTYPE),
+        tar_member("dev", tarfile.CHRTYPE),
+    ],
+    ids=lambda member: f"{member.name}-{member.linkname}",
+)
+def test_extract_rejects_unsafe_members(member, tmp_path):
+    from mlflow_algorithmia.templates import algorithmia_utils
+
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        tar.addfile(tar_member("data", tarfile.DIRTYPE))
+        tar.addfile(member)
+
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    with pytest.raises(Exception, match="bundle"):
+        algorithmia_utils.extract_stream([buffer.getvalue()], str(output_dir))
+    assert not (tmp_path / "outside").exists()
+
+    # Links inside the bundle are kept
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        tar.addfile(tar_member("data", tarfile.DIRTYPE))
+        tar.addfile(tar_member("data/link", tarfile.SYMTYPE, "../model.pkl"))
+    algorithmia_utils.extract_stream([buffer.getvalue()], str(output_dir))
+    assert os.readlink(output_dir / "data" / "link") == "../model.pkl"
+
+
+INPUTS = {
+    "split": {
+        "columns": ["a", "b", "c"],
+        "data": [[1, "x", True], [2.5, None, False], [3, "z", True]],
+    },
+    "split_index": {"columns": ["a"], "data": [[1], [2]], "index": [5, 7]},
+    "records": [{"a": 1, "b": "x"}, {"a": 2.5, "c": True}, {"b": "z", "a": -1}],
+    "columns": {"a": {"0": 12.8, "1": 3}, "b": {"0": "x", "1": "y"}},
+}
+
+
+@pytest.mark.parametrize("name", sorted(INPUTS))
+def test_input_parser_matches_read_json(name):
+    from mlflow_algorithmia.templates.mlflow_wrapper import InputParser
+
+    input = INPUTS[name]
+    orient = name.split("_")[0]
+    expected = pd.read_json(io.StringIO(json.dumps(input)), orient=orient, dtype=False)
+    pd.testing.assert_frame_equal(InputParser().parse(input), expected)
+
+
+def test_input_parser_signature():
+    from mlflow.models.signature import infer_signature
+
+    from mlflow_algorithmia.templates.mlflow_wrapper import InputParser
+
+    example = pd.DataFrame({"x": [1.5], "y": [1.5], "n": [1], "s": ["a"]})
+    parser = InputParser(infer_signature(example).inputs)
+
+    payload = {
+        "dataframe_records": [
+            {"s": "b", "n": 2, "y": 2, "x": 1.0},
+            {"s": "c", "n": 3, "y": 3, "x": 4},
+        ]
+    }
+    df = parser.parse(payload)
+    assert list(df.columns) == ["x", "y", "n", "s"]
+    assert df["y"].dtype == np.float64
+    assert df["n"].dtype == np.int64
+
+    # Lossy casts are left to the MLflow schema enforcement
+    df = parser.parse({"columns": ["s", "n", "y", "x"], "data": [["a", 1.5, 1, 1]]})
+    assert df["n"].dtype == np.float64
+
+
+def test_input_parser_downcast():
+    from mlflow_algorithmia.templates.mlflow_wrapper import InputParser
+
+    parser = InputParser(
+        columns=[
+            {"name": "x", "dtype": "float32", "required": True},
+            {"name": "n", "dtype": "int32", "required": True},
+            {"name": "s", "dtype": "object", "required": False},
+        ]
+    )
+    df = parser.parse({"columns": ["extra", "n", "x"], "data": [[0, 1, 1.5]]})
+    assert list(df.columns) == ["x", "n"]
+    assert df.dtypes.tolist() == [np.float32, np.int32]
+
+    df = parser.parse_frame(pd.DataFrame({"n": [2**40], "x": [1.0]}))
+    assert df["n"].dtype == np.int64
+
+    # JSON ints in a float column
+    df = parser.parse({"columns": ["x", "n"], "data": [[1, 2], [3, 4]]})
+    assert df["x"].dtype == np.float32
+    assert df["x"].tolist() == [1.0, 3.0]
+    df = parser.parse_frame(pd.DataFrame({"x": np.array([1, 2**40]), "n": [1, 2]}))
+    assert df["x"].dtype == np.float32
+
+    # Out of the float32 range, left to MLflow instead of becoming inf
+    df = parser.parse({"columns": ["x", "n"], "data": [[1e300, 1], [1.5, 2]]})
+    assert df["x"].dtype == np.float64
+    assert df["x"].tolist() == [1e300, 1.5]
+    df = parser.parse_frame(pd.DataFrame({"x": [np.inf, np.nan, 1.5], "n": 1}))
+    assert df["x"].dtype == np.float32
+
+    with pytest.raises(Exception, match="Missing input columns: n"):
+        parser.parse([{"x": 1.0, "s": "a"}])
+    # Positional inputs are matched by MLflow
+    assert list(parser.parse({"data": [[1.0, 2]]}).columns) == [0, 1]
+
+
+def test_input_adapter(pyfunc_model, render_algorithm):
+    from mlflow.models import Model
+
+    from mlflow_algorithmia.signature import compile_signature
+
+    mlmodel = Model.load(pyfunc_model).to_dict()
+    columns = compile_signature(mlmodel)
+    assert columns == [{"name": "a", "dtype": "float64", "required": True}]
+
+    algo = render_algorithm(
+        mlflow_bundle_file=pyfunc_model,
+        input_adapter=json.dumps(columns),
+    )
+    wrapper = algo.load_model()
+    assert wrapper.parser.columns == ["a"]
+    assert algo.apply([{"b": "extra", "a": 1}]) == [[2.0]]
+
+
+def test_wrapper_predict(pyfunc_model, render_algorithm):
+    algo = render_algorithm(mlflow_bundle_file=pyfunc_model, serving_mode="lazy")
+    input = {"columns": ["a"], "data": [[1.0], [2.5]]}
+    assert algo.apply(input) == [[2.0], [5.0]]
+    assert algo.apply(json.dumps(input)) == [[2.0], [5.0]]
+
+
+@pytest.mark.parametrize("format", ["arrow", "npy", "npz"])
+def test_input_parser_binary(format):
+    from mlflow.models.signature import infer_signature
+
+    from mlflow_algorithmia.formats import encode_dataframe
+    from mlflow_algorithmia.templates.mlflow_wrapper import InputParser
+
+    df = pd.DataFrame({"y": np.arange(5, dtype=np.float32), "x": np.arange(5.0)})
+    parser = InputParser(infer_signature(df[["x", "y"]]).inputs)
+    parsed = parser.parse_bytes(encode_dataframe(df, format))
+    # A single npy array has no column names or per column dtypes, they
+    # come from the signature
+    pd.testing.assert_frame_equal(parsed, df[["x", "y"]])
+
+
+def test_read_npy_writeable():
+    from mlflow_algorithmia.formats import encode_dataframe
+    from mlflow_algorithmia.templates.mlflow_wrapper import read_npy
+
+    df = pd.DataFrame({"x": np.arange(3.0), "y": np.arange(3.0)})
+    data = encode_dataframe(df, "npy")
+    # Copied out of the immutable payload, models can modify it in place
+    array = read_npy(data)
+    array[0, 0] = 10
+    assert array[0].tolist() == [10, 0]
+    # A mutable payload is not copied
+    payload = bytearray(data)
+    array = read_npy(payload)
+    array[0, 0] = 10
+    assert read_npy(payload)[0, 0] == 10
+
+
+def test_binary_formats_reject_objects():
+    from mlflow_algorithmia.formats import encode_dataframe
+
+    df = pd.DataFrame({"s": pd.Series(["a", "b"], dtype=object)})
+    for format in ("npy", "npz"):
+        with pytest.raises(MlflowException, match="numeric columns"):
+            encode_dataframe(df, format)
+    with pytest.raises(MlflowException, match="Unknown predict format"):
+        encode_dataframe(df, "csv")
+
+
+def test_wrapper_predict_binary(pyfunc_model, render_algorithm):
+    from mlflow_algorithmia.formats import encode_dataframe
+
+    algo = render_algorithm(mlflow_bundle_file=pyfunc_model, serving_mode="lazy")
+    df = pd.DataFrame({"a": [1.0, 2.5]})
+    for format in ("arrow", "npy", "npz"):
+        assert algo.apply(encode_dataframe(df, format)) == [[2.0], [5.0]]
+
+
+def test_predict_format(deployer, data_api):
+    df = pd.DataFrame({"a": [1.0, 2.5]})
+    assert deployer.predict("algo", df) == "text/plain"
+    assert deployer.predict("algo", df, format="arrow") == "application/octet-stream"
+
+    content_type, body = data_api.calls[-1]
+    assert body.startswith(b"\xff\xff\xff\xff")
+
+    deployer.predict("algo", df, output_format="npy")
+    content_type, body = data_api.calls[-1]
+    assert json.loads(body)["output_format"] == "npy"
+    with pytest.raises(MlflowException, match="json requests"):
+        deployer.predict("algo", df, format="npy", output_format="npy")
+
+
+def test_encode_output():
+    from mlflow_algorithmia.formats import decode_predictions
+    from mlflow_algorithmia.templates.mlflow_wrapper import encode_output
+
+    array = np.arange(6.0).reshape(3, 2)
+    assert encode_output(array) == array.tolist()
+
+    envelope = encode_output(array, threshold=4)
+    assert envelope["format"] == "npy"
+    np.testing.assert_array_equal(decode_predictions(envelope), array)
+    np.testing.assert_array_equal(
+        decode_predictions(encode_output(array, "bytes")), array
+    )
+
+    df = pd.DataFrame({"label": ["a", "b"], "score": [0.5, 1.5]})
+    assert encode_output(df) == [
+        {"label": "a", "score": 0.5},
+        {"label": "b", "score": 1.5},
+    ]
+    assert encode_output(df, threshold=1)["format"] == "arrow"
+    pd.testing.assert_frame_equal(
+        decode_predictions(encode_output(df, "arrow")), df, check_dtype=False
+    )
+    assert encode_output(pd.Series([1, 2]), "list") == [1, 2]
+
+
+def test_wrapper_output_format(pyfunc_model, render_algorithm):
+    from mlflow_algorithmia.formats import decode_predictions
+
+    algo = render_algorithm(
+        mlflow_bundle_file=pyfunc_model, output_format="list", output_threshold=1
+    )
+    split = {"columns": ["a"], "data": [[1.0], [2.5]]}
+    assert algo.apply(split) == [[2.0], [5.0]]
+
+    result = algo.apply({"dataframe_split": split, "output_format": "npy"})
+    np.testing.assert_array_equal(decode_predictions(result), [[2.0], [5.0]])
+
+    algo = render_algorithm(mlflow_bundle_file=pyfunc_model, output_threshold=1)
+    assert algo.apply(split)["format"] == "npy"
+
+
+def test_batch_job_local(pyfunc_model, render_algorithm, tmp_path):
+    algo = render_algorithm(mlflow_bundle_file=pyfunc_model)
+    input_fpath = tmp_path / "input.csv"
+    pd.DataFrame({"a": np.arange(10.0)}).to_csv(input_fpath, index=False)
+
+    output_fpath = str(tmp_path / "output.jsonl")
+    job = {"input_file": str(input_fpath), "output_file": output_fpath}
+    result = algo.apply(dict(job, chunk_rows=3))
+    assert result["rows"] == 10 and result["chunks"] == 4
+    output = pd.read_json(output_fpath, lines=True)
+    assert output["prediction_0"].tolist() == list(range(0, 20, 2))
+
+
+@pytest.mark.parametrize("upload_mode", ["single", "chunked"])
+@pytest.mark.parametrize("extension", ["csv", "jsonl", "parquet"])
+def test_batch_predict(
+    deployer,
+    data_api,
+    pyfunc_model,
+    render_algorithm,
+    tmp_path,
+    monkeypatch,
+    upload_mode,
+    extension,
+):
+    deployer.settings["upload_mode"] = upload_mode
+    algo = render_algorithm(mlflow_bundle_file=pyfunc_model)
+    utils = importlib.import_module("algorithmia_utils")
+    monkeypatch.setattr(utils, "client", data_api.client)
+    data_api.algorithm = algo.apply
+
+    df = pd.DataFrame({"a": np.arange(25.0)})
+    input_fpath = str(tmp_path / f"scores.{extension}")
+    if extension == "csv":
+        df.to_csv(input_fpath, index=False)
+    elif extension == "jsonl":
+        df.to_json(input_fpath, orient="records", lines=True)
+    else:
+        df.to_parquet(input_fpath)
+
+    output_file = deployer.batch_predict("algo", input_fpath, chunk_rows=10)
+    assert output_file == f"data://test_user/algo/batch/scores.predictions.{extension}"
+
+    data = io.BytesIO(data_api.files[output_file[len("data://") :]])
+    if extension == "csv":
+        output = pd.read_csv(data)
+    elif extension == "jsonl":
+        output = pd.read_json(data, lines=True)
+    else:
+        output = pd.read_parquet(data)
+    assert output["prediction_0"].tolist() == (df["a"] * 2).tolist()
+
+
+@pytest.mark.parametrize("pool", ["thread", "process"])
+def test_parallel_predict(pyfunc_model, render_algorithm, pool):
+    algo = render_algorithm(
+        mlflow_bundle_file=pyfunc_model,
+        predict_workers=2,
+        predict_chunk_rows=3,
+        predict_pool=pool,
+    )
+    wrapper = algo.load_model()
+    assert wrapper.workers == 2
+
+    df = pd.DataFrame({"a": np.arange(10.0)})
+    np.testing.assert_array_equal(wrapper.predict(df), df.to_numpy() * 2)
+    wrapper.executor.shutdown()
+
+
+def test_concat_predictions():
+    from mlflow_algorithmia.templates.mlflow_wrapper import concat_predictions
+
+    df = pd.DataFrame({"a": np.arange(5)})
+    chunks = [df.iloc[:2], df.iloc[2:]]
+    pd.testing.assert_frame_equal(concat_predictions(chunks), df)
+    assert concat_predictions([[1, 2], [3]]) == [1, 2, 3]
+
+
+@pytest.mark.parametrize("format", ["json", "npy"])
+def test_chunked_predict(deployer, data_api, pyfunc_model, render_algorithm, format):
+    algo = render_algorithm(mlflow_bundle_file=pyfunc_model, output_format="list")
+    data_api.algorithm = algo.apply
+    data_api.fail_calls = 2
+    deployer.settings["predict_batch_rows"] = 4
+    deployer.settings["predict_concurrency"] = 3
+
+    df = pd.DataFrame({"a": np.arange(10.0)})
+    predictions = deployer.predict("algo", df, format=format)
+    assert predictions == (df.to_numpy() * 2).tolist()
+    assert len(data_api.calls) == 3 + 2
+
+
+def test_client_pool_size(deployer):
+    deployer.client = None
+    deployer.settings["predict_concurrency"] = "16"
+    session = deployer.client.requestSession
+    # Sized when the client is created, never remounted by predict
+    assert session.get_adapter("https://api.algorithmia.com")._pool_maxsize == 16
+    assert deployer.client.requestSession is session
+
+
+def test_prediction_cache(pyfunc_model, render_algorithm):
+    algo = render_algorithm(
+        mlflow_bundle_file=pyfunc_model, output_format="list", cache_entries=3
+    )
+    wrapper = algo.load_model()
+    predicted = []
+    predict = wrapper.model.predict
+    wrapper.model.predict = lambda df: predicted.append(len(df)) or predict(df)
+
+    assert algo.apply({"columns": ["a"], "data": [[1], [2]]}) == [[2.0], [4.0]]
+    assert algo.apply({"columns": ["a"], "data": [[3], [2], [1]]}) == [
+        [6.0],
+        [4.0],
+        [2.0],
+    ]
+    assert algo.apply({"columns": ["a"], "data": [[2]]}) == [[4.0]]
+    assert predicted == [2, 1]
+
+    stats = algo.apply({"cache_stats": True})
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 3, 3)
+
+    # The least recently used row (1) is evicted when 4 comes in
+    algo.apply({"columns": ["a"], "data": [[4], [3]]})
+    assert predicted == [2, 1, 1]
+    assert algo.apply({"columns": ["a"], "data": [[1]]}) == [[2.0]]
+    assert predicted == [2, 1, 1, 1]
+    assert algo.apply({"cache_stats": True})["evictions"] == 2
+
+
+def test_prediction_cache_ndarray(pyfunc_model, render_algorithm):
+    from mlflow_algorithmia.templates.mlflow_wrapper import PredictionCache
+
+    algo = render_algorithm(
+        mlflow_bundle_file=pyfunc_model, output_format="list", cache_entries=100
+    )
+    wrapper = algo.load_model()
+    # Large batch of 2-D predictions, one row of 4 float64 per input row
+    wrapper.model.predict = lambda df: np.tile(df.to_numpy(), (1, 4))
+
+    data = [[float(i)] for i in range(50)]
+    assert algo.apply({"columns": ["a"], "data": data})[1] == [1.0] * 4
+    # The cached rows own their memory, the batch is not retained
+    rows = [row for row, _, _ in wrapper.cache.entries.values()]
+    assert all(row.base is None for row in rows)
+    overhead = PredictionCache.ENTRY_OVERHEAD
+    assert algo.apply({"cache_stats": True})["bytes"] == 50 * (4 * 8 + overhead)
+
+
+def test_prediction_cache_limits():
+    from mlflow_algorithmia.templates.mlflow_wrapper import PredictionCache
+
+    cache = PredictionCache(100, max_bytes=PredictionCache.ENTRY_OVERHEAD * 2 + 100)
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+    keys = cache.keys(df)
+    assert len(set(keys)) == 3
+    assert keys != cache.keys(df.astype(np.float32))
+
+    cache.put(keys, [np.float64(1), np.float64(2), np.float64(3)])
+    assert cache.get(keys) == [None, 2.0, 3.0]
+
+    cache = PredictionCache(100, ttl=0.01)
+    cache.put(keys, [1, 2, 3])
+    time.sleep(0.02)
+    assert cache.get(keys) == [None, None, None]
+
+
+def test_multi_model(pyfunc_model, render_algorithm, tmp_path):
+    registry = tmp_path / "models.json"
+    registry.write_text(json.dumps({"models": {"a": {"bundle": pyfunc_model}}}))
+    algo = render_algorithm(
+        entrypoint="multi_entrypoint.py", registry_file=str(registry)
+    )
+
+    df = pd.DataFrame({"a": [1.0, 2.0]})
+    result = algo.apply({"model": "a", "input": df.to_json(orient="split")})
+    assert result == [[2.0], [4.0]]
+    assert algo.apply({"pool_stats": True})["models"] == ["a"]
+
+    with pytest.raises(Exception, match="Unknown model: b"):
+        algo.apply({"model": "b", "input": df.to_json(orient="split")})
+    with pytest.raises(Exception, match="model"):
+        algo.apply(df.to_json(orient="split"))
+
+
+def test_multi_model_deploy_predict(
+    deployer, data_api, pyfunc_model, render_algorithm, tmp_path, monkeypatch
+):
+    triple_model = str(tmp_path / "triple_model")
+    mlflow.pyfunc.save_model(triple_model, python_model=Triple())
+    for key, model_uri in (("double", pyfunc_model), ("triple", triple_model)):
+        with open(os.path.join(model_uri, "MLmodel"), "a") as file:
+            file.write("run_id: abc123\n")
+        config = {"multi_model": "true", "model_key": key, "wait_build": "false"}
+        deployer.update_deployment("algo", model_uri, config=config)
+
+    monkeypatch.setenv("MLFLOW_MODEL_CACHE_DIR", str(tmp_path / "model_cache"))
+    algo = render_algorithm(
+        entrypoint="multi_entrypoint.py",
+        registry_file="data://test_user/algo/models.json",
+    )
+    utils = importlib.import_module("algorithmia_utils")
+    monkeypatch.setattr(utils, "client", data_api.client)
+    data_api.algorithm = algo.apply
+
+    df = pd.DataFrame({"a": np.arange(5.0)})
+    assert deployer.predict("algo", df, model_key="double") == [
+        [x * 2] for x in df["a"]
+    ]
+    # Every chunk is sent to the model
+    deployer.settings["predict_batch_rows"] = 2
+    assert deployer.predict("algo", df, model_key="triple") == [
+        [x * 3] for x in df["a"]
+    ]
+    with pytest.raises(MlflowException, match="json requests"):
+        deployer.predict("algo", df, format="npy", model_key="triple")
+
+    input_fpath = str(tmp_path / "scores.csv")
+    df.to_csv(input_fpath, index=False)
+    output_file = deployer.batch_predict(
+        "algo", input_fpath, chunk_rows=2, model_key="triple"
+    )
+    output = pd.read_csv(io.BytesIO(data_api.files[output_file[len("data://") :]]))
+    assert output["prediction_0"].tolist() == (df["a"] * 3).tolist()
+    assert algo.apply({"pool_stats": True})["models"] == ["double", "triple"]
+
+
+def test_model_pool(render_algorithm, tmp_path):
+    algo = render_algorithm(entrypoint="multi_entrypoint.py")
+    loads = []
+    release = threading.Event()
+
+    class Model(object):
+        def __init__(self, bundle):
+            self.model_fpath = bundle
+            self.closed = False
+
+        def close(self):
+            self.closed = True
+
+    def load(bundle, input_columns=None):
+        loads.append(bundle)
+        if bundle.endswith("slow"):
+            release.wait(5)
+        return Model(bundle)
+
+    bundles = {}
+    for key in ("a", "b", "c", "slow"):
+        bundles[key] = str(tmp_path / key)
+        with open(bundles[key], "wb") as file:
+            file.write(b"x" * 100)
+
+    pool = algo.ModelPool(250, load=load)
+    a = pool.get("a", bundles["a"])
+    pool.get("b", bundles["b"])
+    assert pool.get("a", bundles["a"]) is a
+    # c does not fit, b is the least recently used model
+    pool.get("c", bundles["c"])
+    assert pool.stats() == {"models": ["a", "c"], "loading": [], "bytes": 200}
+    assert len(loads) == 3
+
+    # Concurrent requests share the load, loaded models are still served
+    first = pool.get_async("slow", bundles["slow"])
+    second = pool.get_async("slow", bundles["slow"])
+    assert pool.get("a", bundles["a"]) is a
+    assert pool.stats()["loading"] == ["slow"]
+    release.set()
+    assert first.result() is second.result()
+    assert loads.count(bundles["slow"]) == 1
+    assert pool.stats()["models"] == ["a", "slow"]
+
+    # A new bundle of a loaded key replaces the model
+    pool.get("a", bundles["b"])
+    assert a.closed
+    assert pool.stats() == {"models": ["slow", "a"], "loading": [], "bytes": 200}
+
+    # Models in use are closed when their last request finishes
+    with pool.use("c", bundles["c"]) as c:
+        with pool.use("c", bundles["c"]):
+            pool.get("b", bundles["b"])
+            pool.get("a", bundles["a"])
+            assert "c" not in pool.stats()["models"]
+        assert not c.closed
+    assert c.closed
+
+
+def test_model_pool_waiting_request(render_algorithm, tmp_path):
+    algo = render_algorithm(entrypoint="multi_entrypoint.py")
+    release = threading.Event()
+    done = threading.Event()
+
+    class Model(object):
+        def __init__(self, bundle):
+            self.model_fpath = bundle
+            self.closed = False
+
+        def close(self):
+            self.closed = True
+
+    def load(bundle, input_columns=None):
+        if bundle.endswith("slow"):
+            release.wait(5)
+        return Model(bundle)
+
+    bundles = {}
+    for key in ("a", "slow"):
+        bundles[key] = str(tmp_path / key)
+        with open(bundles[key], "wb") as file:
+            file.write(b"x" * 100)
+
+    pool = algo.ModelPool(150, load=load)
+    used = []
+
+    def request():
+        with pool.use("slow", bundles["slow"]) as model:
+            used.append(model)
+            done.wait(5)
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    # The request is counted while the model is loading
+    while pool.loading.get(("slow", bundles["slow"])) is None:
+        time.sleep(0.01)
+    assert pool.loading[("slow", bundles["slow"])].users == 1
+
+    # Evicted as soon as it is published, it is still served to the request
+    release.set()
+    while pool.loading:
+        time.sleep(0.01)
+    pool.get("a", bundles["a"])
+    while not used:
+        time.sleep(0.01)
+    assert pool.stats()["models"] == ["a"]
+    assert not used[0].closed
+    done.set()
+    thread.join()
+    assert used[0].closed
+
+
+def test_registry_refresh(render_algorithm, tmp_path):
+    algo = render_algorithm(entrypoint="multi_entrypoint.py")
+    fpath = tmp_path / "models.json"
+    fpath.write_text(json.dumps({"models": {"a": {"bundle": "a1"}}}))
+    registry = algo.Registry(str(fpath), ttl=60)
+    assert registry.model("a")["bundle"] == "a1"
+
+    models = {"a": {"bundle": "a2"}, "b": {"bundle": "b1"}}
+    fpath.write_text(json.dumps({"models": models}))
+    # Cached until the ttl, unknown keys read it again
+    assert registry.model("a")["bundle"] == "a1"
+    registry.read_at -= 2
+    assert registry.model("b")["bundle"] == "b1"
+    assert registry.model("a")["bundle"] == "a2"
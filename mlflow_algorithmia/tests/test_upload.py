@@ -0,0 +1,151 @@
+import os
+import tarfile
+import threading
+
+import pytest
+from mlflow.exceptions import MlflowException
+
+from mlflow_algorithmia.bundle import hash_model_dir
+from mlflow_algorithmia.deployment import AlgorithmiaDeploymentClient
+from mlflow_algorithmia.upload import (
+    ChunkedUploader,
+    StreamPipe,
+    manifest_path,
+    remote_exists,
+    retry_delay,
+)
+
+
+REMOTE = "data://test_user/algo/model.tar.gz"
+
+
+@pytest.fixture
+def local_file(tmp_path):
+    fpath = tmp_path / "model.tar.gz"
+    fpath.write_bytes(os.urandom(10 * 1000 + 7))
+    return str(fpath)
+
+
+def stored(data_api, remote_fpath):
+    """Reassemble a chunked upload from the stand-in server"""
+    prefix = remote_fpath[len("data://") :] + ".parts/"
+    names = sorted(f for f in data_api.files if f.startswith(prefix))
+    return b"".join(data_api.files[f] for f in names if not f.endswith(".json"))
+
+
+def test_chunked_upload(data_api, local_file):
+    progress = []
+    uploader = ChunkedUploader(
+        data_api.client,
+        part_size=1000,
+        workers=4,
+        progress=lambda done, total: progress.append((done, total)),
+    )
+    assert uploader.upload(local_file, REMOTE) == REMOTE
+
+    assert remote_exists(data_api.client, REMOTE)
+    assert stored(data_api, REMOTE) == open(local_file, "rb").read()
+    assert len(progress) == 11
+    assert max(progress) == (10007, 10007)
+    assert not os.path.exists(local_file + ".upload.json")
+
+
+def test_chunked_upload_retries(data_api, local_file):
+    data_api.fail_puts = 3
+    uploader = ChunkedUploader(data_api.client, part_size=1000, backoff=0.01)
+    uploader.upload(local_file, REMOTE)
+    assert stored(data_api, REMOTE) == open(local_file, "rb").read()
+
+
+def test_chunked_upload_resume(data_api, local_file):
+    uploader = ChunkedUploader(
+        data_api.client, part_size=1000, workers=1, retries=1, backoff=0
+    )
+    # Let the first 4 parts through and fail the rest
+    original_put = uploader.upload_part
+
+    def upload_part(local_fpath, remote_fpath, index):
+        if index >= 4:
+            data_api.fail_puts = 1
+        return original_put(local_fpath, remote_fpath, index)
+
+    uploader.upload_part = upload_part
+    with pytest.raises(MlflowException):
+        uploader.upload(local_file, REMOTE)
+    assert not data_api.client.file(manifest_path(REMOTE)).exists()
+
+    puts = data_api.puts
+    uploader = ChunkedUploader(data_api.client, part_size=1000)
+    uploader.upload(local_file, REMOTE)
+    # 4 parts were confirmed so only 7 parts and the manifest are uploaded
+    assert data_api.puts - puts == 8
+    assert stored(data_api, REMOTE) == open(local_file, "rb").read()
+
+
+def test_retry_delay():
+    error = ValueError("connection reset")
+    assert 0.5 <= retry_delay(0, error, "part", retries=2) <= 1.5
+    assert 2.0 <= retry_delay(2, error, "part", retries=5, backoff=1.0) <= 6.0
+    with pytest.raises(MlflowException, match="Upload of part failed") as info:
+        retry_delay(1, error, "part", retries=2)
+    assert info.value.__cause__ is error
+
+
+def test_stream_pipe_bounded():
+    pipe = StreamPipe(max_bytes=10)
+    pipe.write(b"0123456789")
+
+    writer = threading.Thread(target=pipe.write, args=(b"abc",))
+    writer.start()
+    writer.join(0.1)
+    # The writer blocks until the reader drains the buffer
+    assert writer.is_alive()
+    assert pipe.read(4) == b"0123"
+    writer.join(1)
+    assert not writer.is_alive()
+
+    pipe.close()
+    assert b"".join(pipe) == b"456789abc"
+
+
+def test_stream_pipe_errors():
+    pipe = StreamPipe()
+    pipe.close(error=ValueError("compression failed"))
+    with pytest.raises(ValueError):
+        pipe.read()
+
+    pipe = StreamPipe(max_bytes=1)
+    pipe.abort()
+    with pytest.raises(BrokenPipeError):
+        pipe.write(b"data")
+
+
+@pytest.mark.parametrize("upload_mode", ["single", "chunked"])
+def test_stream_bundle(data_api, model_dir, tmp_path, monkeypatch, upload_mode):
+    monkeypatch.setenv("ALGORITHMIA_API_KEY", "algo-key")
+    monkeypatch.setenv("ALGORITHMIA_USERNAME", "test_user")
+    deployer = AlgorithmiaDeploymentClient("algorithmia")
+    deployer.client = data_api.client
+    deployer.settings.update(
+        {"upload_mode": upload_mode, "stream_buffer_size": 1, "upload_part_size": 1}
+    )
+    deployer.run_id = "run"
+    deployer.bundle_hash = hash_model_dir(model_dir)
+    with open(os.path.join(model_dir, "data", "large.bin"), "wb") as file:
+        file.write(os.urandom(3 * 1024 * 1024))
+
+    algo_file = deployer.stream_bundle("algo", model_dir)
+    assert remote_exists(data_api.client, algo_file)
+
+    path = algo_file[len("data://") :]
+    local_fpath = str(tmp_path / "bundle.tar.gz")
+    with open(local_fpath, "wb") as file:
+        if upload_mode == "single":
+            file.write(data_api.files[path])
+        else:
+            file.write(stored(data_api, algo_file))
+
+    with tarfile.open(local_fpath) as tar:
+        tar.extractall(str(tmp_path / "out"))
+    extracted = str(tmp_path / "out" / deployer.bundle_fname()[: -len(".tar.gz")])
+    assert hash_model_dir(extracted) == hash_model_dir(model_dir)
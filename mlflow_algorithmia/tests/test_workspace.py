@@ -0,0 +1,79 @@
+import os
+import time
+
+import pytest
+from git import Repo
+
+from mlflow_algorithmia.workspace import WorkspaceCache
+
+
+def commit(repo, fname, content):
+    with open(os.path.join(repo.working_dir, fname), "w") as file:
+        file.write(content)
+    repo.git.add(".")
+    repo.index.commit(f"Update {fname}")
+    repo.remote("origin").push(repo.active_branch.name)
+
+
+@pytest.fixture
+def remote(tmp_path):
+    url = str(tmp_path / "algo.git")
+    Repo.init(url, bare=True)
+    seed = Repo.clone_from(url, str(tmp_path / "seed"))
+    for i in range(3):
+        commit(seed, "README.md", f"version {i}\n")
+    return seed, "file://" + url
+
+
+def test_shallow_checkout_and_update(tmp_path, remote):
+    seed, url = remote
+    cache = WorkspaceCache(str(tmp_path / "cache"))
+
+    with cache.lock("algo"):
+        repo = cache.checkout("algo", url)
+    assert repo.git.rev_list("--count", "HEAD") == "1"
+
+    commit(seed, "README.md", "version 3\n")
+    with open(os.path.join(repo.working_dir, "untracked.txt"), "w") as file:
+        file.write("leftover from a failed deploy")
+
+    with cache.lock("algo"):
+        repo = cache.checkout("algo", url)
+    assert repo.head.commit.hexsha == seed.head.commit.hexsha
+    assert not os.path.exists(os.path.join(repo.working_dir, "untracked.txt"))
+
+
+def test_lock_is_exclusive(tmp_path):
+    cache = WorkspaceCache(str(tmp_path / "cache"))
+    with cache.lock("algo"):
+        with cache.lock("algo", blocking=False) as locked:
+            assert not locked
+        with cache.lock("other", blocking=False) as locked:
+            assert locked
+
+
+def test_evict(tmp_path, remote):
+    _, url = remote
+    cache = WorkspaceCache(str(tmp_path / "cache"), max_bytes=0)
+    for key in ("old", "in-use", "new"):
+        with cache.lock(key):
+            cache.checkout(key, url)
+    past = time.time() - 100
+    os.utime(cache.lock_path("old"), (past, past))
+
+    with cache.lock("in-use"):
+        cache.evict()
+    assert [key for _, key in cache.workspaces()] == ["in-use"]
+
+
+def test_evict_expired(tmp_path, remote):
+    _, url = remote
+    cache = WorkspaceCache(str(tmp_path / "cache"), max_age=60)
+    for key in ("old", "new"):
+        with cache.lock(key):
+            cache.checkout(key, url)
+    past = time.time() - 100
+    os.utime(cache.lock_path("old"), (past, past))
+
+    cache.evict()
+    assert [key for _, key in cache.workspaces()] == ["new"]
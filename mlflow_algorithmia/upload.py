@@ -0,0 +1,387 @@
+import collections
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from mlflow.exceptions import MlflowException
+
+
+logger = logging.getLogger(__name__)
+
+# Chunked uploads are stored next to the logical file:
+#   data://<user>/<algo>/<bundle>.parts/00000
+#   data://<user>/<algo>/<bundle>.parts/manifest.json
+# The manifest is written last so its existence marks a complete upload.
+PARTS_SUFFIX = ".parts"
+MANIFEST_NAME = "manifest.json"
+
+
+def parts_dir(remote_fpath):
+    return remote_fpath + PARTS_SUFFIX
+
+
+def manifest_path(remote_fpath):
+    return f"{parts_dir(remote_fpath)}/{MANIFEST_NAME}"
+
+
+def part_path(remote_fpath, index):
+    return f"{parts_dir(remote_fpath)}/{index:05d}"
+
+
+def remote_exists(client, remote_fpath):
+    """
+    True if a file was uploaded as a single file or as a complete chunked upload
+    """
+    if client.file(remote_fpath).exists():
+        return True
+    return client.file(manifest_path(remote_fpath)).exists()
+
+
+def ensure_dir(client, remote_dir):
+    if not client.dir(remote_dir).exists():
+        client.dir(remote_dir).create()
+
+
+def retry_delay(attempt, ex, name, retries=5, backoff=1.0, action="Upload"):
+    """
+    Retry policy of the sync and asyncio clients, called when `attempt`
+    (from 0) failed with `ex`: raises MlflowException after `retries`
+    attempts, otherwise logs the failure and returns the seconds to wait,
+    an exponential backoff with jitter.
+    """
+    if attempt + 1 >= retries:
+        raise MlflowException(
+            f"{action} of {name} failed after {retries} attempts: {ex}"
+        ) from ex
+    logger.warning("%s of %s failed (%s), retrying", action, name, ex)
+    return backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+def with_retries(func, name, retries=5, backoff=1.0, action="Upload"):
+    """
+    Call `func` until it succeeds, sleeping with exponential backoff and
+    jitter between attempts. Raises MlflowException after `retries` attempts.
+    """
+    for attempt in range(retries):
+        try:
+            return func()
+        except Exception as ex:
+            time.sleep(retry_delay(attempt, ex, name, retries, backoff, action))
+
+
+def log_progress(done, total):
+    if total is None:
+        logger.info("Uploaded %.1f MB", done / 1e6)
+    else:
+        logger.info("Uploaded %.1f of %.1f MB", done / 1e6, total / 1e6)
+
+
+class ChunkedUploader(object):
+    """
+    Uploads a local file to the Algorithmia data API in fixed size parts
+
+    Parts are uploaded concurrently from a thread pool and each part is
+    retried with exponential backoff. Confirmed parts are recorded in a local
+    journal so an interrupted upload of the same file resumes where it stopped.
+
+    Parameters
+    ----------
+        client: Algorithmia client
+        part_size: size of each part in bytes
+        workers: number of parts in flight
+        retries: attempts for each part before failing the upload
+        backoff: initial delay between retries in seconds
+        journal_dir: directory for the resume journals, defaults to the
+            directory of the uploaded file
+        progress: callable(bytes_done, bytes_total) called after every part
+    """
+
+    def __init__(
+        self,
+        client,
+        part_size=64 * 1024 * 1024,
+        workers=4,
+        retries=5,
+        backoff=1.0,
+        journal_dir=None,
+        progress=log_progress,
+    ):
+        self.client = client
+        self.part_size = int(part_size)
+        self.workers = int(workers)
+        self.retries = int(retries)
+        self.backoff = float(backoff)
+        self.journal_dir = journal_dir
+        self.progress = progress
+        self.lock = threading.Lock()
+
+    def upload(self, local_fpath, remote_fpath):
+        """
+        Upload `local_fpath` to `remote_fpath` and return `remote_fpath`
+        """
+        size = os.path.getsize(local_fpath)
+        n_parts = max(1, -(-size // self.part_size))
+        journal = self.read_journal(local_fpath, remote_fpath, size)
+        confirmed = journal["parts"]
+
+        ensure_dir(self.client, parts_dir(remote_fpath))
+
+        self.total = size
+        self.done = sum(part["size"] for part in confirmed.values())
+        if confirmed:
+            logger.info("Resuming upload, %d of %d parts done", len(confirmed), n_parts)
+
+        pending = [i for i in range(n_parts) if str(i) not in confirmed]
+        error = None
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(self.upload_part, local_fpath, remote_fpath, i): i
+                for i in pending
+            }
+            # Record every part that made it so a retry can resume from them
+            for future in as_completed(futures):
+                try:
+                    confirmed[str(futures[future])] = future.result()
+                except MlflowException as ex:
+                    error = error or ex
+                    continue
+                self.write_journal(local_fpath, journal)
+
+        if error is not None:
+            raise error
+
+        manifest = {
+            "name": os.path.basename(remote_fpath),
+            "size": size,
+            "part_size": self.part_size,
+            "parts": [confirmed[str(i)] for i in range(n_parts)],
+        }
+        self.with_retries(
+            lambda: self.client.file(manifest_path(remote_fpath)).putJson(manifest),
+            "manifest",
+        )
+        os.remove(self.journal_path(local_fpath))
+        return remote_fpath
+
+    def upload_stream(self, stream, remote_fpath):
+        """
+        Upload parts as they are read from a `StreamPipe` (or any object with
+        a `read(size)` method), at most `workers` parts are held in memory.
+        A stream can not be replayed so there is no resume journal.
+        """
+        ensure_dir(self.client, parts_dir(remote_fpath))
+        self.total = None
+        self.done = 0
+
+        in_flight = threading.BoundedSemaphore(self.workers)
+        futures = []
+        size = 0
+
+        def upload(index, data):
+            try:
+                return self.upload_data(data, remote_fpath, index)
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while True:
+                    in_flight.acquire()
+                    data = read_exactly(stream, self.part_size)
+                    if not data and futures:
+                        in_flight.release()
+                        break
+                    futures.append(executor.submit(upload, len(futures), data))
+                    size += len(data)
+                    if len(data) < self.part_size:
+                        break
+                parts = [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        manifest = {
+            "name": os.path.basename(remote_fpath),
+            "size": size,
+            "part_size": self.part_size,
+            "parts": parts,
+        }
+        self.with_retries(
+            lambda: self.client.file(manifest_path(remote_fpath)).putJson(manifest),
+            "manifest",
+        )
+        return remote_fpath
+
+    def upload_part(self, local_fpath, remote_fpath, index):
+        with open(local_fpath, "rb") as file:
+            file.seek(index * self.part_size)
+            data = file.read(self.part_size)
+        return self.upload_data(data, remote_fpath, index)
+
+    def upload_data(self, data, remote_fpath, index):
+        remote_part = part_path(remote_fpath, index)
+        self.with_retries(lambda: self.client.file(remote_part).put(data), remote_part)
+
+        with self.lock:
+            self.done += len(data)
+            done = self.done
+        if self.progress is not None:
+            self.progress(done, self.total)
+
+        return {
+            "index": index,
+            "size": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+
+    def with_retries(self, func, name):
+        return with_retries(func, name, retries=self.retries, backoff=self.backoff)
+
+    def journal_path(self, local_fpath):
+        journal_dir = self.journal_dir or os.path.dirname(local_fpath)
+        fname = os.path.basename(local_fpath) + ".upload.json"
+        return os.path.join(journal_dir, fname)
+
+    def read_journal(self, local_fpath, remote_fpath, size):
+        """
+        Return the journal of a previous upload of the same file to the same
+        path, or an empty one if the size or the part size changed. Only the
+        parts that still match the local file and exist remotely are kept,
+        a bundle created again with different bytes is uploaded again.
+        """
+        new = {
+            "remote": remote_fpath,
+            "size": size,
+            "part_size": self.part_size,
+            "parts": {},
+        }
+        try:
+            with open(self.journal_path(local_fpath), "r") as file:
+                journal = json.load(file)
+        except (OSError, ValueError):
+            return new
+
+        for key in ("remote", "size", "part_size"):
+            if journal.get(key) != new[key]:
+                return new
+
+        with open(local_fpath, "rb") as file:
+            for key, part in sorted(journal["parts"].items()):
+                file.seek(part["index"] * self.part_size)
+                sha256 = hashlib.sha256(file.read(self.part_size)).hexdigest()
+                remote_part = part_path(remote_fpath, part["index"])
+                if sha256 == part["sha256"] and self.client.file(remote_part).exists():
+                    new["parts"][key] = part
+        return new
+
+    def write_journal(self, local_fpath, journal):
+        fpath = self.journal_path(local_fpath)
+        with open(fpath + ".tmp", "w") as file:
+            json.dump(journal, file)
+        os.replace(fpath + ".tmp", fpath)
+
+
+def read_exactly(stream, size):
+    """
+    Read `size` bytes from a stream, less only at the end of the stream
+    """
+    chunks = []
+    while size > 0:
+        data = stream.read(size)
+        if not data:
+            break
+        chunks.append(data)
+        size -= len(data)
+    return b"".join(chunks)
+
+
+class StreamPipe(object):
+    """
+    Bounded in-memory pipe between a writer thread and a reader thread
+
+    The writer (the bundle compressor) blocks once `max_bytes` are buffered
+    so compression never gets more than the buffer ahead of the upload.
+    `close(error)` makes the reader raise the writer error and `abort()`
+    makes a blocked writer raise when the reader gives up.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.chunks = collections.deque()
+        self.buffered = 0
+        self.offset = 0
+        self.closed = False
+        self.aborted = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    # Writer side
+
+    def write(self, data):
+        if not data:
+            return 0
+        with self.cond:
+            while self.buffered >= self.max_bytes and not self.aborted:
+                self.cond.wait()
+            if self.aborted:
+                raise BrokenPipeError("Stream reader stopped")
+            self.chunks.append(bytes(data))
+            self.buffered += len(data)
+            self.offset += len(data)
+            self.cond.notify_all()
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def close(self, error=None):
+        with self.cond:
+            self.closed = True
+            self.error = error
+            self.cond.notify_all()
+
+    # Reader side
+
+    def read(self, size=-1):
+        """
+        Returns up to `size` bytes, blocks until data is available
+        and returns b"" at the end of the stream
+        """
+        with self.cond:
+            while not self.chunks and not self.closed:
+                self.cond.wait()
+            if self.error is not None:
+                raise self.error
+            if not self.chunks:
+                return b""
+
+            chunk = self.chunks.popleft()
+            if 0 <= size < len(chunk):
+                self.chunks.appendleft(chunk[size:])
+                chunk = chunk[:size]
+            self.buffered -= len(chunk)
+            self.cond.notify_all()
+            return chunk
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(1024 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+    def abort(self):
+        with self.cond:
+            self.aborted = True
+            self.chunks.clear()
+            self.buffered = 0
+            self.cond.notify_all()
@@ -0,0 +1,177 @@
+import logging
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+logger = logging.getLogger(__name__)
+
+
+def default_workspace_dir():
+    cache_dir = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(cache_dir, "mlflow-algorithmia", "workspaces")
+
+
+def lock_file(file, blocking=True):
+    """
+    Exclusive lock on an open file, returns False if `blocking` is False
+    and another process holds the lock
+    """
+    if fcntl is not None:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(file.fileno(), flags)
+        except BlockingIOError:
+            return False
+        return True
+
+    mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+    try:
+        msvcrt.locking(file.fileno(), mode, 1)
+    except OSError:
+        return False
+    return True
+
+
+def unlock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for fname in files:
+            try:
+                total += os.lstat(os.path.join(root, fname)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class WorkspaceCache(object):
+    """
+    Persistent cache of shallow algorithm repo clones shared by all
+    deployments on a host
+
+    Every workspace has a lock file so concurrent deploy processes of the
+    same algorithm wait for each other while other algorithms are not
+    affected. Workspaces that are not locked are evicted, least recently
+    used first, when they are older than `max_age` seconds or when the
+    cache is larger than `max_bytes`.
+    """
+
+    def __init__(self, root, max_bytes=2 * 1024 ** 3, max_age=7 * 24 * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """
+        Examples:
+            >>> WorkspaceCache.key("git.algorithmia.com", "user", "algo")
+            'git.algorithmia.com__user__algo'
+        """
+        return "__".join(re.sub(r"[^A-Za-z0-9_.-]", "_", part) for part in parts)
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def lock_path(self, key):
+        return os.path.join(self.root, f"{key}.lock")
+
+    @contextmanager
+    def lock(self, key, blocking=True):
+        """
+        Hold the lock of a workspace, yields False if `blocking` is False
+        and the workspace is locked by someone else
+        """
+        with open(self.lock_path(key), "a+") as file:
+            locked = lock_file(file, blocking=blocking)
+            try:
+                yield locked
+            finally:
+                if locked:
+                    unlock_file(file)
+
+    def checkout(self, key, url):
+        """
+        Returns an up to date Repo of the workspace, cloning it if needed.
+        The caller must hold the workspace lock.
+        """
+        from git import Repo
+
+        path = self.path(key)
+        repo = None
+        if os.path.exists(path):
+            try:
+                repo = Repo(path)
+                branch = repo.active_branch.name
+                repo.remote(name="origin").fetch(branch, depth=1)
+                repo.git.reset("--hard", f"origin/{branch}")
+                repo.git.clean("-fdx")
+            except Exception as ex:
+                logger.warning("Workspace %s is broken (%s), cloning again", key, ex)
+                shutil.rmtree(path, ignore_errors=True)
+                repo = None
+
+        if repo is None:
+            repo = Repo.clone_from(url, path, depth=1, single_branch=True)
+
+        # The lock file mtime records when the workspace was last used
+        os.utime(self.lock_path(key))
+        return repo
+
+    def remove(self, key):
+        with self.lock(key):
+            shutil.rmtree(self.path(key), ignore_errors=True)
+
+    def workspaces(self):
+        """
+        Returns a list of (last used timestamp, key) sorted from the oldest
+        """
+        ret = []
+        for fname in os.listdir(self.root):
+            if fname.endswith(".lock"):
+                key = fname[: -len(".lock")]
+                if os.path.isdir(self.path(key)):
+                    ret.append((os.path.getmtime(self.lock_path(key)), key))
+        return sorted(ret)
+
+    def evict(self):
+        """
+        Remove expired workspaces and the least recently used ones until the
+        cache fits in `max_bytes`, workspaces in use are skipped
+        """
+        now = time.time()
+        workspaces = self.workspaces()
+        sizes = {key: dir_size(self.path(key)) for _, key in workspaces}
+        total = sum(sizes.values())
+
+        for last_used, key in workspaces:
+            expired = now - last_used > self.max_age
+            if not expired and total <= self.max_bytes:
+                continue
+
+            with self.lock(key, blocking=False) as locked:
+                if not locked:
+                    continue
+                logger.info("Evicting workspace %s", key)
+                # The lock file is kept, removing it would let two processes
+                # hold locks on different files for the same workspace
+                shutil.rmtree(self.path(key), ignore_errors=True)
+                total -= sizes[key]
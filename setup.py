@@ -24,13 +24,18 @@ setup(
     # cmdclass={"install": InstallCmd},
     entry_points={
         "mlflow.deployments": "algorithmia=mlflow_algorithmia.deployment",
+        "console_scripts": [
+            "mlflow-algorithmia-fleet=mlflow_algorithmia.fleet:main",
+        ],
     },
     options={"bdist_wheel": {"universal": "1"}},
     python_requires=">=3.6",
     setup_requires=["setuptools_scm"],
     install_requires=read_file("requirements-package.txt").splitlines(),
     extras_require={
-        "test": ["pytest"],
+        "test": ["pytest", "aiohttp"],
+        "zstd": ["zstandard"],
+        "async": ["aiohttp"],
         "dev": read_file("requirements.txt").splitlines(),
     },
     description="",